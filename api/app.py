@@ -1,60 +1,105 @@
 """API script for Internet Archiver."""
 
-import base64
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from time import perf_counter
+import hmac
+import json
+import logging
 import os
 from os import environ
+from uuid import UUID, uuid4
+import threading
 import requests
-from connect import get_connection
+from connect import ConnectionPool
 
 from boto3 import client
-from bs4 import BeautifulSoup
+from botocore.exceptions import ClientError
+from bs4 import BeautifulSoup, NavigableString
+from bs4.element import PreformattedString
 from dotenv import load_dotenv
 from flask import (
+    Blueprint,
     Flask,
+    Response,
+    current_app,
+    abort,
+    jsonify,
+    make_response,
     render_template,
     request,
     redirect,
-    send_from_directory,
-    send_file
+    send_file,
+    url_for
 )
-from html2image import Html2Image
+from PIL import UnidentifiedImageError
 
 from upload_to_s3 import (
-    extract_title,
+    extract_title_from_soup,
     extract_domain,
-    get_s3_client
+    get_s3_client,
+    FETCH_TIMEOUT_SECONDS
 )
 
 from upload_to_database import (
     add_url,
     add_website,
-    add_interaction
+    add_interaction,
+    add_capture_batch,
+    update_batch_url_status,
+    update_url_summary
 )
 
 from extract_from_database import (
-    get_connection,
-    get_url,
+    get_urls,
     get_most_popular_urls,
-    get_summary_from_db,
-    get_genre_from_db,
-    get_first_submission_time,
-    get_number_of_views,
-    get_number_of_saves,
-    get_recent_png_key_s3,
-    get_png_keys_s3,
-    get_is_human_from_db
+    get_recent_png_keys_s3,
+    get_page_history,
+    get_capture_page,
+    get_url_id,
+    get_capture_batch,
+    search_urls,
+    search_page_content,
+    SEARCH_PAGE_SIZE,
+    HISTORY_PAGE_SIZE
 )
 
 from download_from_s3 import (
-    get_object_from_s3,
-    download_data_file,
-    get_all_screenshots,
-    get_scrape_times,
-    format_timestamps,
+    open_object_stream,
+    iter_object_chunks,
     get_most_recent_png_key,
     get_most_recently_saved_web_pages,
-    retrieve_searched_for_pages
+    s3_cache
+)
+from thumbnails import (
+    get_contact_sheet_path,
+    get_thumbnail_path,
+    sprite_position,
+    sprite_size
+)
+from diff import diff_lines
+
+from bulk import (
+    BulkCapturer,
+    normalise_urls,
+    parse_csv_urls,
+    parse_json_urls,
+    BULK_WORKERS,
+    MAX_BULK_URLS
+)
+
+from interaction_buffer import InteractionBuffer
+from lazy import lazy
+from metrics import instrument_s3_client, metrics
+from profiler import ProfilerBusy, RequestProfiler
+from cache import ResponseCache, get_cache_backend
+from http_cache import (
+    add_immutable_headers,
+    add_revalidated_headers,
+    is_not_modified,
+    not_modified_response,
+    snapshot_etag
 )
 
 from chat_gpt_utils import (
@@ -69,26 +114,109 @@ NUM_OF_SITES_HOMEPAGE = 12
 IMG_FOLDER = os.path.join(os.getcwd(), 'static', 'img')
 STATIC_FOLDER = os.path.join(os.getcwd(), 'static')
 USER_FRIENDLY_FORMAT = "%d %B %Y - %I:%M %p"
+SAVE_DEADLINE_SECONDS = 20
+SAVE_WORKERS = 8
+BULK_DEADLINE_SECONDS = 60
+BULK_STATUSES = ('queued', 'running', 'saved', 'failed')
+PENDING_SUMMARY = "Summary is being generated, check back shortly!"
+SUBMIT_CACHE_KEY = 'view:submit'
+ARCHIVED_PAGES_CACHE_KEY = 'view:archived-pages'
+LISTING_CACHE_KEYS = (SUBMIT_CACHE_KEY, ARCHIVED_PAGES_CACHE_KEY)
+LISTING_CACHE_TTL_SECONDS = 300
+INVISIBLE_TAGS = {'script', 'style', 'noscript', 'template'}
+MAX_INDEXED_TEXT_CHARS = 500000
+SNAPSHOT_SANDBOX = 'sandbox allow-scripts allow-popups allow-forms'
+DIFF_WORKERS = 2
+DIFF_DEADLINE_SECONDS = 5
+DIFF_RETRY_AFTER_SECONDS = 2
+DEFAULT_PROFILE_SECONDS = 10
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILED_REQUESTS = 100
 
 
 load_dotenv()
 
-hti = Html2Image(custom_flags=["--no-sandbox",
-                               "--no-first-run", "--disable-gpu", "--use-fake-ui-for-media-stream",
-                               "--use-fake-device-for-media-stream", "--disable-sync"])
+db_pool = ConnectionPool(environ)
+interaction_buffer = InteractionBuffer(environ)
+response_cache = ResponseCache(get_cache_backend(environ))
+
+save_executor = ThreadPoolExecutor(max_workers=SAVE_WORKERS,
+                                   thread_name_prefix='save')
+# Each bulk capture fans out to four tasks, so it gets its own pool rather than
+# queueing behind (or starving) the captures users are waiting on
+bulk_task_executor = ThreadPoolExecutor(max_workers=BULK_WORKERS * 4,
+                                        thread_name_prefix='bulk_task')
+
+# Diffing is CPU bound, so only a couple run at once and requests stop waiting at a deadline
+diff_executor = ThreadPoolExecutor(max_workers=DIFF_WORKERS,
+                                   thread_name_prefix='diff')
+running_diffs = {}
+running_diffs_lock = threading.Lock()
+
+profiler = RequestProfiler(background_thread_prefixes=('save', 'bulk', 'diff'))
 
-app = Flask(__name__)
+archive = Blueprint('archive', __name__)
+
+
+@lazy
+def get_screenshotter():
+    """Sets up headless Chrome for screenshots the first time a page is saved."""
+    from html2image import Html2Image
+
+    return Html2Image(custom_flags=["--no-sandbox",
+                                    "--no-first-run", "--disable-gpu", "--use-fake-ui-for-media-stream",
+                                    "--use-fake-device-for-media-stream", "--disable-sync"])
+
+
+@lazy
+def get_shared_s3_client() -> client:
+    """Creates the S3 client shared by every request; boto3 clients are thread safe."""
+
+    return instrument_s3_client(get_s3_client(environ))
 
 
 def get_soup(url: str) -> BeautifulSoup:
     """Gets Soup object from url."""
 
-    response = requests.get(url)
+    response = requests.get(url, timeout=FETCH_TIMEOUT_SECONDS)
     response.raise_for_status()
 
     return BeautifulSoup(response.content, 'html.parser')
 
 
+def extract_visible_lines(soup: BeautifulSoup) -> list[str]:
+    """Returns each run of text a visitor would see on the page, without modifying the soup."""
+
+    # comments, CDATA, doctypes and declarations are all PreformattedStrings
+    return [' '.join(string.split()) for string in soup.find_all(string=True)
+            if isinstance(string, NavigableString) and not isinstance(string, PreformattedString)
+            and string.parent.name not in INVISIBLE_TAGS
+            and not string.isspace()]
+
+
+def extract_visible_text(soup: BeautifulSoup) -> str:
+    """Returns the text a visitor would see on the page, without modifying the soup."""
+
+    return ' '.join(extract_visible_lines(soup))[:MAX_INDEXED_TEXT_CHARS]
+
+
+def extract_outline_lines(soup: BeautifulSoup) -> list[str]:
+    """Returns one line per element, indented by depth and naming its id and classes."""
+
+    lines = []
+    for tag in soup.find_all(True):
+        if tag.name in INVISIBLE_TAGS:
+            continue
+        depth = sum(1 for _ in tag.parents) - 1
+        label = tag.name
+        if tag.get('id'):
+            label += f"#{tag['id']}"
+        label += ''.join(f".{name}" for name in tag.get('class', []))
+        lines.append(f"{'  ' * depth}{label}")
+
+    return lines
+
+
 def process_html_content(soup: BeautifulSoup,
                          domain: str,
                          title: str,
@@ -120,9 +248,10 @@ def process_screenshot(url: str,
     filename_string = f"{domain}/{title}/{timestamp}"
     img_object_key_s3 = f"{filename_string}{IMAGE_FILE_FORMAT}"
 
-    hti.screenshot(url=url,
-                   size=DISPLAY_SIZE,
-                   save_as=img_object_key)
+    with metrics.timer('chrome', 'screenshot'):
+        get_screenshotter().screenshot(url=url,
+                                       size=DISPLAY_SIZE,
+                                       save_as=img_object_key)
 
     s3_client.upload_file(
         img_object_key, environ['S3_BUCKET'], img_object_key_s3)
@@ -132,17 +261,45 @@ def process_screenshot(url: str,
     return img_object_key_s3
 
 
-def upload_scrape_to_database(response_data: dict) -> None:
-    """Uploads website information to the database."""
-    connection = get_connection(environ)
-    add_url(connection, response_data)
-    add_website(connection, response_data)
+def upload_capture_to_database(response_data: dict, interaction_data: dict) -> None:
+    """Uploads a capture and the save interaction that produced it, resolving the url once."""
+    with db_pool.connection() as connection:
+        add_url(connection, response_data)
+        interaction_data['url_id'] = response_data['url_id']
+        add_website(connection, response_data)
+        add_interaction(connection, interaction_data)
+
+
+def get_future_result(future: Future):
+    """Returns the result of a finished future, or None if it failed or is still running."""
+
+    if not future.done():
+        return None
+
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return None
+
+
+def backfill_summary(url_id: int, summary_future: Future, genre_future: Future) -> None:
+    """Stores the AI summary and genre once both have finished after the save deadline."""
+
+    def store(_: Future) -> None:
+        if not (summary_future.done() and genre_future.done()):
+            return
+
+        summary = get_future_result(summary_future)
+        genre = get_future_result(genre_future)
+        if summary is None and genre is None:
+            return
 
+        with db_pool.connection() as connection:
+            update_url_summary(connection, url_id, summary, genre)
 
-def upload_interaction_to_database(interaction_data: dict):
-    connection = get_connection(environ)
-    add_url(connection, interaction_data)
-    add_interaction(connection, interaction_data)
+    summary_future.add_done_callback(store)
+    genre_future.add_done_callback(store)
 
 
 def convert_iso_to_datetime(dt_str: str) -> datetime:
@@ -154,66 +311,152 @@ def convert_iso_to_datetime(dt_str: str) -> datetime:
     return dt + timedelta(microseconds=us)
 
 
-def remove_png_files(folder_path: str) -> None:
-    """Removes all .png files in a folder."""
+def encode_cursor(cursor: tuple | None) -> str | None:
+    """Turns a (scrape_at, page_scrape_id) keyset cursor into a query string value."""
 
-    for file in os.listdir(folder_path):
-        if file.endswith(".png"):
-            file_path = os.path.join(folder_path, file)
-            os.remove(file_path)
-            print(f"Removed: {file_path}")
+    if cursor is None:
+        return None
 
+    scrape_at, page_scrape_id = cursor
 
-def remove_html_files(folder_path: str) -> None:
-    """Removes all .html files in a folder."""
+    return f"{scrape_at.isoformat()}_{page_scrape_id}"
 
-    for file in os.listdir(folder_path):
-        if file.endswith(".html"):
-            file_path = os.path.join(folder_path, file)
-            os.remove(file_path)
-            print(f"Removed: {file_path}")
 
+def decode_cursor(value: str) -> tuple[datetime, int]:
+    """Reads a cursor made by encode_cursor, aborting with a 400 if it is malformed."""
 
-@app.route('/')
-def index():
-    """First page of the website."""
+    try:
+        scrape_at, page_scrape_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(scrape_at), int(page_scrape_id)
+    except ValueError:
+        abort(400, description="Invalid page history cursor.")
 
-    return render_template('index.html')
 
+def serialise_capture(capture: dict, url: str, index: int, count: int) -> dict:
+    """Returns the links and labels needed to show the index-th of a page of captures."""
 
-@app.route('/submit')
-def submit():
-    """End point to submit a story."""
+    timestamp = capture['scrape_at'].strftime(USER_FRIENDLY_FORMAT)
+
+    return {
+        'display_url': url_for('archive.display_page_instance',
+                               html_file=capture['html_s3_ref'],
+                               url=url, timestamp=timestamp),
+        'thumbnail_url': url_for('archive.thumbnail', png_key=capture['screenshot_s3_ref']),
+        'sprite_position': sprite_position(index, count),
+        'timestamp': timestamp,
+        'is_human': capture['is_human']
+    }
+
+
+def serialise_capture_page(captures: list[dict], url: str, before: str | None) -> dict:
+    """Returns a page of captures with the contact sheet holding all of their thumbnails."""
+
+    version = snapshot_etag('\n'.join(capture['screenshot_s3_ref'] for capture in captures),
+                            'contact-sheet')
+
+    return {
+        'captures': [serialise_capture(capture, url, index, len(captures))
+                     for index, capture in enumerate(captures)],
+        'contact_sheet_url': url_for('archive.contact_sheet', url=url, before=before,
+                                     v=version) if captures else None,
+        'sprite_size': sprite_size(len(captures))
+    }
 
-    status = request.args.get('status')
 
-    s3_client = get_s3_client(environ)
-    connection = get_connection(environ)
+def next_captures_url(url: str, cursor: tuple | None) -> str | None:
+    """Returns the JSON endpoint for the next page of captures, if there is one."""
 
-    remove_png_files('static')
+    if cursor is None:
+        return None
+
+    return url_for('archive.page_history_captures', url=url, before=encode_cursor(cursor))
+
+
+def render_page_history(history: dict, gpt_summary: str = None, genre: str = None) -> str:
+    """Renders a page history view model; screenshots load lazily as thumbnails."""
+
+    page = serialise_capture_page(history['captures'], history['url'], None)
+
+    return render_template('page_history.html',
+                           **page,
+                           next_page=next_captures_url(history['url'],
+                                                       history['next_cursor']),
+                           url=history['url'],
+                           gpt_summary=gpt_summary or history['summary'],
+                           genre=genre or history['genre'],
+                           first_submitted=history['first_submitted'],
+                           number_of_views=history['number_of_views'],
+                           number_of_saves=history['number_of_saves'])
+
+
+@archive.route('/')
+def index():
+    """First page of the website."""
+
+    return render_template('index.html')
+
+
+def build_recent_pages(s3_client: client) -> list[dict]:
+    """Builds the recently saved pages shown on the submit page."""
 
     s3_refs = get_most_recently_saved_web_pages()
     if s3_refs is None:
-        return render_template('submit.html')
+        return []
 
     pages = []
     s3_refs_set = set(s3_refs)
 
+    with db_pool.connection() as connection:
+        urls = get_urls(connection, list(s3_refs_set))
+
     for s3_ref in s3_refs_set:
         png_key = get_most_recent_png_key(
             s3_client, environ['S3_BUCKET'], s3_ref)
-        url = get_url(s3_ref, connection)
+        url = urls.get(s3_ref, "Empty Database!")
 
         if png_key is None:
-            return render_template('submit.html')
+            return []
 
-        image_filename = download_data_file(
-            s3_client, environ['S3_BUCKET'], png_key, 'static')
         screenshot_label = png_key.split(
             '/')[0] + '/' + png_key.split('/')[1]
 
-        pages.append(
-            {'url': url, 'image_filename': image_filename, "label": screenshot_label})
+        pages.append({'url': url, 'png_key': png_key, "label": screenshot_label})
+
+    return pages
+
+
+def build_popular_pages() -> list[dict]:
+    """Builds the most popular pages shown on the archived pages page."""
+
+    pages = []
+
+    with db_pool.connection() as connection:
+        urls = get_most_popular_urls(connection)
+        png_keys = get_recent_png_keys_s3(connection, urls)
+
+    for url in urls:
+        png_key = png_keys.get(url)
+        if png_key is None:
+            continue
+
+        screenshot_label = png_key.split(
+            '/')[0] + '/' + png_key.split('/')[1]
+
+        pages.append({'url': url, 'png_key': png_key, "label": screenshot_label})
+
+    return pages
+
+
+@archive.route('/submit')
+def submit():
+    """End point to submit a story."""
+
+    status = request.args.get('status')
+
+    s3_client = get_shared_s3_client()
+
+    pages = response_cache.get_or_compute(
+        SUBMIT_CACHE_KEY, lambda: build_recent_pages(s3_client), LISTING_CACHE_TTL_SECONDS)
 
     if status == 'failure':
         return render_template('submit.html', result='Sorry that URL is currently not supported!', pages=pages)
@@ -221,97 +464,178 @@ def submit():
     return render_template('submit.html', pages=pages)
 
 
-@app.route('/save', methods=['POST'])
+def capture_page(url: str, executor: ThreadPoolExecutor, deadline: float) -> dict:
+    """Captures a page and records it, returning the saved capture.
+
+    The HTML and screenshot must finish within deadline seconds; an AI summary or
+    genre that is not ready by then is left as None and filled in when it finishes.
+    """
+
+    soup = get_soup(url)
+
+    domain = extract_domain(url)
+    title = extract_title_from_soup(soup)
+    timestamp = datetime.utcnow().isoformat()
+
+    s3_client = get_shared_s3_client()
+    html_content = str(soup)
+
+    html_future = executor.submit(
+        process_html_content, soup, domain, title, timestamp, s3_client)
+    screenshot_future = executor.submit(
+        process_screenshot, url, domain, title, timestamp, s3_client)
+    summary_future = executor.submit(generate_summary, html_content)
+    genre_future = executor.submit(get_genre, html_content)
+    page_text = extract_visible_text(soup)
+
+    wait([html_future, screenshot_future, summary_future, genre_future],
+         timeout=deadline)
+
+    # The capture itself is required; the AI fields can be filled in later
+    html_object_key = html_future.result(timeout=0)
+    img_object_key_s3 = screenshot_future.result(timeout=0)
+
+    gpt_summary = get_future_result(summary_future)
+    webpage_genre = get_future_result(genre_future)
+    print(f"WEBPAGE GENRE (AT SUBMIT): {webpage_genre}")
+
+    response_data = {
+        'url': url,
+        'title': title,
+        'html_s3_ref': html_object_key,
+        'css_s3_ref': 'css_data',
+        'screenshot_s3_ref': img_object_key_s3,
+        'scrape_at': timestamp,
+        'summary': gpt_summary,
+        'is_human': True,
+        'genre': webpage_genre,
+        'text': page_text
+    }
+
+    interaction_data = {
+        'url': url,
+        'type': 'save',
+        'interact_at': convert_iso_to_datetime(timestamp).replace(microsecond=0)
+    }
+
+    upload_capture_to_database(response_data, interaction_data)
+    response_cache.invalidate(*LISTING_CACHE_KEYS)
+
+    print(f"Upload successful: {interaction_data}")
+
+    if gpt_summary is None or webpage_genre is None:
+        backfill_summary(response_data['url_id'],
+                         summary_future, genre_future)
+
+    return response_data
+
+
+@archive.route('/save', methods=['POST'])
 def save():
     """Allows user to input URL and save HTML and CSS."""
 
-    connection = get_connection(environ)
-
     url = request.form['url']
-    timestamp = datetime.utcnow().isoformat()
 
     try:
+        response_data = capture_page(url, save_executor, SAVE_DEADLINE_SECONDS)
 
-        soup = get_soup(url)
+        with db_pool.connection() as connection:
+            history = get_page_history(connection, url)
 
-        domain = extract_domain(url)
-        title = extract_title(url)
-        timestamp = datetime.utcnow().isoformat()
+        return render_page_history(history,
+                                   gpt_summary=response_data['summary'] or PENDING_SUMMARY,
+                                   genre=response_data['genre'] or 'N/A')
 
-        s3_client = get_s3_client(environ)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return redirect('/submit?status=failure')
 
-        html_object_key = process_html_content(
-            soup, domain, title, timestamp, s3_client)
-        img_object_key_s3 = process_screenshot(
-            url, domain, title, timestamp, s3_client)
 
-        gpt_summary = generate_summary(str(soup))
-        webpage_genre = get_genre(str(soup))
-        print(f"WEBPAGE GENRE (AT SUBMIT): {webpage_genre}")
+def record_bulk_status(batch_id: str, position: int, status: str,
+                       error: str = None, url_id: int = None) -> None:
+    """Stores the progress of one url of a bulk capture request."""
 
-        response_data = {
-            'url': url,
-            'html_s3_ref': html_object_key,
-            'css_s3_ref': 'css_data',
-            'screenshot_s3_ref': img_object_key_s3,
-            'scrape_at': timestamp,
-            'summary': gpt_summary,
-            'is_human': True,
-            'genre': webpage_genre
-        }
+    with db_pool.connection() as connection:
+        update_batch_url_status(connection, batch_id, position, status, error, url_id)
 
-        upload_scrape_to_database(response_data)
 
-        timestamp = convert_iso_to_datetime(timestamp).replace(microsecond=0)
+bulk_capturer = BulkCapturer(
+    lambda url: capture_page(url, bulk_task_executor, BULK_DEADLINE_SECONDS)['url_id'],
+    record_bulk_status)
 
-        interaction_data = {
-            'url': url,
-            'type': 'save',
-            'interact_at': timestamp
-        }
 
-        upload_interaction_to_database(interaction_data)
+def read_bulk_urls() -> list:
+    """Returns the urls sent to /bulk-save as JSON, an uploaded CSV file or a CSV body."""
 
-        print(f"Upload successful: {interaction_data}")
+    if 'file' in request.files:
+        return parse_csv_urls(request.files['file'].read().decode('utf-8-sig'))
 
-        first_submitted = get_first_submission_time(url, connection)
-        number_of_views = get_number_of_views(url, connection)
-        number_of_saves = get_number_of_saves(url, connection)
+    if request.is_json:
+        return parse_json_urls(request.get_json())
 
-        png_files = get_png_keys_s3(connection, url)[::-1]
-        html_files = [png_file.replace(
-            '.png', '.html', ) for png_file in png_files]
+    if request.mimetype == 'text/csv':
+        return parse_csv_urls(request.get_data(as_text=True))
 
-        for scrape in png_files:
-            download_data_file(
-                s3_client, environ['S3_BUCKET'], scrape, 'static')
+    raise ValueError("Send a JSON list of urls, or a CSV as text/csv or a 'file' upload.")
 
-        img_files = get_all_screenshots(html_files)
-        scrape_times = get_scrape_times(html_files)
-        formatted_ts = format_timestamps(scrape_times)
 
-        scrape_types = [get_is_human_from_db(html_file, connection)
-                        for html_file in html_files]
+@archive.post('/bulk-save')
+def bulk_save():
+    """Queues a list of urls for capture, returning a batch id to follow their progress."""
 
-        pages = zip(html_files, img_files, formatted_ts, scrape_types)
+    try:
+        raw_urls = read_bulk_urls()
+    except (ValueError, UnicodeDecodeError) as error:
+        return jsonify({'error': str(error)}), 400
+
+    urls, invalid, duplicates = normalise_urls(raw_urls)
+    if not urls:
+        return jsonify({'error': "No valid urls were submitted.", 'invalid': invalid}), 400
+    if len(urls) > MAX_BULK_URLS:
+        return jsonify({'error': f"A batch can hold at most {MAX_BULK_URLS} urls."}), 413
+
+    batch_id = str(uuid4())
+    with db_pool.connection() as connection:
+        add_capture_batch(connection, batch_id, urls)
+    bulk_capturer.submit(batch_id, urls)
+
+    return jsonify({
+        'batch_id': batch_id,
+        'total': len(urls),
+        'duplicates_removed': duplicates,
+        'invalid': invalid,
+        'status_url': url_for('archive.bulk_save_status', batch_id=batch_id)
+    }), 202
+
+
+@archive.get('/bulk-save/<batch_id>')
+def bulk_save_status(batch_id):
+    """Returns the progress of every url in a bulk capture request."""
 
-        return render_template('page_history.html',
-                               pages=pages,
-                               url=url,
-                               gpt_summary=gpt_summary,
-                               genre=webpage_genre,
-                               first_submitted=first_submitted,
-                               number_of_views=number_of_views,
-                               number_of_saves=number_of_saves
-                               )
+    try:
+        batch_id = str(UUID(batch_id))
+    except ValueError:
+        abort(404)
 
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        print(e.args[0])
-        return redirect('/submit?status=failure')
+    with db_pool.connection() as connection:
+        batch = get_capture_batch(connection, batch_id)
+
+    if batch is None:
+        abort(404)
+
+    counts = Counter(url['status'] for url in batch['urls'])
+
+    return jsonify({
+        'batch_id': batch_id,
+        'created_at': batch['created_at'].isoformat(),
+        'total': len(batch['urls']),
+        **{status: counts.get(status, 0) for status in BULK_STATUSES},
+        'done': counts.get('saved', 0) + counts.get('failed', 0) == len(batch['urls']),
+        'urls': batch['urls']
+    })
 
 
-@app.route('/archived-pages', methods=['GET', 'POST'])
+@archive.route('/archived-pages', methods=['GET', 'POST'])
 def view_archived_pages():
     """Allows the user to view a list of currently saved webpages."""
 
@@ -319,104 +643,102 @@ def view_archived_pages():
         input = request.form.get("input")
         return redirect(f"/result/{input}")
 
-    s3_client = get_s3_client(environ)
-    connection = get_connection(environ)
-
-    urls = get_most_popular_urls(connection)
-    pages = []
-    for url in urls:
-        png_key = get_recent_png_key_s3(connection, url)
-        image_filename = download_data_file(
-            s3_client, environ['S3_BUCKET'], png_key, 'static')
-        screenshot_label = png_key.split(
-            '/')[0] + '/' + png_key.split('/')[1]
-
-        pages.append(
-            {'url': url, 'image_filename': image_filename, "label": screenshot_label})
+    pages = response_cache.get_or_compute(
+        ARCHIVED_PAGES_CACHE_KEY, build_popular_pages, LISTING_CACHE_TTL_SECONDS)
 
     return render_template('archived_pages.html', pages=pages)
 
 
-@app.get("/result/<input>")
+@archive.get("/result/<input>")
 def dynamic_page(input):
     """Navigates to a page specific to what the user searched for."""
 
-    s3_client = get_s3_client(environ)
-    connection = get_connection(environ)
-    s3_refs = retrieve_searched_for_pages(s3_client, input)
+    page_number = max(request.args.get('page', 1, type=int), 1)
+
+    with db_pool.connection() as connection:
+        results = search_urls(connection, input, SEARCH_PAGE_SIZE + 1,
+                              (page_number - 1) * SEARCH_PAGE_SIZE)
 
-    if len(s3_refs) == 0:
+    if len(results) == 0:
         return render_template("search_error.html", input=input)
 
+    has_next_page = len(results) > SEARCH_PAGE_SIZE
     pages = []
-    s3_refs_set = set(s3_refs)
 
-    for s3_ref in s3_refs_set:
-        png_key = get_most_recent_png_key(
-            s3_client, environ['S3_BUCKET'], s3_ref)
-        url = get_url(s3_ref, connection)
-
-        image_filename = download_data_file(
-            s3_client, environ['S3_BUCKET'], png_key, 'static')
+    for result in results[:SEARCH_PAGE_SIZE]:
+        png_key = result['screenshot_s3_ref']
         screenshot_label = png_key.split(
             '/')[0] + '/' + png_key.split('/')[1]
 
-        pages.append(
-            {'url': url, 'image_filename': image_filename, "label": screenshot_label})
+        pages.append({'url': result['url'], 'png_key': png_key, "label": screenshot_label})
 
-    return render_template("result.html", pages=pages, input=input)
+    return render_template("result.html", pages=pages, input=input,
+                           page_number=page_number, has_next_page=has_next_page)
 
 
-@app.route('/page-history')
-def display_page_history():
-    """Page which displays all previous captures of a page."""
+def parse_date_arg(name: str, end_of_day: bool = False) -> datetime | None:
+    """Parses an optional ISO date or datetime query argument."""
 
-    s3_client = get_s3_client(environ)
-    connection = get_connection(environ)
+    value = request.args.get(name)
+    if not value:
+        return None
 
-    remove_png_files('static')
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == len('YYYY-MM-DD'):
+        parsed += timedelta(days=1)
+
+    return parsed
 
-    url = request.args.get('url')
 
-    png_files = get_png_keys_s3(connection, url)[::-1]
-    html_files = [png_file.replace(
-        '.png', '.html', ) for png_file in png_files]
+@archive.get("/search-content")
+def search_content():
+    """Returns the captures whose archived text matches a search, as JSON."""
 
-    local_screenshot_files = []
-    screenshot_labels = []
-    timestamps = []
-    for scrape in png_files:
-        local_filename = download_data_file(
-            s3_client, environ['S3_BUCKET'], scrape, 'static')
+    search = request.args.get('q', '').strip()
+    if not search:
+        return jsonify({'error': 'A search term is required.'}), 400
 
-        local_screenshot_files.append(local_filename)
-        screenshot_labels.append(scrape.split(
-            '/')[0] + '/' + scrape.split('/')[1])
+    try:
+        start = parse_date_arg('from')
+        end = parse_date_arg('to', end_of_day=True)
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format.'}), 400
 
-        timestamp = scrape.split('/')[-1].replace('.png', '')
-        timestamps.append(timestamp)
+    page_number = max(request.args.get('page', 1, type=int), 1)
 
-    html_key = html_files[0]
+    with db_pool.connection() as connection:
+        results = search_page_content(connection, search, start, end,
+                                      SEARCH_PAGE_SIZE + 1,
+                                      (page_number - 1) * SEARCH_PAGE_SIZE)
 
-    gpt_summary = get_summary_from_db(html_key, connection)
-    webpage_genre = get_genre_from_db(url, connection)
-    first_submitted = get_first_submission_time(url, connection)
-    number_of_views = get_number_of_views(url, connection)
-    number_of_saves = get_number_of_saves(url, connection)
+    captures = [{
+        'url': result['url'],
+        'html_s3_ref': result['html_s3_ref'],
+        'scrape_at': result['scrape_at'].isoformat(),
+        'view': url_for('archive.display_page_instance', url=result['url'],
+                        html_file=result['html_s3_ref'],
+                        timestamp=result['scrape_at'].strftime(USER_FRIENDLY_FORMAT))
+    } for result in results[:SEARCH_PAGE_SIZE]]
 
-    img_files = get_all_screenshots(html_files)
+    return jsonify({'results': captures,
+                    'page': page_number,
+                    'has_next_page': len(results) > SEARCH_PAGE_SIZE})
 
-    scrape_times = get_scrape_times(html_files)
-    formatted_ts = format_timestamps(scrape_times)
 
-    scrape_types = [get_is_human_from_db(html_file, connection)
-                    for html_file in html_files]
+@archive.route('/page-history')
+def display_page_history():
+    """Page which displays all previous captures of a page."""
 
-    pages = zip(html_files, img_files, formatted_ts, scrape_types)
+    url = request.args.get('url')
+
+    with db_pool.connection() as connection:
+        history = get_page_history(connection, url)
+
+    if history is None:
+        return render_template("search_error.html", input=url)
 
     timestamp = datetime.utcnow().isoformat()
     timestamp = convert_iso_to_datetime(timestamp).replace(microsecond=0)
-    print(timestamp, type(timestamp))
 
     interaction_data = {
         'url': url,
@@ -424,97 +746,392 @@ def display_page_history():
         'interact_at': timestamp
     }
 
-    print(interaction_data)
+    interaction_buffer.add(interaction_data)
 
-    upload_interaction_to_database(interaction_data)
+    print(f"WEBPAGE GENRE (WHEN VIEWING): {history['genre']}")
 
-    print(f"WEBPAGE GENRE (WHEN VIEWING): {webpage_genre}")
+    return render_page_history(history)
 
-    return render_template('page_history.html',
-                           pages=pages,
-                           url=url,
-                           gpt_summary=gpt_summary,
-                           genre=webpage_genre,
-                           first_submitted=first_submitted,
-                           number_of_views=number_of_views,
-                           number_of_saves=number_of_saves)
 
+@archive.get('/page-history/captures')
+def page_history_captures():
+    """Returns the next page of a url's captures, older than the before cursor, as JSON."""
+
+    url = request.args.get('url')
+    before = request.args.get('before')
+    cursor = decode_cursor(before) if before else None
+
+    with db_pool.connection() as connection:
+        url_id = get_url_id(url, connection)
+        if url_id is None:
+            abort(404)
+
+        captures, next_cursor = get_capture_page(connection, url_id, cursor,
+                                                 HISTORY_PAGE_SIZE)
+
+    return jsonify({
+        **serialise_capture_page(captures, url, before),
+        'next_page': next_captures_url(url, next_cursor)
+    })
 
-@app.get("/display-page")
-def display_page_instance():
-    """Navigates to page of specific url with html embedded and download link."""
+
+@archive.get('/page-history/contact-sheet')
+def contact_sheet():
+    """Serves the thumbnails of a page of captures as one JPEG, kept in the disk cache."""
 
     url = request.args.get('url')
-    html_key = request.args.get('html_file')
-    timestamp = request.args.get('timestamp')
+    before = request.args.get('before')
+    cursor = decode_cursor(before) if before else None
+
+    with db_pool.connection() as connection:
+        url_id = get_url_id(url, connection)
+        if url_id is None:
+            abort(404)
+
+        captures, _ = get_capture_page(connection, url_id, cursor, HISTORY_PAGE_SIZE)
+
+    if not captures:
+        abort(404)
+
+    png_keys = [capture['screenshot_s3_ref'] for capture in captures]
+    etag = snapshot_etag('\n'.join(png_keys), 'contact-sheet')
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
 
-    s3_client = get_s3_client(environ)
+    path = get_contact_sheet_path(get_shared_s3_client(), environ['S3_BUCKET'],
+                                  png_keys, s3_cache)
+    response = send_file(path, mimetype='image/jpeg')
 
-    html_object = get_object_from_s3(
-        s3_client, environ['S3_BUCKET'], html_key)
-    html_content_base64 = base64.b64encode(html_object.encode()).decode()
+    # An older link to the newest page still works, but must not be cached as the new sheet
+    if request.args.get('v') != etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
 
-    local_filename = html_key.replace('/', '_')
+    return add_immutable_headers(response, etag)
+
+
+@archive.get('/thumbnail/<path:png_key>')
+def thumbnail(png_key):
+    """Serves a small JPEG of a capture's screenshot, made once and kept in the disk cache."""
+
+    # only screenshots, so other objects in the bucket are never pulled into the cache
+    if not png_key.endswith(IMAGE_FILE_FORMAT):
+        abort(404)
+
+    etag = snapshot_etag(png_key, 'thumbnail')
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    try:
+        path = get_thumbnail_path(get_shared_s3_client(), environ['S3_BUCKET'],
+                                  png_key, s3_cache)
+    except ClientError as error:
+        if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+            abort(404)
+        raise
+    except UnidentifiedImageError:
+        abort(404)
 
-    return render_template('display_page_instance.html',
-                           html_content=html_content_base64,
+    return add_immutable_headers(send_file(path, mimetype='image/jpeg'), etag)
+
+
+@archive.get("/display-page")
+def display_page_instance():
+    """Navigates to page of specific url with the archived html framed and a download link."""
+
+    url = request.args.get('url')
+    html_key = request.args.get('html_file')
+    timestamp = request.args.get('timestamp')
+
+    page = render_template('display_page_instance.html',
                            html_key=html_key,
-                           local_filename=local_filename,
                            url=url,
                            timestamp=timestamp)
 
+    # tagged by what was rendered, so a new template or app version gets a new ETag
+    etag = snapshot_etag(html_key, page)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, add_revalidated_headers)
 
-@app.route('/view/<local_filename>')
-def view_file(local_filename):
-    """Allows user to view archived webpage."""
+    return add_revalidated_headers(make_response(page), etag)
+
+
+DIFF_MODES = {
+    'text': extract_visible_lines,
+    'structure': extract_outline_lines
+}
+
+
+def write_capture_diff(path: str, key_a: str, key_b: str, mode: str) -> None:
+    """Diffs the text or element outline of two archived HTML files, writing the result as JSON."""
+
+    s3_client = get_shared_s3_client()
+    lines = [DIFF_MODES[mode](BeautifulSoup(s3_cache.read(s3_client, environ['S3_BUCKET'], key),
+                                            'html.parser'))
+             for key in (key_a, key_b)]
 
-    remove_html_files('static')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'a': key_a, 'b': key_b, 'mode': mode, **diff_lines(*lines)}, file)
 
-    filename = local_filename.replace('_', '/')
 
-    s3_client = get_s3_client(environ)
-    html_object = get_object_from_s3(s3_client, environ['S3_BUCKET'], filename)
+def submit_capture_diff(key_a: str, key_b: str, mode: str) -> Future:
+    """Returns a future for the local path of a diff, joining the work if it is already running.
+
+    Captures never change, so finished diffs are kept in the S3 disk cache.
+    """
+
+    name = f"diff:{mode}:{environ['S3_BUCKET']}/{key_a}\n{key_b}"
+
+    with running_diffs_lock:
+        future = running_diffs.get(name)
+        if future is None:
+            future = diff_executor.submit(
+                s3_cache.fetch_generated, name,
+                lambda path: write_capture_diff(path, key_a, key_b, mode))
+            running_diffs[name] = future
+            future.add_done_callback(lambda _: running_diffs.pop(name, None))
+
+    return future
+
+
+@archive.get('/diff')
+def capture_diff():
+    """Returns, as JSON, the lines changed between captures ?a= and ?b= of a page."""
+
+    key_a = request.args.get('a', '')
+    key_b = request.args.get('b', '')
+    mode = request.args.get('mode', 'text')
+
+    if not (key_a.endswith(HTML_FILE_FORMAT) and key_b.endswith(HTML_FILE_FORMAT)):
+        return jsonify({'error': "a and b must be the keys of two archived HTML files."}), 400
+    if mode not in DIFF_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(DIFF_MODES)}."}), 400
+
+    etag = snapshot_etag(key_a, key_b, mode, 'diff')
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    future = submit_capture_diff(key_a, key_b, mode)
+    wait([future], timeout=DIFF_DEADLINE_SECONDS)
+
+    if not future.done():
+        response = jsonify({'status': 'pending'})
+        response.status_code = 202
+        response.headers['Retry-After'] = DIFF_RETRY_AFTER_SECONDS
+        return response
+
+    try:
+        path = future.result()
+    except ClientError as error:
+        if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+            abort(404)
+        raise
 
-    local_filename = filename.replace('/', '_')
+    return add_immutable_headers(send_file(path, mimetype='application/json'), etag)
 
-    local_path = os.path.join('static', local_filename)
-    with open(local_path, 'w', encoding='utf-8') as file:
-        file.write(html_object)
 
-    return send_from_directory('static', local_filename)
+def stream_snapshot(key: str, etag: str, download_name: str = None) -> Response:
+    """Streams an archived object from S3 into the response, honouring Range requests."""
 
+    s3_client = get_shared_s3_client()
+    accepts_gzip = 'gzip' in request.accept_encodings
+    byte_range = request.headers.get('Range') if request.range else None
 
-@app.route('/download/<local_filename>')
-def download_file(local_filename):
+    try:
+        s3_response = open_object_stream(
+            s3_client, environ['S3_BUCKET'], key, byte_range)
+        stored_gzip = s3_response.get('ContentEncoding') == 'gzip'
+
+        if stored_gzip and not accepts_gzip and byte_range is not None:
+            # a range of the compressed bytes is useless to this client
+            s3_response['Body'].close()
+            byte_range = None
+            s3_response = open_object_stream(
+                s3_client, environ['S3_BUCKET'], key)
+
+    except ClientError as error:
+        code = error.response.get('Error', {}).get('Code')
+        if code == 'InvalidRange':
+            return Response(status=416)
+        if code in ('NoSuchKey', '404'):
+            abort(404)
+        raise
+
+    decompress = stored_gzip and not accepts_gzip
+    response = Response(iter_object_chunks(s3_response, decompress=decompress),
+                        status=206 if s3_response.get('ContentRange') else 200,
+                        mimetype='text/html',
+                        direct_passthrough=True)
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if s3_response.get('ContentRange'):
+        response.headers['Content-Range'] = s3_response['ContentRange']
+    if stored_gzip and not decompress:
+        response.headers['Content-Encoding'] = 'gzip'
+    if not decompress and s3_response.get('ContentLength') is not None:
+        response.headers['Content-Length'] = s3_response['ContentLength']
+    if download_name is not None:
+        response.headers.set('Content-Disposition', 'attachment',
+                             filename=download_name)
+    else:
+        # archived pages run in an opaque origin, as they did from a data: URI
+        response.headers['Content-Security-Policy'] = SNAPSHOT_SANDBOX
+
+    return add_immutable_headers(response, etag)
+
+
+def snapshot_key(key: str) -> str:
+    """Returns the S3 key a /view or /download link is for.
+
+    Links are made with the real key; older links replaced its slashes with underscores,
+    which is only undone for keys with no slash at all, as every capture key has one.
+    """
+
+    return key if '/' in key else key.replace('_', '/')
+
+
+@archive.route('/view/<path:key>')
+def view_file(key):
+    """Allows user to view archived webpage."""
+
+    filename = snapshot_key(key)
+
+    etag = snapshot_etag(filename)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    return stream_snapshot(filename, etag)
+
+
+@archive.route('/download/<path:key>')
+def download_file(key):
     """Allows user to download archived webpage."""
 
-    remove_html_files('static')
+    filename = snapshot_key(key)
+
+    etag = snapshot_etag(filename, 'download')
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    return stream_snapshot(filename, etag, download_name=filename)
+
+
+def collect_gauges() -> dict[str, tuple[str, float]]:
+    """Returns the current size of this worker's pools, caches and queues."""
+
+    pool = db_pool.stats()
+    disk_cache = s3_cache.stats()
+    interactions = interaction_buffer.stats()
+
+    return {
+        'db_pool_max_connections': ("Most database connections the pool will open.", pool['max']),
+        'db_pool_in_use_connections': ("Database connections lent out.", pool['in_use']),
+        'db_pool_idle_connections': ("Open database connections waiting to be reused.", pool['idle']),
+        'db_pool_waits_total': ("Requests that waited for a free connection.", pool['waits']),
+        'response_cache_hits_total': ("Listing pages served from the cache.", response_cache.hits),
+        'response_cache_misses_total': ("Listing pages rebuilt.", response_cache.misses),
+        'response_cache_entries': ("Entries held by the listing cache.", response_cache.backend.size()),
+        's3_cache_hits_total': ("S3 objects served from local disk.", disk_cache['hits']),
+        's3_cache_misses_total': ("S3 objects downloaded to local disk.", disk_cache['misses']),
+        's3_cache_evictions_total': ("Files evicted from the S3 disk cache.", disk_cache['evictions']),
+        's3_cache_bytes': ("Estimated size of the S3 disk cache.", disk_cache['bytes']),
+        's3_cache_max_bytes': ("Size the S3 disk cache is kept under.", disk_cache['max_bytes']),
+        'interaction_buffer_queued': ("Interactions waiting to be written.", interaction_buffer.size()),
+        'interaction_buffer_written_total': ("Interactions written to the database.",
+                                             interactions['written']),
+        'interaction_buffer_dropped_total': ("Interactions dropped because the buffer was full "
+                                             "or they could not be written.",
+                                             interactions['dropped']),
+        'bulk_capture_pending': ("Bulk-submitted urls queued or being captured.",
+                                 bulk_capturer.pending()),
+        'cold_start_seconds': ("Time from importing the app to it being ready.",
+                               current_app.config.get('COLD_START_SECONDS', 0))
+    }
+
+
+@archive.get('/metrics')
+def prometheus_metrics():
+    """Exposes this worker's latency histograms and gauges for Prometheus to scrape."""
+
+    return Response(metrics.render(collect_gauges()),
+                    mimetype='text/plain; version=0.0.4')
+
+
+def check_admin_token() -> None:
+    """Aborts unless the request carries ADMIN_TOKEN; admin routes are hidden when it is unset."""
 
-    filename = local_filename.replace('_', '/')
+    token = environ.get('ADMIN_TOKEN')
+    if not token:
+        abort(404)
 
-    # Download the HTML file from S3
-    s3_client = get_s3_client(environ)
-    html_object = get_object_from_s3(s3_client, environ['S3_BUCKET'], filename)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+        abort(401)
 
-    local_filename = filename.replace('/', '_')
 
-    # Save the HTML content locally
-    local_path = os.path.join('static', local_filename)
-    with open(local_path, 'w', encoding='utf-8') as file:
-        file.write(html_object)
+@archive.post('/admin/profile')
+def profile():
+    """Profiles this worker for ?seconds=, or the next ?requests= to ?route=, as collapsed stacks."""
 
-    # Serve the file using send_from_directory
-    # return send_from_directory('static', local_filename)
+    check_admin_token()
 
-    return send_file(local_path, as_attachment=True, download_name=filename)
+    route = request.args.get('route')
 
+    try:
+        if route:
+            if route not in {rule.rule for rule in current_app.url_map.iter_rules()}:
+                return jsonify({'error': f"No route matches {route}."}), 400
+
+            count = request.args.get('requests', 1, type=int)
+            if not 0 < count <= MAX_PROFILED_REQUESTS:
+                return jsonify({'error': f"requests must be 1 to {MAX_PROFILED_REQUESTS}."}), 400
+
+            timeout = request.args.get('timeout', MAX_PROFILE_SECONDS, type=float)
+            folded, samples = profiler.profile_requests(
+                route, count, min(timeout, MAX_PROFILE_SECONDS))
+        else:
+            seconds = request.args.get('seconds', DEFAULT_PROFILE_SECONDS, type=float)
+            if not 0 < seconds <= MAX_PROFILE_SECONDS:
+                return jsonify({'error': f"seconds must be up to {MAX_PROFILE_SECONDS}."}), 400
+
+            folded, samples = profiler.profile_for(seconds)
+
+    except ProfilerBusy as error:
+        return jsonify({'error': str(error)}), 409
+
+    response = Response(folded + '\n', mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = samples
+    # only this worker was sampled; requests served by the other workers are not included
+    response.headers['X-Profile-Worker'] = os.getpid()
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers.set('Content-Disposition', 'attachment', filename='profile.folded')
+
+    return response
 
-@app.route('/limitations')
+
+@archive.route('/limitations')
 def limitations():
     """Renders the web page that states the limitations of our application at its current stage."""
 
     return render_template('limitations.html')
 
 
+def create_app(started_at: float = None) -> Flask:
+    """Creates the Flask app; Chrome, OpenAI, S3 and the database are set up on first use."""
+    started_at = started_at or perf_counter()
+
+    app = Flask(__name__)
+    app.register_blueprint(archive)
+    metrics.init_app(app)
+    profiler.init_app(app)
+
+    app.config['COLD_START_SECONDS'] = perf_counter() - started_at
+    logging.info("App created --- %ss.", round(app.config['COLD_START_SECONDS'], 3))
+
+    return app
+
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    create_app().run(debug=True, port=5000, host='0.0.0.0')
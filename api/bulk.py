@@ -0,0 +1,143 @@
+"""Parses, normalises and captures lists of urls submitted in bulk."""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+import csv
+import io
+import logging
+import threading
+
+MAX_BULK_URLS = 5000
+BULK_WORKERS = 8
+URL_COLUMN = 'url'
+
+
+def normalise_url(raw: str) -> str | None:
+    """Returns a url in a canonical form, or None if it is not an http(s) url.
+
+    Urls without a scheme are assumed to be https; the scheme and host are
+    lowercased and the fragment dropped, but the path and query are kept as given.
+    """
+
+    raw = (raw or '').strip()
+    if not raw or any(character.isspace() for character in raw):
+        return None
+
+    if '://' not in raw:
+        raw = f"https://{raw}"
+
+    try:
+        parts = urlsplit(raw)
+        port = parts.port
+    except ValueError:
+        return None
+
+    if parts.scheme.lower() not in ('http', 'https') or not parts.hostname or parts.username:
+        return None
+
+    netloc = parts.hostname if port is None else f"{parts.hostname}:{port}"
+
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or '/', parts.query, ''))
+
+
+def normalise_urls(raw_urls: list) -> tuple[list[str], list[str], int]:
+    """Normalises urls, keeping the first of any duplicates in their original order.
+
+    Returns the urls, the entries that were not valid urls and how many duplicates were removed.
+    """
+
+    urls = []
+    seen = set()
+    invalid = []
+    duplicates = 0
+
+    for raw in raw_urls:
+        url = normalise_url(raw) if isinstance(raw, str) else None
+        if url is None:
+            invalid.append(str(raw))
+        elif url in seen:
+            duplicates += 1
+        else:
+            seen.add(url)
+            urls.append(url)
+
+    return urls, invalid, duplicates
+
+
+def parse_json_urls(payload) -> list:
+    """Returns the urls from a JSON list, or from an object with a "urls" list."""
+
+    if isinstance(payload, dict):
+        payload = payload.get('urls')
+
+    if not isinstance(payload, list):
+        raise ValueError('Expected a JSON list of urls or an object with a "urls" list.')
+
+    return payload
+
+
+def parse_csv_urls(text: str) -> list[str]:
+    """Returns the urls from a CSV, taken from its "url" column or else its first column."""
+
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+
+    header = [cell.strip().lower() for cell in rows[0]]
+    if URL_COLUMN in header:
+        column = header.index(URL_COLUMN)
+        rows = rows[1:]
+    else:
+        column = 0
+
+    return [row[column] for row in rows if len(row) > column]
+
+
+class BulkCapturer:
+    """Captures the urls of each batch on a bounded pool of threads, recording their progress.
+
+    capture(url) saves one page and returns its url_id; record_status(batch_id,
+    position, status, error, url_id) stores each url's progress where every worker
+    can read it.
+    """
+
+    def __init__(self, capture, record_status, max_workers: int = BULK_WORKERS):
+        self.capture = capture
+        self.record_status = record_status
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='bulk')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, batch_id: str, urls: list[str]) -> None:
+        """Queues every url of a batch for capture."""
+
+        with self._lock:
+            self._pending += len(urls)
+
+        for position, url in enumerate(urls):
+            self._executor.submit(self._run, batch_id, position, url)
+
+    def pending(self) -> int:
+        """Returns the number of urls queued or being captured."""
+
+        with self._lock:
+            return self._pending
+
+    def _run(self, batch_id: str, position: int, url: str) -> None:
+        """Captures one url, recording whether it was saved."""
+
+        try:
+            self.record_status(batch_id, position, 'running')
+            try:
+                url_id = self.capture(url)
+            except Exception as error:
+                logging.warning("Bulk capture of %s failed: %s", url, error)
+                self.record_status(batch_id, position, 'failed',
+                                   error=str(error) or type(error).__name__)
+            else:
+                self.record_status(batch_id, position, 'saved', url_id=url_id)
+        except Exception:
+            logging.exception("Could not record the progress of %s.", url)
+        finally:
+            with self._lock:
+                self._pending -= 1
@@ -0,0 +1,175 @@
+"""A TTL cache for rendered view models, with single-flight recompute and explicit invalidation."""
+from contextlib import contextmanager
+from os import _Environ
+from time import monotonic
+import json
+import logging
+import threading
+
+DEFAULT_TTL_SECONDS = 300
+LOCK_TIMEOUT_SECONDS = 60
+KEY_PREFIX = 'internet-archiver:'
+
+
+class MemoryCacheBackend:
+    """Keeps entries in this process; each Gunicorn worker has its own copy."""
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: str):
+        """Returns the value stored for a key, or None if missing or expired."""
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= monotonic():
+            self._entries.pop(key, None)
+            return None
+
+        return value
+
+    def set(self, key: str, value, ttl: float) -> None:
+        """Stores a value for ttl seconds."""
+
+        self._entries[key] = (monotonic() + ttl, value)
+
+    def delete(self, *keys: str) -> None:
+        """Removes keys from the cache."""
+
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def size(self) -> int:
+        """Returns the number of entries held, including any not yet purged."""
+
+        return len(self._entries)
+
+    @contextmanager
+    def lock(self, key: str):
+        """Holds a per-key lock so only one thread recomputes a missing entry."""
+
+        with self._guard:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            yield
+
+
+class RedisCacheBackend:
+    """Keeps entries in Redis so every worker on the host shares them.
+
+    Values are stored as JSON, so anyone able to write to Redis cannot run code in the workers.
+    """
+
+    def __init__(self, redis_url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImportError(
+                "CACHE_REDIS_URL is set but the redis package is not installed!") from exc
+
+        self._redis = redis
+        self._client = redis.Redis.from_url(redis_url)
+
+    def get(self, key: str):
+        """Returns the value stored for a key, or None if missing or expired."""
+
+        value = self._client.get(KEY_PREFIX + key)
+        if value is None:
+            return None
+
+        try:
+            return json.loads(value)
+        except ValueError:
+            # written in another format, such as by an older version; rebuilt as a miss
+            return None
+
+    def set(self, key: str, value, ttl: float) -> None:
+        """Stores a value for ttl seconds."""
+
+        self._client.set(KEY_PREFIX + key, json.dumps(value), ex=int(ttl))
+
+    def delete(self, *keys: str) -> None:
+        """Removes keys from the cache."""
+
+        if keys:
+            self._client.delete(*[KEY_PREFIX + key for key in keys])
+
+    def size(self) -> int:
+        """Returns the number of entries held under this app's prefix."""
+
+        return sum(1 for _ in self._client.scan_iter(match=KEY_PREFIX + '*'))
+
+    @contextmanager
+    def lock(self, key: str):
+        """Holds a Redis lock so only one worker recomputes a missing entry."""
+
+        redis_lock = self._client.lock(f"{KEY_PREFIX}lock:{key}",
+                                       timeout=LOCK_TIMEOUT_SECONDS,
+                                       blocking_timeout=LOCK_TIMEOUT_SECONDS)
+        try:
+            acquired = redis_lock.acquire()
+        except self._redis.RedisError as error:
+            logging.warning("Cache lock unavailable for %s: %s", key, error)
+            acquired = False
+
+        try:
+            yield
+        finally:
+            if acquired:
+                try:
+                    redis_lock.release()
+                except self._redis.exceptions.LockError:
+                    pass
+
+
+class ResponseCache:
+    """Read-through cache where concurrent misses on a key trigger one recompute."""
+
+    def __init__(self, backend, default_ttl: float = DEFAULT_TTL_SECONDS):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: str, compute, ttl: float = None):
+        """Returns the cached value for key, calling compute() to fill it on a miss."""
+
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        with self.backend.lock(key):
+            # another thread or worker may have filled it while we waited
+            value = self.backend.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            value = compute()
+            if value is not None:
+                self.backend.set(key, value, ttl or self.default_ttl)
+
+        return value
+
+    def invalidate(self, *keys: str) -> None:
+        """Drops keys so the next request recomputes them."""
+
+        self.backend.delete(*keys)
+
+
+def get_cache_backend(config: _Environ):
+    """Returns a Redis backend if CACHE_REDIS_URL is configured, otherwise an in-process one."""
+
+    redis_url = config.get('CACHE_REDIS_URL')
+    if redis_url:
+        return RedisCacheBackend(redis_url)
+
+    return MemoryCacheBackend()
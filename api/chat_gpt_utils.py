@@ -1,7 +1,9 @@
 """Script for Open AI functions."""
 
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from lazy import lazy
+from metrics import metrics
 
 GPT_3_MODEL = 'gpt-3.5-turbo-1106'
 GPT_4_MODEL = 'gpt-4-1106-preview'
@@ -10,6 +12,14 @@ GPT_4_MODEL = 'gpt-4-1106-preview'
 load_dotenv()
 
 
+@lazy
+def get_openai_client():
+    """Creates the OpenAI client shared by every request, importing the SDK on first use."""
+    from openai import OpenAI
+
+    return OpenAI()
+
+
 def read_html_file(file_path: str) -> str:
     """Reads in HTML file."""
 
@@ -18,13 +28,14 @@ def read_html_file(file_path: str) -> str:
     return html_content
 
 
+@metrics.timed('openai')
 def generate_summary(html_content, gpt_model: str = GPT_3_MODEL):
     """Generates summary of HTML content"""
 
     max_html_tokens = 10000 if gpt_model == GPT_3_MODEL else 50000
     html_content = html_content[:max_html_tokens]
 
-    client = OpenAI()
+    client = get_openai_client()
 
     prompt = """You are an elite web content curator, renowned for crafting compelling and succinct summaries of web pages. Your expertise lies in distilling the essence of a webpage's content and function, with a primary focus on conveying what the page is about. 
 
@@ -46,13 +57,14 @@ Your mission is to make each summary an invitation, sparking curiosity and encou
     return completion.choices[0].message.content
 
 
+@metrics.timed('openai')
 def generate_genre(html_content, gpt_model: str = GPT_3_MODEL):
     """Generates genre from HTML content"""
 
     max_html_tokens = 10000 if gpt_model == GPT_3_MODEL else 50000
     html_content = html_content[:max_html_tokens]
 
-    client = OpenAI()
+    client = get_openai_client()
 
     prompt = """Here are some common website types or categories that we want to use for our internet archiver website:
 
@@ -1,10 +1,37 @@
-"""Contains a function to connect to the database."""
+"""Contains a function to connect to the database, and a pool to reuse connections."""
+from contextlib import contextmanager
 from time import perf_counter
 from os import environ
 import logging
+import threading
 
 from psycopg2 import connect, DatabaseError, OperationalError, extensions
 
+from metrics import calling_function, metrics
+
+DEFAULT_POOL_SIZE = 10
+UNTIMED_MODULES = ('psycopg2', __name__)
+
+
+class TimedCursor(extensions.cursor):
+    """A cursor that records how long each query takes, labelled by the function running it."""
+
+    def execute(self, query, vars=None):
+        started = perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.observe_dependency('db', calling_function(UNTIMED_MODULES),
+                                       perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            metrics.observe_dependency('db', calling_function(UNTIMED_MODULES),
+                                       perf_counter() - started)
+
 
 def get_connection(environ: environ) -> extensions.connection:
     """Connects to the postgres database hosted on aws RDS."""
@@ -15,7 +42,8 @@ def get_connection(environ: environ) -> extensions.connection:
         conn = connect(user=environ["DB_USERNAME"],
                        dbname=environ["DB_NAME"],
                        password=environ["DB_PASSWORD"],
-                       host=environ["DB_IP"])
+                       host=environ["DB_IP"],
+                       cursor_factory=TimedCursor)
 
         logging.info("Connected --- %ss.",
                      round(perf_counter() - connect_time, 3))
@@ -25,3 +53,110 @@ def get_connection(environ: environ) -> extensions.connection:
         logging.warning("%s --- %ss.",
                         error, round(perf_counter() - connect_time, 3))
         raise error
+
+
+class ConnectionPool:
+    """Shares up to DB_POOL_SIZE connections between threads, opening each on first use.
+
+    Callers beyond the limit wait for a connection to be returned. Connections
+    are rolled back when returned, and ones that have broken are discarded.
+    """
+
+    def __init__(self, config: environ):
+        self.config = config
+        self.waits = 0
+        self._idle = []
+        self._in_use = 0
+        self._slots = None
+        self._lock = threading.Lock()
+
+    @property
+    def max_connections(self) -> int:
+        """Returns the most connections the pool will open."""
+
+        return int(self.config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE))
+
+    @contextmanager
+    def connection(self):
+        """Lends out a connection for the duration of a with block."""
+
+        slots = self._get_slots()
+        if not slots.acquire(blocking=False):
+            self.waits += 1
+            slots.acquire()
+
+        try:
+            conn = self._checkout()
+        except BaseException:
+            slots.release()
+            raise
+
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+            slots.release()
+
+    def stats(self) -> dict:
+        """Returns how many connections are open, in use and idle."""
+
+        with self._lock:
+            return {
+                'max': self.max_connections,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waits': self.waits
+            }
+
+    def close(self) -> None:
+        """Closes the idle connections."""
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for conn in idle:
+            conn.close()
+
+    def _get_slots(self) -> threading.BoundedSemaphore:
+        """Creates the semaphore limiting connections once the config has been loaded."""
+
+        with self._lock:
+            if self._slots is None:
+                self._slots = threading.BoundedSemaphore(self.max_connections)
+
+            return self._slots
+
+    def _checkout(self) -> extensions.connection:
+        """Returns the most recently used open connection, or a new one."""
+
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if not conn.closed:
+                    self._in_use += 1
+                    return conn
+
+        conn = get_connection(self.config)
+        with self._lock:
+            self._in_use += 1
+
+        return conn
+
+    def _checkin(self, conn: extensions.connection) -> None:
+        """Returns a connection to the pool, ending any transaction left open."""
+
+        with self._lock:
+            self._in_use -= 1
+
+        if conn.closed:
+            return
+
+        try:
+            if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except DatabaseError:
+            conn.close()
+            return
+
+        with self._lock:
+            self._idle.append(conn)
@@ -0,0 +1,190 @@
+"""Line diffs between two captures, using Myers' O(ND) algorithm."""
+
+MAX_EDITS = 1000
+CONTEXT_LINES = 3
+
+
+def trim_common(a: list, b: list) -> tuple[int, int]:
+    """Returns the lengths of the common prefix and, after it, the common suffix."""
+
+    prefix = 0
+    while prefix < len(a) and prefix < len(b) and a[prefix] == b[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while (suffix < len(a) - prefix and suffix < len(b) - prefix
+           and a[-1 - suffix] == b[-1 - suffix]):
+        suffix += 1
+
+    return prefix, suffix
+
+
+def shortest_edit(a: list, b: list, max_edits: int) -> list[tuple[int, int]] | None:
+    """Returns the (x, y) points of a shortest edit path from a to b, or None if it is too long.
+
+    Takes O((N + M) * D) time for D edits, so similar captures diff in close to
+    linear time, and O(D^2) memory to retrace the path.
+    """
+
+    n, m = len(a), len(b)
+    limit = min(n + m, max_edits)
+    offset = limit + 1
+    # furthest[offset + k] is the furthest x reached on diagonal k = x - y
+    furthest = [0] * (2 * limit + 3)
+    trace = []
+
+    for edits in range(limit + 1):
+        trace.append(furthest[offset - edits - 1:offset + edits + 2])
+        for diagonal in range(-edits, edits + 1, 2):
+            if diagonal == -edits or (diagonal != edits and furthest[offset + diagonal - 1]
+                                      < furthest[offset + diagonal + 1]):
+                x = furthest[offset + diagonal + 1]
+            else:
+                x = furthest[offset + diagonal - 1] + 1
+            y = x - diagonal
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            furthest[offset + diagonal] = x
+
+            if x >= n and y >= m:
+                return backtrack(trace, n, m)
+
+    return None
+
+
+def backtrack(trace: list[list[int]], x: int, y: int) -> list[tuple[int, int]]:
+    """Walks back from the end to the start, through the points each step reached."""
+
+    points = [(x, y)]
+
+    for edits in range(len(trace) - 1, 0, -1):
+        # trace[edits] holds diagonals -edits - 1 to edits + 1 as they were before the step
+        furthest = trace[edits]
+        diagonal = x - y
+        if diagonal == -edits or (diagonal != edits and furthest[diagonal + edits]
+                                  < furthest[diagonal + edits + 2]):
+            previous = diagonal + 1
+        else:
+            previous = diagonal - 1
+        previous_x = furthest[previous + edits + 1]
+        previous_y = previous_x - previous
+
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            points.append((x, y))
+        x, y = previous_x, previous_y
+        points.append((x, y))
+
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        points.append((x, y))
+
+    return points[::-1]
+
+
+def diff_opcodes(a: list, b: list, max_edits: int = MAX_EDITS) -> tuple[list[tuple], bool]:
+    """Returns difflib-style (tag, a_start, a_end, b_start, b_end) opcodes turning a into b.
+
+    Tags are 'equal', 'delete' and 'insert'. If more than max_edits lines differ the
+    changed middle is reported as one delete and one insert, and the flag returned
+    alongside the opcodes is True.
+    """
+
+    prefix, suffix = trim_common(a, b)
+    middle_a = a[prefix:len(a) - suffix]
+    middle_b = b[prefix:len(b) - suffix]
+
+    points = shortest_edit(middle_a, middle_b, max_edits)
+    truncated = points is None
+    if truncated:
+        points = [(0, 0), (len(middle_a), 0), (len(middle_a), len(middle_b))]
+
+    steps = []
+    for (x, y), (next_x, next_y) in zip(points, points[1:]):
+        if next_x > x and next_y > y:
+            tag = 'equal'
+        elif next_x > x:
+            tag = 'delete'
+        else:
+            tag = 'insert'
+        steps.append((tag, x + prefix, next_x + prefix, y + prefix, next_y + prefix))
+
+    opcodes = []
+    if prefix:
+        opcodes.append(('equal', 0, prefix, 0, prefix))
+    for step in steps:
+        if step[1] == step[2] and step[3] == step[4]:
+            continue
+        if opcodes and opcodes[-1][0] == step[0]:
+            tag, a_start, _, b_start, _ = opcodes.pop()
+            step = (tag, a_start, step[2], b_start, step[4])
+        opcodes.append(step)
+    if suffix:
+        opcodes.append(('equal', len(a) - suffix, len(a), len(b) - suffix, len(b)))
+
+    return opcodes, truncated
+
+
+def group_hunks(opcodes: list[tuple], a: list[str], b: list[str],
+                context: int = CONTEXT_LINES) -> list[dict]:
+    """Groups changes, with up to context unchanged lines either side, into unified-diff hunks.
+
+    Each hunk's lines are [op, text] pairs, op being ' ', '-' or '+'.
+    """
+
+    hunks = []
+    hunk = None
+
+    for index, (tag, a_start, a_end, b_start, b_end) in enumerate(opcodes):
+        if tag == 'equal':
+            if hunk is None:
+                continue
+            # close the hunk unless a later change is near enough to share it
+            is_last = index == len(opcodes) - 1
+            if is_last or a_end - a_start > 2 * context:
+                trailing = min(context, a_end - a_start)
+                hunk['lines'].extend([' ', line] for line in a[a_start:a_start + trailing])
+                hunk['a_lines'] += trailing
+                hunk['b_lines'] += trailing
+                hunks.append(hunk)
+                hunk = None
+            else:
+                hunk['lines'].extend([' ', line] for line in a[a_start:a_end])
+                hunk['a_lines'] += a_end - a_start
+                hunk['b_lines'] += b_end - b_start
+            continue
+
+        if hunk is None:
+            leading = min(context, a_start - opcodes[index - 1][1]) if index else 0
+            hunk = {'a_start': a_start - leading + 1, 'a_lines': leading,
+                    'b_start': b_start - leading + 1, 'b_lines': leading,
+                    'lines': [[' ', line] for line in a[a_start - leading:a_start]]}
+
+        if tag == 'delete':
+            hunk['lines'].extend(['-', line] for line in a[a_start:a_end])
+            hunk['a_lines'] += a_end - a_start
+        else:
+            hunk['lines'].extend(['+', line] for line in b[b_start:b_end])
+            hunk['b_lines'] += b_end - b_start
+
+    if hunk is not None:
+        hunks.append(hunk)
+
+    return hunks
+
+
+def diff_lines(a: list[str], b: list[str], max_edits: int = MAX_EDITS,
+               context: int = CONTEXT_LINES) -> dict:
+    """Returns the lines added and removed between a and b, and the hunks that changed."""
+
+    opcodes, truncated = diff_opcodes(a, b, max_edits)
+
+    return {
+        'added': sum(b_end - b_start for tag, _, _, b_start, b_end in opcodes if tag == 'insert'),
+        'removed': sum(a_end - a_start for tag, a_start, a_end, _, _ in opcodes if tag == 'delete'),
+        'truncated': truncated,
+        'hunks': group_hunks(opcodes, a, b, context)
+    }
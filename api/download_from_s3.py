@@ -2,16 +2,22 @@
 
 from datetime import datetime
 from os import environ
+import zlib
 
 from boto3 import client
 from dotenv import load_dotenv
 
+from s3_cache import get_s3_cache_from_config
+
 BUCKET = 'c9-internet-archiver-bucket'
 USER_FRIENDLY_FORMAT = '%d %B %Y - %I:%M %p'
 IMAGE_FILE_FORMAT = '.png'
+STREAM_CHUNK_SIZE = 64 * 1024
 
 load_dotenv()
 
+s3_cache = get_s3_cache_from_config(environ)
+
 
 def get_s3_client() -> client:
     """Gets S3 client."""
@@ -101,25 +107,41 @@ def format_object_key_titles(keys: list[str]) -> list[str] | None:
     return set(formatted_keys)
 
 
-def download_data_file(s3_client: client, bucket: str, key: str, folder_name: str) -> str | None:
-    """Downloads the files with relevant keys to a folder name of choice."""
+def get_object_from_s3(s3_client: client, bucket: str, filename: str) -> str:
+    """Accesses the html content directly from the s3 bucket and return it as a string."""
+    html = s3_cache.read(s3_client, bucket, filename).decode('utf-8')
+    return html
 
-    new_filename = key.replace('/', '_')
 
-    print(f"\nDownloading: {key}")
-    try:
-        s3_client.download_file(bucket, key, f"{folder_name}/{new_filename}")
-    except:
-        return
+def open_object_stream(s3_client: client, bucket: str, key: str, byte_range: str = None) -> dict:
+    """Starts a GET for an object, or a byte range of it, without reading the body."""
 
-    return new_filename
+    if byte_range is None:
+        return s3_client.get_object(Bucket=bucket, Key=key)
 
+    return s3_client.get_object(Bucket=bucket, Key=key, Range=byte_range)
 
-def get_object_from_s3(s3_client: client, bucket: str, filename: str) -> str:
-    """Accesses the html content directly from the s3 bucket and return it as a string."""
-    response = s3_client.get_object(Bucket=bucket, Key=filename)
-    html = response['Body'].read().decode('utf-8')
-    return html
+
+def iter_object_chunks(response: dict, chunk_size: int = STREAM_CHUNK_SIZE,
+                       decompress: bool = False):
+    """Yields an object's body in chunks, gunzipping on the fly if asked to."""
+
+    body = response['Body']
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if decompress else None
+
+    try:
+        for chunk in body.iter_chunks(chunk_size):
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            if chunk:
+                yield chunk
+
+        if decompressor is not None:
+            tail = decompressor.flush()
+            if tail:
+                yield tail
+    finally:
+        body.close()
 
 
 def get_all_screenshots(html_files: list[str]) -> list[str]:
@@ -1,5 +1,6 @@
 """Contains functions to extract data from the database."""
 from time import perf_counter
+from datetime import datetime
 from os import environ
 import logging
 
@@ -8,6 +9,33 @@ from psycopg2 import sql, extensions
 
 from connect import get_connection
 
+SEARCH_PAGE_SIZE = 12
+HISTORY_PAGE_SIZE = 24
+MAX_RANKED_MATCHES = 1000
+EXACT_MATCH = 'exact'
+PREFIX_MATCH = 'prefix'
+
+
+def escape_like(text: str) -> str:
+    """Escapes LIKE wildcards so user input is matched literally."""
+
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def match_condition(column: sql.Composable, value: str,
+                    match: str) -> tuple[sql.Composable, str]:
+    """Returns a condition matching column to value exactly or as a prefix, and its parameter.
+
+    Both can use a text_pattern_ops index, so they stay O(log n) as the archive grows.
+    """
+
+    if match == EXACT_MATCH:
+        return sql.SQL("{column} = %s").format(column=column), value
+    if match == PREFIX_MATCH:
+        return sql.SQL("{column} LIKE %s").format(column=column), f"{escape_like(value)}%"
+
+    raise ValueError(f"match must be {EXACT_MATCH} or {PREFIX_MATCH}.")
+
 
 def extract_data(conn: extensions.connection, url: str) -> list[tuple]:
     """Extracts data from the database relating to a specified url."""
@@ -41,83 +69,146 @@ def extract_data(conn: extensions.connection, url: str) -> list[tuple]:
     return rows
 
 
-def get_url(s3_ref: str, conn: extensions.connection) -> str:
-    """Gets the url from the database, given an s3_ref."""
+def get_url(s3_ref: str, conn: extensions.connection, match: str = PREFIX_MATCH) -> str:
+    """Gets the url from the database, given an s3_ref or, by default, the start of one."""
 
-    query = f"""SELECT url FROM url
+    condition, value = match_condition(sql.Identifier('html_s3_ref'), s3_ref, match)
+    query = sql.SQL("""SELECT url FROM url
                  JOIN page_scrape ON url.url_id = page_scrape.url_id
-                 WHERE html_s3_ref LIKE '%{s3_ref}%'"""
+                 WHERE {condition}
+                 LIMIT 1;""").format(condition=condition)
 
     with conn.cursor() as cur:
-        cur.execute(query)
-        rows = cur.fetchall()
-        try:
-            if len(rows):
-                url_extract = rows[0][0]
-                return url_extract
+        cur.execute(query, (value,))
+        row = cur.fetchone()
+
+    if row is None:
+        return "Empty Database!"
+
+    return row[0]
+
+
+def get_urls(conn: extensions.connection, s3_refs: list[str],
+             match: str = PREFIX_MATCH) -> dict[str, str]:
+    """Gets the url of each s3_ref or, by default, the start of one, in one query.
+
+    S3 refs with no capture are left out of the dict returned.
+    """
+
+    if match == EXACT_MATCH:
+        condition = sql.SQL("{html_s3_ref} = ref.s3_ref")
+    elif match == PREFIX_MATCH:
+        # keys starting with a prefix sort straight after it, so the first key at or
+        # after it is read from the text_pattern_ops index and checked, where a LIKE
+        # pattern built per row could not use the index
+        condition = sql.SQL("{html_s3_ref} ~>=~ ref.s3_ref")
+    else:
+        raise ValueError(f"match must be {EXACT_MATCH} or {PREFIX_MATCH}.")
+
+    query = sql.SQL("""SELECT ref.s3_ref, {url}
+                    FROM unnest(%s::text[]) AS ref(s3_ref)
+                    JOIN LATERAL (
+                        SELECT {page_scrape}.{url_id}, {html_s3_ref} FROM {page_scrape}
+                        WHERE {condition}
+                        ORDER BY {html_s3_ref} USING ~<~
+                        LIMIT 1) AS capture ON starts_with(capture.{html_s3_ref}, ref.s3_ref)
+                    JOIN {url_table} ON {url_table}.{url_id} = capture.{url_id};""").format(
+        condition=condition.format(html_s3_ref=sql.Identifier('html_s3_ref')),
+        url=sql.Identifier('url'),
+        url_id=sql.Identifier('url_id'),
+        html_s3_ref=sql.Identifier('html_s3_ref'),
+        page_scrape=sql.Identifier('page_scrape'),
+        url_table=sql.Identifier('url'))
 
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+    with conn.cursor() as cur:
+        cur.execute(query, (list(set(s3_refs)),))
+        rows = cur.fetchall()
 
-    return "Empty Database!"
+    return dict(rows)
 
 
-def get_recent_png_key_s3(conn: extensions.connection, url: str) -> str:
+def get_recent_png_key_s3(conn: extensions.connection, url: str,
+                          match: str = EXACT_MATCH) -> str | None:
     """Retrieves the key for png most recently uploaded to the S3 for
     a given URL."""
 
-    query = f"""SELECT screenshot_s3_ref 
-                    FROM page_scrape 
-                    JOIN url ON page_scrape.url_id = url.url_id 
-                    WHERE url LIKE '{url}' 
-                    ORDER BY scrape_at 
-                    DESC LIMIT 1;"""
+    condition, value = match_condition(sql.Identifier('url'), url, match)
+    # the newest capture of each url is found by reading its partitions newest first
+    query = sql.SQL("""SELECT latest.screenshot_s3_ref
+                    FROM url
+                    JOIN LATERAL (
+                        SELECT screenshot_s3_ref, scrape_at FROM page_scrape
+                        WHERE page_scrape.url_id = url.url_id
+                        ORDER BY scrape_at DESC
+                        LIMIT 1) AS latest ON TRUE
+                    WHERE {condition}
+                    ORDER BY latest.scrape_at
+                    DESC LIMIT 1;""").format(condition=condition)
+
     with conn.cursor() as cur:
-        try:
-            cur.execute(query)
-            result = cur.fetchone()[0]
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+        cur.execute(query, (value,))
+        row = cur.fetchone()
 
-        return result
+    return row[0] if row else None
 
 
-def get_png_keys_s3(conn: extensions.connection, url: str) -> str:
-    """Retrieves the key for png most recently uploaded to the S3 for
-    a given URL."""
+def get_recent_png_keys_s3(conn: extensions.connection, urls: list[str]) -> dict[str, str]:
+    """Retrieves the key of the most recent png of each url, in one query.
+
+    Urls that have not been captured are left out of the dict returned.
+    """
+
+    query = sql.SQL("""SELECT {url_table}.{url}, latest.{screenshot_s3_ref}
+                    FROM {url_table}
+                    JOIN LATERAL (
+                        SELECT {screenshot_s3_ref} FROM {page_scrape}
+                        WHERE {page_scrape}.{url_id} = {url_table}.{url_id}
+                        ORDER BY {scrape_at} DESC
+                        LIMIT 1) AS latest ON TRUE
+                    WHERE {url_table}.{url} = ANY(%s);""").format(
+        url_table=sql.Identifier('url'),
+        url=sql.Identifier('url'),
+        url_id=sql.Identifier('url_id'),
+        screenshot_s3_ref=sql.Identifier('screenshot_s3_ref'),
+        page_scrape=sql.Identifier('page_scrape'),
+        scrape_at=sql.Identifier('scrape_at'))
 
-    query = f"""SELECT screenshot_s3_ref 
-                    FROM page_scrape 
-                    JOIN url ON page_scrape.url_id = url.url_id 
-                    WHERE url LIKE '{url}';"""
     with conn.cursor() as cur:
-        try:
-            cur.execute(query)
-            rows = cur.fetchall()
-            if len(rows):
-                keys = [row[0] for row in rows]
+        cur.execute(query, (list(urls),))
+        rows = cur.fetchall()
 
-            result = keys
+    return dict(rows)
 
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
 
-        return result
+def get_png_keys_s3(conn: extensions.connection, url: str,
+                    match: str = EXACT_MATCH) -> list[str]:
+    """Retrieves the keys of every png uploaded to the S3 for a given URL."""
+
+    condition, value = match_condition(sql.Identifier('url'), url, match)
+    query = sql.SQL("""SELECT screenshot_s3_ref
+                    FROM page_scrape
+                    JOIN url ON page_scrape.url_id = url.url_id
+                    WHERE {condition};""").format(condition=condition)
+
+    with conn.cursor() as cur:
+        cur.execute(query, (value,))
+        rows = cur.fetchall()
+
+    return [row[0] for row in rows]
 
 
 def get_most_popular_urls(conn: extensions.connection) -> list[str]:
-    """Gets the url from the database, given an s3_ref."""
+    """Gets the ten human-archived urls with the most visits."""
 
     urls = []
-    query = """SELECT COUNT(*), url FROM url
-                JOIN user_interaction ON url.url_id = user_interaction.url_id 
-                JOIN page_scrape ON url.url_id = page_scrape.url_id
-                WHERE is_human is True
-                GROUP BY url ORDER BY COUNT(*) 
-                DESC LIMIT 10;"""
+    # read in order from interaction_count_ranking_idx, stopping at the tenth match
+    query = """SELECT interaction_count, url FROM interaction_count
+                JOIN url ON url.url_id = interaction_count.url_id
+                WHERE type_id = 1
+                AND EXISTS (SELECT 1 FROM page_scrape
+                            WHERE page_scrape.url_id = url.url_id
+                            AND is_human IS True)
+                ORDER BY interaction_count DESC LIMIT 10;"""
 
     with conn.cursor() as cur:
         cur.execute(query)
@@ -132,113 +223,325 @@ def get_most_popular_urls(conn: extensions.connection) -> list[str]:
     return urls
 
 
-def get_summary_from_db(s3_ref: str, conn: extensions.connection) -> str:
-    """Gets the AI summary from the database, given an s3_ref."""
+def get_summary_from_db(s3_ref: str, conn: extensions.connection,
+                        match: str = PREFIX_MATCH) -> str | None:
+    """Gets the AI summary from the database, given an s3_ref or, by default, the start of one."""
 
-    query = f"""SELECT summary FROM url
+    condition, value = match_condition(sql.Identifier('html_s3_ref'), s3_ref, match)
+    query = sql.SQL("""SELECT summary FROM url
                  JOIN page_scrape ON url.url_id = page_scrape.url_id
-                 WHERE html_s3_ref LIKE '%{s3_ref}%'"""
+                 WHERE {condition}
+                 LIMIT 1;""").format(condition=condition)
 
     with conn.cursor() as cur:
-        cur.execute(query)
-        try:
-            url_extract = cur.fetchall()[0][0]
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+        cur.execute(query, (value,))
+        row = cur.fetchone()
 
-    return url_extract
+    return row[0] if row else None
 
 
-def get_genre_from_db(url: str, conn: extensions.connection) -> str:
+def get_genre_from_db(url: str, conn: extensions.connection,
+                      match: str = EXACT_MATCH) -> str | None:
     """Gets the AI-generated genre from the database, given an url."""
 
-    query = f"""SELECT genre FROM url
-                 JOIN page_scrape ON url.url_id = page_scrape.url_id
-                 WHERE url LIKE '%{url}%'"""
+    condition, value = match_condition(sql.Identifier('url'), url, match)
+    query = sql.SQL("""SELECT genre FROM url
+                 WHERE {condition}
+                 LIMIT 1;""").format(condition=condition)
 
     with conn.cursor() as cur:
-        cur.execute(query)
-        try:
-            url_extract = cur.fetchall()[0][0]
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+        cur.execute(query, (value,))
+        row = cur.fetchone()
 
-    return url_extract
+    return row[0] if row else None
 
 
-def get_first_submission_time(url: str, conn: extensions.connection) -> str:
+def get_first_submission_time(url: str, conn: extensions.connection,
+                              match: str = EXACT_MATCH) -> datetime | None:
     """Gets the timestamp of the first submission to the database, given a url."""
 
-    query = f"""SELECT scrape_at FROM page_scrape
+    condition, value = match_condition(sql.Identifier('url'), url, match)
+    query = sql.SQL("""SELECT MIN(scrape_at) FROM page_scrape
                  JOIN url ON url.url_id = page_scrape.url_id
-                 WHERE url LIKE '%{url}%'
-                 ORDER BY scrape_at ASC
-                 LIMIT 1;"""
+                 WHERE {condition};""").format(condition=condition)
 
     with conn.cursor() as cur:
-        cur.execute(query)
-        try:
-            url_extract = cur.fetchall()[0][0]
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+        cur.execute(query, (value,))
+        row = cur.fetchone()
 
-    return url_extract
+    return row[0] if row else None
 
 
-def get_number_of_views(url: str, conn: extensions.connection) -> int:
-    """Get number of views for a given url."""
+def get_interaction_count(url: str, type_id: int, conn: extensions.connection,
+                          match: str = EXACT_MATCH) -> int:
+    """Gets the maintained interaction counter of one type for a url, or the
+    total over every url starting with it."""
 
-    query = f"""SELECT COUNT(type_id) FROM user_interaction
-                JOIN url ON url.url_id = user_interaction.url_id
-                WHERE url LIKE '%{url}%' and type_id = 1;"""
+    condition, value = match_condition(sql.Identifier('url'), url, match)
+    query = sql.SQL("""SELECT COALESCE(SUM(interaction_count), 0) FROM interaction_count
+                JOIN url ON url.url_id = interaction_count.url_id
+                WHERE {condition} and type_id = %s;""").format(condition=condition)
 
     with conn.cursor() as cur:
-        cur.execute(query)
-        try:
-            url_extract = cur.fetchall()[0][0]
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+        cur.execute(query, (value, type_id))
+        row = cur.fetchone()
+
+    return row[0] if row else 0
 
-    return url_extract
 
+def get_number_of_views(url: str, conn: extensions.connection, match: str = EXACT_MATCH) -> int:
+    """Get number of views for a given url."""
 
-def get_number_of_saves(url: str, conn: extensions.connection) -> int:
+    return get_interaction_count(url, 1, conn, match)
+
+
+def get_number_of_saves(url: str, conn: extensions.connection, match: str = EXACT_MATCH) -> int:
     """Get number of saves for a given url."""
 
-    query = f"""SELECT COUNT(type_id) FROM user_interaction
-                JOIN url ON url.url_id = user_interaction.url_id
-                WHERE url LIKE '%{url}%' and type_id = 2;"""
+    return get_interaction_count(url, 2, conn, match)
+
+
+def get_is_human_from_db(s3_ref: str, conn: extensions.connection,
+                         match: str = EXACT_MATCH) -> bool | None:
+    """Checks is_human bool for a given s3_ref."""
+
+    condition, value = match_condition(sql.Identifier('html_s3_ref'), s3_ref, match)
+    query = sql.SQL("""SELECT is_human FROM page_scrape
+                 WHERE {condition}
+                 LIMIT 1;""").format(condition=condition)
 
     with conn.cursor() as cur:
-        cur.execute(query)
-        try:
-            url_extract = cur.fetchall()[0][0]
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+        cur.execute(query, (value,))
+        row = cur.fetchone()
 
-    return url_extract
+    return row[0] if row else None
 
 
-def get_is_human_from_db(s3_ref: str, conn: extensions.connection) -> bool:
-    """Checks is_human bool for a given s3_ref."""
+def get_capture_page(conn: extensions.connection, url_id: int,
+                     before: tuple | None = None,
+                     limit: int = HISTORY_PAGE_SIZE) -> tuple[list[dict], tuple | None]:
+    """Returns up to limit captures of a url older than the (scrape_at, page_scrape_id)
+    cursor, newest first, and the cursor for the page after, if there is one."""
 
-    query = f"""SELECT is_human FROM page_scrape
-                 WHERE html_s3_ref LIKE '%{s3_ref}%'"""
+    keyset = sql.SQL("")
+    params = [url_id]
+    if before is not None:
+        # the row comparison alone does not prune partitions; the bound on scrape_at does
+        keyset = sql.SQL("""AND ({scrape_at}, {page_scrape_id}) < (%s, %s)
+                         AND {scrape_at} <= %s""").format(
+            scrape_at=sql.Identifier('scrape_at'),
+            page_scrape_id=sql.Identifier('page_scrape_id'))
+        params.extend([*before, before[0]])
+    params.append(limit + 1)
+
+    query = sql.SQL("""
+                    SELECT {fields}
+                    FROM {table}
+                    WHERE {url_id} = %s
+                    {keyset}
+                    ORDER BY {scrape_at} DESC, {page_scrape_id} DESC
+                    LIMIT %s;""").format(
+        fields=sql.SQL(',').join([
+            sql.Identifier('html_s3_ref'),
+            sql.Identifier('screenshot_s3_ref'),
+            sql.Identifier('scrape_at'),
+            sql.Identifier('is_human'),
+            sql.Identifier('page_scrape_id')
+        ]),
+        table=sql.Identifier('page_scrape'),
+        url_id=sql.Identifier('url_id'),
+        keyset=keyset,
+        scrape_at=sql.Identifier('scrape_at'),
+        page_scrape_id=sql.Identifier('page_scrape_id'))
 
     with conn.cursor() as cur:
-        cur.execute(query)
-        try:
-            is_human = cur.fetchall()[0][0]
-        except KeyError as exc:
-            raise KeyError(
-                "There were no values with that reference!") from exc
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+    captures = [{
+        'html_s3_ref': row[0],
+        'screenshot_s3_ref': row[1],
+        'scrape_at': row[2],
+        'is_human': row[3]
+    } for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = (rows[limit - 1][2], rows[limit - 1][4])
+
+    return captures, next_cursor
+
+
+def get_page_history(conn: extensions.connection, url: str,
+                     limit: int = HISTORY_PAGE_SIZE) -> dict | None:
+    """Returns the page history view model for a url, with its newest page of captures."""
+    extract_time = perf_counter()
+
+    url_query = sql.SQL("""
+                    SELECT {url_id}, {summary}, {genre},
+                        (SELECT MIN({scrape_at}) FROM {page_scrape}
+                         WHERE {page_scrape}.{url_id} = {url_table}.{url_id}),
+                        (SELECT {count} FROM {interaction_count}
+                         WHERE {interaction_count}.{url_id} = {url_table}.{url_id}
+                         AND {type_id} = 1),
+                        (SELECT {count} FROM {interaction_count}
+                         WHERE {interaction_count}.{url_id} = {url_table}.{url_id}
+                         AND {type_id} = 2)
+                    FROM {url_table}
+                    WHERE {url_column} = %s;""").format(
+        url_id=sql.Identifier('url_id'),
+        summary=sql.Identifier('summary'),
+        genre=sql.Identifier('genre'),
+        scrape_at=sql.Identifier('scrape_at'),
+        type_id=sql.Identifier('type_id'),
+        count=sql.Identifier('interaction_count'),
+        page_scrape=sql.Identifier('page_scrape'),
+        interaction_count=sql.Identifier('interaction_count'),
+        url_table=sql.Identifier('url'),
+        url_column=sql.Identifier('url'))
+
+    with conn.cursor() as cur:
+        cur.execute(url_query, (url,))
+        url_row = cur.fetchone()
+        if url_row is None:
+            return None
+
+    captures, next_cursor = get_capture_page(conn, url_row[0], limit=limit)
+
+    logging.info("Page History Extracted --- %ss.",
+                 round(perf_counter() - extract_time, 3))
+
+    return {
+        'url': url,
+        'url_id': url_row[0],
+        'summary': url_row[1],
+        'genre': url_row[2],
+        'first_submitted': url_row[3],
+        'number_of_views': url_row[4] or 0,
+        'number_of_saves': url_row[5] or 0,
+        'captures': captures,
+        'next_cursor': next_cursor
+    }
+
+
+def get_url_id(url: str, conn: extensions.connection) -> int | None:
+    """Gets the url_id for a url, if it has been archived."""
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT url_id FROM url WHERE url = %s;", (url,))
+        row = cur.fetchone()
+
+    return row[0] if row else None
+
+
+def get_capture_batch(conn: extensions.connection, batch_id: str) -> dict | None:
+    """Returns the progress of a bulk capture request, or None if there is no such batch."""
+
+    query = sql.SQL("""
+                    SELECT {batch}.{created_at}, {urls}.{url}, {urls}.{status}, {urls}.{error}
+                    FROM {batch}
+                    LEFT JOIN {urls} ON {urls}.{batch_id} = {batch}.{batch_id}
+                    WHERE {batch}.{batch_id} = %s
+                    ORDER BY {urls}.{position};""").format(
+        batch=sql.Identifier('capture_batch'),
+        urls=sql.Identifier('capture_batch_url'),
+        created_at=sql.Identifier('created_at'),
+        url=sql.Identifier('url'),
+        status=sql.Identifier('status'),
+        error=sql.Identifier('error'),
+        batch_id=sql.Identifier('batch_id'),
+        position=sql.Identifier('position'))
+
+    with conn.cursor() as cur:
+        cur.execute(query, (batch_id,))
+        rows = cur.fetchall()
+
+    if not rows:
+        return None
+
+    return {
+        'batch_id': batch_id,
+        'created_at': rows[0][0],
+        'urls': [{'url': row[1], 'status': row[2], 'error': row[3]}
+                 for row in rows if row[1] is not None]
+    }
+
+
+def search_urls(conn: extensions.connection, search: str,
+                limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> list[dict]:
+    """Returns archived urls matching a search over url, title, summary and genre, best first."""
+    search_time = perf_counter()
+
+    query = """SELECT url.url, url.title, latest.screenshot_s3_ref,
+                    ts_rank(url.search_vector, websearch_to_tsquery('english', %(search)s))
+                    + CASE WHEN url.url ILIKE %(pattern)s OR url.title ILIKE %(pattern)s
+                        THEN 1 ELSE 0 END AS rank
+                FROM url
+                JOIN LATERAL (
+                    SELECT screenshot_s3_ref FROM page_scrape
+                    WHERE page_scrape.url_id = url.url_id
+                    ORDER BY scrape_at DESC
+                    LIMIT 1) AS latest ON TRUE
+                WHERE url.search_vector @@ websearch_to_tsquery('english', %(search)s)
+                    OR url.url ILIKE %(pattern)s
+                    OR url.title ILIKE %(pattern)s
+                ORDER BY rank DESC, url.url
+                LIMIT %(limit)s OFFSET %(offset)s;"""
+
+    with conn.cursor() as cur:
+        cur.execute(query, {'search': search,
+                            'pattern': f"%{escape_like(search)}%",
+                            'limit': limit,
+                            'offset': offset})
+        rows = cur.fetchall()
+
+    logging.info("Searched for %s --- %ss.", search,
+                 round(perf_counter() - search_time, 3))
+
+    return [{'url': row[0], 'title': row[1], 'screenshot_s3_ref': row[2]}
+            for row in rows]
+
+
+def search_page_content(conn: extensions.connection, search: str,
+                        start: datetime = None, end: datetime = None,
+                        limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> list[dict]:
+    """Returns captures whose visible text matches a search, optionally between two dates.
+
+    Only the newest MAX_RANKED_MATCHES matches are ranked, so a common term costs the
+    same as a rarer one rather than ranking every capture that contains it.
+    """
+    search_time = perf_counter()
+
+    query = """SELECT url.url, candidate.html_s3_ref, candidate.screenshot_s3_ref,
+                    candidate.scrape_at,
+                    ts_rank(candidate.content_vector, query) AS rank
+                FROM (SELECT page_scrape.url_id, page_scrape.html_s3_ref,
+                             page_scrape.screenshot_s3_ref, page_scrape.scrape_at,
+                             page_scrape.content_vector
+                      FROM page_scrape
+                      WHERE page_scrape.content_vector
+                                @@ websearch_to_tsquery('english', %(search)s)
+                        AND page_scrape.scrape_at
+                                >= COALESCE(%(start)s, '-infinity'::timestamp)
+                        AND page_scrape.scrape_at < COALESCE(%(end)s, 'infinity'::timestamp)
+                      ORDER BY page_scrape.scrape_at DESC
+                      LIMIT %(candidates)s) AS candidate
+                JOIN url ON url.url_id = candidate.url_id,
+                    websearch_to_tsquery('english', %(search)s) AS query
+                ORDER BY rank DESC, candidate.scrape_at DESC
+                LIMIT %(limit)s OFFSET %(offset)s;"""
+
+    with conn.cursor() as cur:
+        cur.execute(query, {'search': search, 'start': start, 'end': end,
+                            'candidates': MAX_RANKED_MATCHES,
+                            'limit': limit, 'offset': offset})
+        rows = cur.fetchall()
+
+    logging.info("Searched page content for %s --- %ss.", search,
+                 round(perf_counter() - search_time, 3))
 
-    return is_human
+    return [{'url': row[0], 'html_s3_ref': row[1], 'screenshot_s3_ref': row[2],
+             'scrape_at': row[3], 'rank': row[4]} for row in rows]
 
 
 if __name__ == "__main__":
@@ -247,6 +550,6 @@ if __name__ == "__main__":
 
     connection = get_connection(environ)
     # print(extract_data(connection, "https://www.telegraph.co.uk/"))
-    print(get_png_keys_s3(connection, 'www.rocketleague.com/'))
+    print(get_png_keys_s3(connection, 'https://www.rocketleague.com/', PREFIX_MATCH))
     print(get_url(
         'www.bbc.co.uk/BBC - Home', connection))
@@ -0,0 +1,22 @@
+"""Gunicorn settings for the API, overridable with environment variables."""
+from os import environ
+import multiprocessing
+
+bind = environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Requests mostly wait on Postgres, S3 and OpenAI, so each worker runs several threads
+worker_class = 'gthread'
+workers = int(environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(environ.get('GUNICORN_THREADS', 4))
+
+# /save waits up to 20 seconds for its capture, on top of fetching the page
+timeout = int(environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app once in the master so workers fork with it already loaded;
+# nothing opens connections or starts threads until the first request
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
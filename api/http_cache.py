@@ -0,0 +1,46 @@
+"""Helpers for HTTP caching of archived snapshots, which never change once written."""
+import hashlib
+
+from flask import Request, Response
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PAGE_CACHE_CONTROL = 'public, max-age=300'
+
+
+def snapshot_etag(key: str, *variants: str) -> str:
+    """Returns a strong ETag for an S3 snapshot key, plus anything else the response varies on."""
+
+    fingerprint = '\n'.join((key, *[variant or '' for variant in variants]))
+
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:32]
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Checks whether the client already holds the response with this ETag."""
+
+    return request.if_none_match.contains(etag)
+
+
+def add_immutable_headers(response: Response, etag: str) -> Response:
+    """Marks a snapshot response as cacheable forever by browsers and CDN edges."""
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+
+    return response
+
+
+def add_revalidated_headers(response: Response, etag: str) -> Response:
+    """Marks a page rendered around a snapshot as cacheable for a few minutes, after which
+    it is revalidated by its ETag, so changes to the app still reach clients."""
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = PAGE_CACHE_CONTROL
+
+    return response
+
+
+def not_modified_response(etag: str, add_headers=add_immutable_headers) -> Response:
+    """Returns an empty 304 response for a snapshot the client already has."""
+
+    return add_headers(Response(status=304), etag)
@@ -0,0 +1,176 @@
+"""Buffers user interactions in memory and writes them to the database in batches."""
+from os import _Environ
+from time import monotonic, perf_counter
+import atexit
+import logging
+import queue
+import threading
+
+from psycopg2 import DatabaseError, OperationalError
+
+from connect import get_connection
+from upload_to_database import add_interactions
+
+MAX_BUFFER_SIZE = 10000
+FLUSH_SIZE = 500
+FLUSH_INTERVAL_SECONDS = 5
+SHUTDOWN_TIMEOUT_SECONDS = 10
+
+
+class InteractionBuffer:
+    """A bounded in-process queue of interactions drained by a background writer thread.
+
+    Interactions are written when FLUSH_SIZE are waiting or FLUSH_INTERVAL_SECONDS
+    have passed, whichever comes first, and anything left is written on shutdown.
+    """
+
+    def __init__(self, config: _Environ,
+                 max_size: int = MAX_BUFFER_SIZE,
+                 flush_size: int = FLUSH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.config = config
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._connection = None
+
+    def add(self, interaction_data: dict) -> bool:
+        """Queues an interaction without blocking; returns False if the buffer is full."""
+
+        self._start()
+
+        try:
+            self._queue.put_nowait(interaction_data)
+        except queue.Full:
+            self._count(dropped=1)
+            logging.warning("Interaction buffer full, dropped %s interactions.",
+                            self.dropped)
+            return False
+
+        return True
+
+    def stats(self) -> dict:
+        """Returns how many interactions have been written and dropped so far."""
+
+        with self._lock:
+            return {'written': self.written, 'dropped': self.dropped}
+
+    def size(self) -> int:
+        """Returns the number of interactions waiting to be written."""
+
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Writes every queued interaction immediately."""
+
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        for start in range(0, len(batch), self.flush_size):
+            self._write(batch[start:start + self.flush_size])
+
+    def close(self) -> None:
+        """Stops the writer thread and writes anything still queued."""
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=SHUTDOWN_TIMEOUT_SECONDS)
+
+        self.flush()
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _start(self) -> None:
+        """Starts the writer thread on first use, so it is created after any fork."""
+
+        if self._thread is not None or self._stopped.is_set():
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='interaction-writer',
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _count(self, written: int = 0, dropped: int = 0) -> None:
+        """Adds to the counters, which request threads read while the writer updates them."""
+
+        with self._lock:
+            self.written += written
+            self.dropped += dropped
+
+    def _run(self) -> None:
+        """Collects and writes batches until the buffer is closed."""
+
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self) -> list[dict]:
+        """Waits for a full batch or the flush interval, whichever comes first."""
+
+        batch = []
+        deadline = monotonic() + self.flush_interval
+
+        while len(batch) < self.flush_size and not self._stopped.is_set():
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _write(self, batch: list[dict]) -> None:
+        """Writes a batch over the writer's connection, reconnecting once on failure."""
+
+        write_time = perf_counter()
+
+        for attempt in range(2):
+            try:
+                if self._connection is None or self._connection.closed:
+                    self._connection = get_connection(self.config)
+                add_interactions(self._connection, batch)
+                self._count(written=len(batch))
+                logging.info("Flushed %s interactions --- %ss.",
+                             len(batch), round(perf_counter() - write_time, 3))
+                return
+
+            except (DatabaseError, OperationalError) as error:
+                logging.warning("Interaction flush failed (attempt %s): %s",
+                                attempt + 1, error)
+                self._reset_connection()
+
+            # anything else, such as an invalid interaction, would fail again, and must
+            # not escape and stop the writer thread
+            except Exception:
+                logging.exception("Interaction flush failed, dropping %s interactions.",
+                                  len(batch))
+                self._reset_connection()
+                break
+
+        self._count(dropped=len(batch))
+
+    def _reset_connection(self) -> None:
+        """Closes the writer's connection, so the next write opens a fresh one."""
+
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
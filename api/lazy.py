@@ -0,0 +1,28 @@
+"""Creates expensive shared objects on first use, rather than when a worker starts."""
+from functools import wraps
+from time import perf_counter
+import logging
+import threading
+
+
+def lazy(factory):
+    """Wraps a zero-argument factory so it runs once, on first call, even with concurrent callers."""
+
+    lock = threading.Lock()
+    created = []
+
+    @wraps(factory)
+    def get():
+        if not created:
+            with lock:
+                if not created:
+                    create_time = perf_counter()
+                    created.append(factory())
+                    logging.info("Created %s --- %ss.", factory.__name__,
+                                 round(perf_counter() - create_time, 3))
+
+        return created[0]
+
+    get.is_created = lambda: bool(created)
+
+    return get
@@ -0,0 +1,45 @@
+"""Made-up sites, titles and text shared by the seed script and the traffic driver."""
+from random import Random
+
+WORDS = [
+    'election', 'football', 'climate', 'market', 'recipe', 'galaxy', 'museum',
+    'festival', 'startup', 'vaccine', 'hurricane', 'library', 'orchestra',
+    'telescope', 'marathon', 'parliament', 'harvest', 'satellite', 'volcano',
+    'bakery', 'robot', 'glacier', 'podcast', 'stadium', 'railway', 'island',
+    'gallery', 'budget', 'carnival', 'desert', 'engine', 'forest', 'garden',
+    'holiday', 'inflation', 'journal', 'kitchen', 'lantern', 'mountain',
+    'network', 'ocean', 'planet', 'quantum', 'river', 'science', 'theatre',
+    'university', 'village', 'weather', 'history', 'energy', 'fashion',
+    'finance', 'travel', 'music', 'cinema', 'health', 'education', 'software'
+]
+SITES = [
+    'dailyherald', 'techpulse', 'greenplanet', 'cityguide', 'foodfolio',
+    'sportsdesk', 'starwatch', 'moneyweek', 'artsreview', 'travelnotes',
+    'healthhub', 'codecraft', 'worldwire', 'musicbox', 'filmfront',
+    'learnlab', 'homeandgarden', 'motorpage', 'gamezone', 'sciencenow'
+]
+SECTIONS = ['news', 'features', 'opinion', 'guides', 'reviews', 'live']
+GENRES = ['News', 'Blogs', 'Educational', 'Entertainment', 'E-commerce',
+          'Business/Corporate', 'Social Media', 'Government']
+
+
+def make_text(rng: Random, length: int) -> str:
+    """Returns length random words."""
+
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def make_title(rng: Random) -> str:
+    """Returns a headline-like title."""
+
+    return make_text(rng, rng.randint(3, 7)).title()
+
+
+def make_html(title: str, text: str) -> str:
+    """Returns a small HTML page with a title and some visible text."""
+
+    paragraphs = ''.join(f"<p>{text[i:i + 400]}</p>" for i in range(0, len(text), 400))
+
+    return (f"<!DOCTYPE html><html><head><title>{title}</title>"
+            f"<style>body {{ font-family: serif; }}</style></head>"
+            f"<body><h1>{title}</h1>{paragraphs}</body></html>")
@@ -0,0 +1,224 @@
+"""Drives concurrent traffic at the website and reports throughput and latency per route.
+
+Run from the api folder once the app is up and load_test/seed.py has written its manifest, e.g.
+`python load_test/driver.py --base-url http://127.0.0.1:5050 --duration 60 --concurrency 32`.
+"""
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from random import Random
+from threading import Thread
+from time import monotonic, perf_counter
+from urllib.parse import quote
+import json
+import math
+
+import requests
+
+from corpus import make_html, make_text, make_title
+
+DEFAULT_MIX = 'archived-pages=2,page-history=6,result=3,save=1'
+FIXTURE_PAGES = 200
+REQUEST_TIMEOUT_SECONDS = 120
+
+
+def parse_args():
+    """Returns the command line options."""
+
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:5050')
+    parser.add_argument('--manifest', default='load_test/manifest.json')
+    parser.add_argument('--duration', type=float, default=60,
+                        help="seconds to measure for (default 60)")
+    parser.add_argument('--warmup', type=float, default=5,
+                        help="seconds of traffic before measuring starts (default 5)")
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help="number of simulated users (default 16)")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"relative weight of each route (default {DEFAULT_MIX})")
+    parser.add_argument('--fixture-port', type=int, default=8765,
+                        help="port serving the pages that /save captures (default 8765)")
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+
+    return parser.parse_args()
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parses route=weight pairs."""
+
+    weights = {}
+    for pair in mix.split(','):
+        route, weight = pair.split('=')
+        if route not in ROUTES:
+            raise SystemExit(f"Unknown route {route}; choose from {', '.join(ROUTES)}.")
+        weights[route] = float(weight)
+
+    return weights
+
+
+def start_fixture_server(port: int) -> ThreadingHTTPServer:
+    """Serves made-up pages at /page/<n> for /save to capture."""
+
+    rng = Random(0)
+    pages = [make_html(make_title(rng), make_text(rng, 1500)).encode('utf-8')
+             for _ in range(FIXTURE_PAGES)]
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        """Returns the nth made-up page."""
+
+        def do_GET(self):
+            try:
+                body = pages[int(self.path.rsplit('/', 1)[-1]) % FIXTURE_PAGES]
+            except ValueError:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), FixtureHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def archived_pages(session, base_url, manifest, rng, fixture_port):
+    """Loads the most popular pages."""
+
+    return session.get(f"{base_url}/archived-pages", timeout=REQUEST_TIMEOUT_SECONDS)
+
+
+def page_history(session, base_url, manifest, rng, fixture_port):
+    """Loads the capture history of an archived url."""
+
+    return session.get(f"{base_url}/page-history",
+                       params={'url': rng.choice(manifest['urls'])},
+                       timeout=REQUEST_TIMEOUT_SECONDS)
+
+
+def result(session, base_url, manifest, rng, fixture_port):
+    """Searches the archived urls."""
+
+    term = quote(rng.choice(manifest['search_terms']), safe='')
+
+    return session.get(f"{base_url}/result/{term}", timeout=REQUEST_TIMEOUT_SECONDS)
+
+
+def save(session, base_url, manifest, rng, fixture_port):
+    """Archives one of the fixture pages."""
+
+    page = rng.randrange(FIXTURE_PAGES)
+
+    return session.post(f"{base_url}/save",
+                        data={'url': f"http://127.0.0.1:{fixture_port}/page/{page}"},
+                        allow_redirects=False, timeout=REQUEST_TIMEOUT_SECONDS)
+
+
+ROUTES = {
+    'archived-pages': archived_pages,
+    'page-history': page_history,
+    'result': result,
+    'save': save
+}
+
+
+def simulate_user(args, manifest: dict, weights: dict, seed: int,
+                  measure_from: float, stop_at: float, results: list) -> None:
+    """Sends requests back to back until stop_at, recording those sent after measure_from."""
+
+    rng = Random(seed)
+    routes = list(weights)
+    session = requests.Session()
+
+    while monotonic() < stop_at:
+        route = rng.choices(routes, weights=[weights[name] for name in routes])[0]
+        started = monotonic()
+        request_time = perf_counter()
+        try:
+            response = ROUTES[route](session, args.base_url, manifest, rng, args.fixture_port)
+            # /save redirects to /submit when it fails
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = perf_counter() - request_time
+
+        if started >= measure_from:
+            results.append((route, elapsed, ok))
+
+
+def percentile(latencies: list[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of sorted latencies."""
+
+    if not latencies:
+        return math.nan
+
+    return latencies[max(0, math.ceil(fraction * len(latencies)) - 1)]
+
+
+def summarise(results: list, duration: float) -> dict[str, dict]:
+    """Returns requests, errors, throughput and latency percentiles for each route."""
+
+    summary = {}
+    for route in sorted({route for route, _, _ in results}):
+        latencies = sorted(elapsed for name, elapsed, _ in results if name == route)
+        errors = sum(1 for name, _, ok in results if name == route and not ok)
+        summary[route] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput': len(latencies) / duration,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000
+        }
+
+    return summary
+
+
+def print_summary(summary: dict[str, dict], duration: float) -> None:
+    """Prints a table of the results."""
+
+    print(f"{'route':<16}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    for route, stats in summary.items():
+        print(f"{route:<16}{stats['requests']:>10}{stats['errors']:>8}"
+              f"{stats['throughput']:>9.1f}{stats['p50_ms']:>10.0f}{stats['p99_ms']:>10.0f}")
+
+    total = sum(stats['requests'] for stats in summary.values())
+    print(f"{'total':<16}{total:>10}"
+          f"{sum(stats['errors'] for stats in summary.values()):>8}{total / duration:>9.1f}")
+
+
+if __name__ == "__main__":
+
+    args = parse_args()
+    weights = parse_mix(args.mix)
+
+    with open(args.manifest, encoding='utf-8') as file:
+        manifest = json.load(file)
+
+    fixture_server = start_fixture_server(args.fixture_port)
+
+    measure_from = monotonic() + args.warmup
+    stop_at = measure_from + args.duration
+    results = []
+    users = [Thread(target=simulate_user,
+                    args=(args, manifest, weights, args.seed + user,
+                          measure_from, stop_at, results))
+             for user in range(args.concurrency)]
+
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    fixture_server.shutdown()
+
+    summary = summarise(results, args.duration)
+    print_summary(summary, args.duration)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'concurrency': args.concurrency, 'duration': args.duration,
+                       'mix': weights, 'routes': summary}, file, indent=2)
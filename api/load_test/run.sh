@@ -0,0 +1,26 @@
+#!/bin/bash
+# Starts Postgres and MinIO, seeds them, serves the app with stubbed Chrome and OpenAI,
+# then drives traffic at it. Arguments are passed on to driver.py; SEED_ARGS to seed.py.
+set -euo pipefail
+
+cd "$(dirname "$0")/.."
+set -a
+source load_test/load_test.env
+set +a
+export PYTHONPATH=.
+
+if [ "${SKIP_COMPOSE:-0}" != "1" ]; then
+    docker compose -f load_test/docker-compose.yml up -d --wait
+fi
+
+python3 load_test/seed.py ${SEED_ARGS:-}
+
+gunicorn --config gunicorn.conf.py load_test.stub_wsgi:app > load_test/app.log 2>&1 &
+APP_PID=$!
+trap 'kill $APP_PID' EXIT
+
+until curl -sf -o /dev/null "http://$GUNICORN_BIND/limitations"; do
+    sleep 1
+done
+
+python3 load_test/driver.py --base-url "http://$GUNICORN_BIND" "$@"
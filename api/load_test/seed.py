@@ -0,0 +1,271 @@
+"""Fills the load test database and bucket with realistic volumes of archived pages.
+
+Run from the api folder with the load test settings loaded, e.g.
+`set -a; source load_test/load_test.env; set +a; PYTHONPATH=. python load_test/seed.py`.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+from os import environ
+from random import Random
+from time import perf_counter
+import json
+import logging
+
+from boto3 import client
+from botocore.exceptions import ClientError
+from PIL import Image
+from psycopg2.extras import execute_values
+
+from connect import get_connection
+from corpus import GENRES, SECTIONS, SITES, make_html, make_text, make_title
+from upload_to_s3 import sanitise_filename
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+SCREENSHOT_SIZE = (800, 600)
+UPLOAD_WORKERS = 16
+MANIFEST_URLS = 500
+BATCH_SIZE = 1000
+HISTORY_DAYS = 365
+
+
+def parse_args():
+    """Returns the command line options."""
+
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--urls', type=int, default=2000,
+                        help="number of archived urls (default 2000)")
+    parser.add_argument('--captures', type=int, default=25,
+                        help="average captures per url (default 25)")
+    parser.add_argument('--visits', type=int, default=200000,
+                        help="number of recorded page visits (default 200000)")
+    parser.add_argument('--words', type=int, default=150,
+                        help="words of visible text per capture (default 150)")
+    parser.add_argument('--all-objects', action='store_true',
+                        help="upload every capture to S3, not just the newest of each url")
+    parser.add_argument('--manifest', default='load_test/manifest.json',
+                        help="where to write the urls and search terms for the driver")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--allow-remote', action='store_true',
+                        help="allow seeding a database that is not on this machine")
+
+    return parser.parse_args()
+
+
+def make_urls(rng: Random, count: int) -> list[dict]:
+    """Returns count made-up urls with titles, summaries and genres."""
+
+    urls = []
+    for index in range(count):
+        site = rng.choice(SITES)
+        title = make_title(rng)
+        slug = title.lower().replace(' ', '-')
+        urls.append({
+            'url': f"https://www.{site}.com/{rng.choice(SECTIONS)}/{slug}-{index}",
+            'domain': f"www.{site}.com",
+            'title': f"{title} | {site.title()}",
+            'summary': make_text(rng, 40),
+            'genre': rng.choice(GENRES)
+        })
+
+    return urls
+
+
+def make_captures(rng: Random, url: dict, average: int, words: int) -> list[dict]:
+    """Returns a url's captures, spread over the last year."""
+
+    now = datetime.utcnow()
+    captures = []
+    for _ in range(max(1, int(rng.expovariate(1 / average)))):
+        scrape_at = now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 24 * 3600))
+        key = f"{url['domain']}/{sanitise_filename(url['title'])}/{scrape_at.isoformat()}"
+        captures.append({
+            'scrape_at': scrape_at,
+            'html_s3_ref': f"{key}.html",
+            'screenshot_s3_ref': f"{key}.png",
+            'is_human': rng.random() < 0.3,
+            'text': make_text(rng, words)
+        })
+
+    return captures
+
+
+def reset_database(conn) -> None:
+    """Empties every table the seed fills."""
+
+    with conn.cursor() as cur:
+        cur.execute("""TRUNCATE url, user_interaction, page_scrape, interaction_count,
+                                interaction_hourly
+                       RESTART IDENTITY CASCADE;""")
+    conn.commit()
+
+
+def create_partitions(conn, first_month: datetime, last_month: datetime) -> None:
+    """Creates the monthly partitions of page_scrape and user_interaction the seed fills,
+    as the schema only creates them from this month on."""
+
+    with conn.cursor() as cur:
+        cur.execute("""SELECT create_monthly_partitions(parent, %s, %s)
+                       FROM unnest(ARRAY['page_scrape', 'user_interaction']::regclass[])
+                           AS parent;""", (first_month, last_month))
+    conn.commit()
+
+
+def insert_urls(conn, urls: list[dict]) -> None:
+    """Inserts the urls, storing each one's url_id."""
+
+    with conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            "INSERT INTO url (url, title, summary, genre) VALUES %s RETURNING url_id;",
+            [(url['url'], url['title'], url['summary'], url['genre']) for url in urls],
+            page_size=BATCH_SIZE, fetch=True)
+    conn.commit()
+
+    for url, (url_id,) in zip(urls, rows):
+        url['url_id'] = url_id
+
+
+def insert_captures(conn, urls: list[dict]) -> int:
+    """Inserts every url's captures with their indexed text, returning how many there were."""
+
+    rows = [(url['url_id'], capture['scrape_at'], capture['html_s3_ref'], 'css_data',
+             capture['screenshot_s3_ref'], capture['is_human'], capture['text'])
+            for url in urls for capture in url['captures']]
+
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """INSERT INTO page_scrape (url_id, scrape_at, html_s3_ref, css_s3_ref,
+                                        screenshot_s3_ref, is_human, content_vector)
+               SELECT url_id, scrape_at, html_s3_ref, css_s3_ref, screenshot_s3_ref,
+                      is_human, to_tsvector('english', text)
+               FROM (VALUES %s) AS capture (url_id, scrape_at, html_s3_ref, css_s3_ref,
+                                           screenshot_s3_ref, is_human, text);""",
+            rows, page_size=BATCH_SIZE)
+    conn.commit()
+
+    return len(rows)
+
+
+def insert_visits(conn, rng: Random, urls: list[dict], count: int) -> None:
+    """Records visits following a long-tailed popularity curve, then rebuilds the counters
+    and hourly rollups."""
+
+    weights = [1 / rank for rank in range(1, len(urls) + 1)]
+    visited = rng.choices(urls, weights=weights, k=count)
+    now = datetime.utcnow()
+
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO user_interaction (url_id, type_id, interact_at) VALUES %s;",
+            [(url['url_id'], 1, now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 24 * 3600)))
+             for url in visited],
+            page_size=BATCH_SIZE)
+        execute_values(
+            cur,
+            "INSERT INTO user_interaction (url_id, type_id, interact_at) VALUES %s;",
+            [(url['url_id'], 2, capture['scrape_at'])
+             for url in urls for capture in url['captures'] if capture['is_human']],
+            page_size=BATCH_SIZE)
+        cur.execute("""
+            INSERT INTO interaction_count (url_id, type_id, interaction_count)
+            SELECT url_id, type_id, COUNT(*)
+            FROM user_interaction
+            GROUP BY url_id, type_id;""")
+        cur.execute("""
+            INSERT INTO interaction_hourly (url_id, type_id, hour, interaction_count)
+            SELECT url_id, type_id, date_trunc('hour', interact_at), COUNT(*)
+            FROM user_interaction
+            GROUP BY 1, 2, 3;""")
+    conn.commit()
+
+
+def make_screenshot(colour: str) -> bytes:
+    """Returns a PNG the size of a real screenshot."""
+
+    buffer = BytesIO()
+    Image.new('RGB', SCREENSHOT_SIZE, colour).save(buffer, format='PNG')
+
+    return buffer.getvalue()
+
+
+def upload_objects(s3_client: client, bucket: str, urls: list[dict],
+                   all_objects: bool) -> int:
+    """Uploads the HTML and screenshot of each capture the website will load."""
+
+    try:
+        s3_client.head_bucket(Bucket=bucket)
+    except ClientError:
+        s3_client.create_bucket(Bucket=bucket)
+
+    screenshots = [make_screenshot(colour) for colour in ('white', 'lightgrey', 'beige')]
+    uploads = []
+    for index, url in enumerate(urls):
+        captures = url['captures'] if all_objects else [
+            max(url['captures'], key=lambda capture: capture['scrape_at'])]
+        for capture in captures:
+            uploads.append((capture['html_s3_ref'],
+                            make_html(url['title'], capture['text']), 'text/html'))
+            uploads.append((capture['screenshot_s3_ref'],
+                            screenshots[index % len(screenshots)], 'image/png'))
+
+    def upload(item):
+        key, body, content_type = item
+        s3_client.put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        list(executor.map(upload, uploads))
+
+    return len(uploads)
+
+
+def write_manifest(path: str, urls: list[dict], rng: Random) -> None:
+    """Saves a sample of urls, weighted towards popular ones, and search terms for the driver."""
+
+    manifest = {
+        'urls': [url['url'] for url in urls[:MANIFEST_URLS]],
+        'search_terms': sorted({url['title'].split(' | ')[1].lower() for url in urls}
+                               | {make_text(rng, 1) for _ in range(50)})
+    }
+
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+
+if __name__ == "__main__":
+
+    logging.getLogger().setLevel(logging.INFO)
+    args = parse_args()
+
+    is_local = environ['DB_IP'] in LOCAL_HOSTS or environ['DB_IP'].startswith('/')
+    if not is_local and not args.allow_remote:
+        raise SystemExit(f"Refusing to empty the database at {environ['DB_IP']}; "
+                         "pass --allow-remote if this really is a load test database.")
+
+    seed_time = perf_counter()
+    rng = Random(args.seed)
+
+    urls = make_urls(rng, args.urls)
+    for url in urls:
+        url['captures'] = make_captures(rng, url, args.captures, args.words)
+
+    connection = get_connection(environ)
+    try:
+        reset_database(connection)
+        create_partitions(connection, datetime.utcnow() - timedelta(days=HISTORY_DAYS),
+                          datetime.utcnow())
+        insert_urls(connection, urls)
+        capture_count = insert_captures(connection, urls)
+        insert_visits(connection, rng, urls, args.visits)
+    finally:
+        connection.close()
+
+    object_count = upload_objects(client('s3'), environ['S3_BUCKET'], urls, args.all_objects)
+    write_manifest(args.manifest, urls, rng)
+
+    logging.info("Seeded %s urls, %s captures, %s visits and %s objects --- %ss.",
+                 len(urls), capture_count, args.visits, object_count,
+                 round(perf_counter() - seed_time, 3))
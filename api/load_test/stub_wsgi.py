@@ -0,0 +1,54 @@
+"""Gunicorn entry point for load tests: the real app, with Chrome and OpenAI replaced by stubs.
+
+The stubs sleep for about as long as the real services take, so /save keeps its
+shape without a browser or an API key. Set STUB_SCREENSHOT_SECONDS and
+STUB_OPENAI_SECONDS to change how long.
+"""
+from os import environ
+from time import perf_counter, sleep
+import logging
+
+started_at = perf_counter()
+logging.getLogger().setLevel(logging.INFO)
+
+# pylint: disable=wrong-import-position
+from PIL import Image
+
+import app as archive_app
+from metrics import metrics
+
+STUB_SCREENSHOT_SECONDS = float(environ.get('STUB_SCREENSHOT_SECONDS', 1.5))
+STUB_OPENAI_SECONDS = float(environ.get('STUB_OPENAI_SECONDS', 2.5))
+
+
+class StubScreenshotter:
+    """Writes a blank PNG in place of a screenshot from headless Chrome."""
+
+    def screenshot(self, url: str, size: tuple[int, int], save_as: str) -> None:
+        """Pretends to screenshot url."""
+
+        sleep(STUB_SCREENSHOT_SECONDS)
+        Image.new('RGB', size, 'white').save(save_as, format='PNG')
+
+
+@metrics.timed('openai')
+def generate_summary(html_content: str) -> str:
+    """Pretends to summarise a page with OpenAI."""
+
+    sleep(STUB_OPENAI_SECONDS)
+    return f"A stub summary of a {len(html_content)} character page."
+
+
+@metrics.timed('openai')
+def get_genre(html_content: str) -> str:
+    """Pretends to classify a page with OpenAI."""
+
+    sleep(STUB_OPENAI_SECONDS)
+    return 'News'
+
+
+archive_app.get_screenshotter = StubScreenshotter
+archive_app.generate_summary = generate_summary
+archive_app.get_genre = get_genre
+
+app = archive_app.create_app(started_at)
@@ -0,0 +1,220 @@
+"""Latency histograms for routes and the services they call, exposed in Prometheus text format."""
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+import sys
+import threading
+
+from flask import Flask, g, request
+
+METRIC_PREFIX = 'internet_archiver_'
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 20, 30)
+DEPENDENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                      0.25, 0.5, 1, 2.5, 5, 10, 20)
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def escape_label(value) -> str:
+    """Escapes a label value for the Prometheus text format."""
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: dict) -> str:
+    """Returns labels as {name="value",...}, or nothing if there are none."""
+
+    if not labels:
+        return ''
+
+    pairs = ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items())
+
+    return f'{{{pairs}}}'
+
+
+def format_value(value: float) -> str:
+    """Formats a sample value, writing whole numbers without a decimal point."""
+
+    if value == int(value):
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class Histogram:
+    """A thread-safe histogram of durations, with one set of buckets per label combination."""
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str) -> None:
+        """Records one duration against the given label values."""
+
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += seconds
+            series[2] += 1
+
+    def samples(self) -> dict:
+        """Returns a snapshot of {label values: (bucket counts, sum, count)}."""
+
+        with self._lock:
+            return {labels: (list(counts), total, count)
+                    for labels, (counts, total, count) in self._series.items()}
+
+    def render(self) -> list[str]:
+        """Returns the histogram's lines in the Prometheus text format."""
+
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} histogram']
+
+        for label_values, (counts, total, count) in sorted(self.samples().items()):
+            labels = dict(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket'
+                             f'{format_labels({**labels, "le": format_value(bound)})} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_bucket{format_labels({**labels, "le": "+Inf"})} {count}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(total)}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {count}')
+
+        return lines
+
+
+class Metrics:
+    """Collects request and dependency timings for this worker process."""
+
+    def __init__(self):
+        self.requests = Histogram(
+            f'{METRIC_PREFIX}request_duration_seconds',
+            'Time taken to build each response, by route, method and status.',
+            ('route', 'method', 'status'), REQUEST_BUCKETS)
+        self.dependencies = Histogram(
+            f'{METRIC_PREFIX}dependency_duration_seconds',
+            'Time spent waiting on the database, S3, OpenAI and Chrome, by operation.',
+            ('component', 'operation'), DEPENDENCY_BUCKETS)
+
+    def observe_dependency(self, component: str, operation: str, seconds: float) -> None:
+        """Records a call to an outside service."""
+
+        self.dependencies.observe(seconds, component, operation)
+
+    @contextmanager
+    def timer(self, component: str, operation: str):
+        """Times the body of a with block as a call to an outside service."""
+
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_dependency(component, operation, perf_counter() - started)
+
+    def timed(self, component: str):
+        """Decorates a function so each call is timed as an operation of component."""
+
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(component, function.__name__):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def init_app(self, app: Flask) -> None:
+        """Times every request the app handles, labelled by its route pattern."""
+
+        @app.before_request
+        def start_timer():
+            g.metrics_started = perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            self._record_request(response.status_code)
+            return response
+
+        @app.teardown_request
+        def record_failed_request(exception):
+            if exception is not None:
+                self._record_request(500)
+
+    def render(self, gauges: dict[str, tuple[str, float]]) -> str:
+        """Returns every metric, plus the given {name: (help, value)} gauges, as Prometheus text.
+
+        Gauges whose names end in _total are typed as counters.
+        """
+
+        lines = self.requests.render() + self.dependencies.render()
+
+        for name, (documentation, value) in gauges.items():
+            kind = 'counter' if name.endswith('_total') else 'gauge'
+            lines.extend([f'# HELP {METRIC_PREFIX}{name} {documentation}',
+                          f'# TYPE {METRIC_PREFIX}{name} {kind}',
+                          f'{METRIC_PREFIX}{name} {format_value(value)}'])
+
+        return '\n'.join(lines) + '\n'
+
+    def _record_request(self, status: int) -> None:
+        """Records the current request once, when it has a start time."""
+
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        self.requests.observe(perf_counter() - started,
+                              route, request.method, str(status))
+
+
+def calling_function(skip_modules: tuple[str, ...]) -> str:
+    """Returns the name of the nearest caller outside the given modules."""
+
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__', '').startswith(skip_modules):
+        frame = frame.f_back
+
+    return frame.f_code.co_name if frame is not None else 'unknown'
+
+
+def instrument_s3_client(s3_client):
+    """Times every S3 API call the client makes, using botocore's event hooks.
+
+    For streamed downloads this is the time until the body starts arriving.
+    """
+
+    def start(model, context, **_):
+        context['metrics_operation'] = model.name
+        context['metrics_started'] = perf_counter()
+
+    # after-call-error passes only the exception and context, so the operation is kept there
+    def finish(context, **_):
+        started = context.pop('metrics_started', None)
+        if started is not None:
+            metrics.observe_dependency('s3', context.pop('metrics_operation'),
+                                       perf_counter() - started)
+
+    events = s3_client.meta.events
+    events.register('before-call.s3', start)
+    events.register('after-call.s3', finish)
+    events.register('after-call-error.s3', finish)
+
+    return s3_client
+
+
+metrics = Metrics()
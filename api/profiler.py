@@ -0,0 +1,164 @@
+"""An on-demand statistical profiler that samples the stacks of threads serving requests."""
+from collections import Counter
+from contextlib import contextmanager
+from time import monotonic
+import os
+import sys
+import threading
+
+from flask import Flask, request
+
+SAMPLE_INTERVAL_SECONDS = 0.01
+MAX_STACK_DEPTH = 128
+EXECUTOR_WORKER_FILE = os.path.join('concurrent', 'futures', 'thread.py')
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another is still running."""
+
+
+def frame_label(frame) -> str:
+    """Returns module:function for a stack frame."""
+
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def collapse_stack(frame, root: str) -> str:
+    """Returns a stack as root;outermost;...;innermost, the collapsed-stack format."""
+
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+
+    return ';'.join([root, *reversed(labels)])
+
+
+def is_idle_executor_thread(frame) -> bool:
+    """Checks whether a thread pool worker is waiting for work rather than doing any."""
+
+    code = frame.f_code
+    return code.co_name == '_worker' and code.co_filename.endswith(EXECUTOR_WORKER_FILE)
+
+
+class RequestProfiler:
+    """Samples request threads, and any busy background threads, while a profile is running.
+
+    Only one profile runs at a time. Between profiles the only cost is noting
+    which thread is serving which route.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS,
+                 background_thread_prefixes: tuple[str, ...] = ()):
+        self.interval = interval
+        self.background_thread_prefixes = background_thread_prefixes
+        self._active = {}
+        self._targets = None
+        self._armed_route = None
+        self._remaining = 0
+        self._requests_done = threading.Event()
+        self._session = threading.Lock()
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        """Tracks the route each request thread is serving."""
+
+        @app.before_request
+        def track_request():
+            route = request.url_rule.rule if request.url_rule else request.path
+            ident = threading.get_ident()
+            with self._lock:
+                self._active[ident] = f"{request.method} {route}"
+                if self._armed_route == route and self._remaining > 0:
+                    self._remaining -= 1
+                    self._targets.add(ident)
+
+        @app.teardown_request
+        def untrack_request(_):
+            ident = threading.get_ident()
+            with self._lock:
+                self._active.pop(ident, None)
+                if self._targets is not None and ident in self._targets:
+                    self._targets.discard(ident)
+                    if self._remaining == 0 and not self._targets:
+                        self._requests_done.set()
+
+    def profile_for(self, seconds: float) -> tuple[str, int]:
+        """Samples every request for a number of seconds.
+
+        Returns the collapsed stacks and the number of samples taken.
+        """
+
+        caller = threading.get_ident()
+
+        with self._exclusive():
+            return self._run(lambda ident: ident != caller, seconds)
+
+    def profile_requests(self, route: str, count: int, timeout: float) -> tuple[str, int]:
+        """Samples the next count requests to a route pattern, giving up after timeout seconds.
+
+        Returns the collapsed stacks and the number of samples taken.
+        """
+
+        with self._exclusive():
+            with self._lock:
+                self._targets = set()
+                self._armed_route = route
+                self._remaining = count
+                self._requests_done.clear()
+
+            try:
+                return self._run(lambda ident: ident in self._targets, timeout,
+                                 self._requests_done)
+            finally:
+                with self._lock:
+                    self._targets = None
+                    self._armed_route = None
+                    self._remaining = 0
+
+    @contextmanager
+    def _exclusive(self):
+        """Holds the profiler for one profile, raising ProfilerBusy if another is running."""
+
+        if not self._session.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running.")
+
+        try:
+            yield
+        finally:
+            self._session.release()
+
+    def _run(self, is_target, seconds: float,
+             done: threading.Event = None) -> tuple[str, int]:
+        """Samples until seconds have passed or done is set."""
+
+        stacks = Counter()
+        deadline = monotonic() + seconds
+        done = done or threading.Event()
+
+        while monotonic() < deadline and not done.is_set():
+            self._sample(is_target, stacks)
+            done.wait(self.interval)
+
+        folded = '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+        return folded, sum(stacks.values())
+
+    def _sample(self, is_target, stacks: Counter) -> None:
+        """Adds the current stack of every target and busy background thread."""
+
+        with self._lock:
+            active = dict(self._active)
+            targets_running = self._targets is None or bool(self._targets)
+            target_idents = {ident for ident in active if is_target(ident)}
+
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for ident, frame in sys._current_frames().items():
+            if ident in target_idents:
+                stacks[collapse_stack(frame, active[ident])] += 1
+            elif (targets_running
+                  and names.get(ident, '').startswith(self.background_thread_prefixes)
+                  and not is_idle_executor_thread(frame)):
+                root = names[ident].rsplit('_', 1)[0]
+                stacks[collapse_stack(frame, root)] += 1
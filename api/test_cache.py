@@ -0,0 +1,108 @@
+"""Unit tests for the cache.py file."""
+from threading import Thread, Event
+from unittest.mock import MagicMock, patch
+import json
+import pickle
+
+from cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache, get_cache_backend
+
+
+def test_get_or_compute_only_computes_once_while_fresh():
+    """Tests that a second request for a key is served from the cache."""
+
+    cache = ResponseCache(MemoryCacheBackend())
+    compute = MagicMock(return_value=['page'])
+
+    assert cache.get_or_compute('key', compute) == ['page']
+    assert cache.get_or_compute('key', compute) == ['page']
+
+    compute.assert_called_once()
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+@patch("cache.monotonic")
+def test_entries_expire_after_ttl(mock_monotonic):
+    """Tests that an entry is recomputed once its ttl has passed."""
+
+    mock_monotonic.return_value = 100
+    cache = ResponseCache(MemoryCacheBackend())
+    compute = MagicMock(return_value=['page'])
+
+    cache.get_or_compute('key', compute, ttl=10)
+    mock_monotonic.return_value = 111
+    cache.get_or_compute('key', compute, ttl=10)
+
+    assert compute.call_count == 2
+
+
+def test_invalidate_forces_a_recompute():
+    """Tests that invalidated keys are recomputed on the next request."""
+
+    cache = ResponseCache(MemoryCacheBackend())
+    compute = MagicMock(return_value=['page'])
+
+    cache.get_or_compute('key', compute)
+    cache.invalidate('key', 'missing_key')
+    cache.get_or_compute('key', compute)
+
+    assert compute.call_count == 2
+
+
+def test_none_results_are_not_cached():
+    """Tests that a compute returning None is retried on the next request."""
+
+    cache = ResponseCache(MemoryCacheBackend())
+    compute = MagicMock(return_value=None)
+
+    cache.get_or_compute('key', compute)
+    cache.get_or_compute('key', compute)
+
+    assert compute.call_count == 2
+
+
+def test_concurrent_misses_compute_once():
+    """Tests that threads missing the same key at once share a single recompute."""
+
+    cache = ResponseCache(MemoryCacheBackend())
+    release = Event()
+    calls = []
+
+    def slow_compute():
+        calls.append(1)
+        release.wait(timeout=5)
+        return ['page']
+
+    threads = [Thread(target=cache.get_or_compute, args=('key', slow_compute))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_get_cache_backend_defaults_to_memory():
+    """Tests that the in-process backend is used when no Redis url is configured."""
+
+    assert isinstance(get_cache_backend({}), MemoryCacheBackend)
+
+
+def test_redis_backend_stores_json():
+    """Tests that Redis entries are stored as JSON, and anything else is treated as a miss."""
+
+    backend = RedisCacheBackend.__new__(RedisCacheBackend)
+    backend._client = MagicMock()
+    pages = [{'url': 'https://www.bbc.co.uk', 'label': 'www.bbc.co.uk/BBC'}]
+
+    backend.set('view:submit', pages, 60)
+    stored = backend._client.set.call_args.args[1]
+    assert json.loads(stored) == pages
+
+    backend._client.get.return_value = stored.encode('utf-8')
+    assert backend.get('view:submit') == pages
+
+    backend._client.get.return_value = pickle.dumps(pages)
+    assert backend.get('view:submit') is None
@@ -0,0 +1,63 @@
+"""Unit tests for the connect.py file."""
+from unittest.mock import MagicMock, patch
+
+from psycopg2 import OperationalError, extensions
+
+from connect import ConnectionPool
+
+
+def make_connection() -> MagicMock:
+    """Returns a mock connection that is open and idle."""
+
+    conn = MagicMock()
+    conn.closed = 0
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+@patch("connect.get_connection")
+def test_connections_are_reused(mock_get_connection):
+    """Tests that a returned connection is handed out again rather than reopened."""
+
+    mock_get_connection.side_effect = [make_connection(), make_connection()]
+    pool = ConnectionPool({})
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    mock_get_connection.assert_called_once()
+    assert pool.stats()['idle'] == 1
+
+
+@patch("connect.get_connection")
+def test_open_transactions_are_rolled_back(mock_get_connection):
+    """Tests that a connection returned mid-transaction is rolled back."""
+
+    conn = make_connection()
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+    mock_get_connection.return_value = conn
+
+    with ConnectionPool({}).connection():
+        pass
+
+    conn.rollback.assert_called_once()
+
+
+@patch("connect.get_connection")
+def test_broken_connections_are_discarded(mock_get_connection):
+    """Tests that a connection which fails to roll back is closed, not reused."""
+
+    conn = make_connection()
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_INERROR
+    conn.rollback.side_effect = OperationalError()
+    mock_get_connection.return_value = conn
+    pool = ConnectionPool({})
+
+    with pool.connection():
+        pass
+
+    conn.close.assert_called_once()
+    assert pool.stats() == {'max': 10, 'in_use': 0, 'idle': 0, 'waits': 0}
@@ -0,0 +1,95 @@
+"""Unit tests for the diff.py file."""
+from random import Random
+
+import pytest
+
+from diff import diff_lines, diff_opcodes
+
+
+def apply_opcodes(opcodes: list[tuple], a: list, b: list) -> list:
+    """Rebuilds b from a using the opcodes, checking they cover a in order."""
+
+    result = []
+    position = 0
+    for tag, a_start, a_end, b_start, b_end in opcodes:
+        assert a_start == position
+        if tag == 'equal':
+            assert a[a_start:a_end] == b[b_start:b_end]
+            result.extend(a[a_start:a_end])
+        elif tag == 'insert':
+            result.extend(b[b_start:b_end])
+        position = a_end
+    assert position == len(a)
+
+    return result
+
+
+def longest_common_subsequence(a: list, b: list) -> int:
+    """Returns the length of the longest common subsequence, by dynamic programming."""
+
+    lengths = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i, x in enumerate(a):
+        for j, y in enumerate(b):
+            lengths[i + 1][j + 1] = (lengths[i][j] + 1 if x == y
+                                     else max(lengths[i][j + 1], lengths[i + 1][j]))
+
+    return lengths[-1][-1]
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_diff_opcodes_are_a_shortest_edit(seed):
+    """Tests that the opcodes turn a into b with as few inserted and deleted lines as possible."""
+
+    rng = Random(seed)
+    a = [rng.choice('abc') for _ in range(rng.randint(0, 12))]
+    b = [rng.choice('abc') for _ in range(rng.randint(0, 12))]
+
+    opcodes, truncated = diff_opcodes(a, b)
+    edits = sum(max(a_end - a_start, b_end - b_start)
+                for tag, a_start, a_end, b_start, b_end in opcodes if tag != 'equal')
+
+    assert not truncated
+    assert apply_opcodes(opcodes, a, b) == b
+    assert edits == len(a) + len(b) - 2 * longest_common_subsequence(a, b)
+
+
+def test_diff_opcodes_gives_up_after_max_edits():
+    """Tests that a diff with too many changes still turns a into b, flagged as truncated."""
+
+    a = ['same', 'x1', 'x2', 'x3', 'end']
+    b = ['same', 'y1', 'y2', 'y3', 'end']
+
+    opcodes, truncated = diff_opcodes(a, b, max_edits=2)
+
+    assert truncated
+    assert apply_opcodes(opcodes, a, b) == b
+    assert [tag for tag, *_ in opcodes] == ['equal', 'delete', 'insert', 'equal']
+
+
+def test_diff_lines_groups_changes_into_hunks():
+    """Tests that distant changes get their own hunk with three lines of context."""
+
+    a = [f"line {number}" for number in range(1, 21)]
+    b = list(a)
+    b[1] = 'changed'
+    b.insert(15, 'added')
+
+    result = diff_lines(a, b)
+
+    assert (result['added'], result['removed'], result['truncated']) == (2, 1, False)
+    first, second = result['hunks']
+    assert first == {'a_start': 1, 'a_lines': 5, 'b_start': 1, 'b_lines': 5,
+                     'lines': [[' ', 'line 1'], ['-', 'line 2'], ['+', 'changed'],
+                               [' ', 'line 3'], [' ', 'line 4'], [' ', 'line 5']]}
+    assert (second['a_start'], second['a_lines'], second['b_start'], second['b_lines']) == \
+        (13, 6, 13, 7)
+    assert second['lines'][3] == ['+', 'added']
+
+
+def test_diff_lines_of_identical_pages_is_empty():
+    """Tests that unchanged captures have no hunks."""
+
+    lines = ['a', 'b', 'c']
+
+    assert diff_lines(lines, list(lines)) == {'added': 0, 'removed': 0,
+                                              'truncated': False, 'hunks': []}
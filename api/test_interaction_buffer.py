@@ -0,0 +1,91 @@
+"""Unit tests for the interaction_buffer.py file."""
+from unittest.mock import MagicMock, patch
+
+from psycopg2 import OperationalError
+
+from interaction_buffer import InteractionBuffer
+
+
+def make_interaction(url: str = "https://www.bbc.co.uk") -> dict:
+    """Returns an example visit interaction."""
+
+    return {'url': url, 'type': 'visit', 'interact_at': '2024-01-10 12:00:00'}
+
+
+@patch("interaction_buffer.add_interactions")
+@patch("interaction_buffer.get_connection")
+def test_flush_writes_queued_interactions_in_batches(mock_get_connection, mock_add_interactions):
+    """Tests that flush writes everything queued, split into flush_size batches."""
+
+    mock_get_connection.return_value.closed = 0
+    buffer = InteractionBuffer({}, flush_size=2)
+    buffer._start = MagicMock()
+
+    for _ in range(5):
+        buffer.add(make_interaction())
+    buffer.flush()
+
+    assert [len(call.args[1]) for call in mock_add_interactions.call_args_list] == [2, 2, 1]
+    assert buffer.written == 5
+    assert buffer.size() == 0
+    mock_get_connection.assert_called_once()
+
+
+def test_add_drops_interactions_when_full():
+    """Tests that add returns False rather than blocking when the buffer is full."""
+
+    buffer = InteractionBuffer({}, max_size=1)
+    buffer._start = MagicMock()
+
+    assert buffer.add(make_interaction())
+    assert not buffer.add(make_interaction())
+    assert buffer.dropped == 1
+
+
+@patch("interaction_buffer.add_interactions")
+@patch("interaction_buffer.get_connection")
+def test_write_reconnects_after_database_error(mock_get_connection, mock_add_interactions):
+    """Tests that a failed batch is retried on a fresh connection."""
+
+    mock_add_interactions.side_effect = [OperationalError(), None]
+
+    buffer = InteractionBuffer({})
+    buffer._start = MagicMock()
+    buffer.add(make_interaction())
+    buffer.flush()
+
+    assert mock_get_connection.call_count == 2
+    assert buffer.written == 1
+    assert buffer.dropped == 0
+
+
+@patch("interaction_buffer.add_interactions")
+@patch("interaction_buffer.get_connection")
+def test_close_writes_remaining_interactions(mock_get_connection, mock_add_interactions):
+    """Tests that closing the buffer flushes interactions still waiting in the queue."""
+
+    buffer = InteractionBuffer({}, flush_interval=0.01)
+    buffer.add(make_interaction())
+    buffer.add(make_interaction("https://www.youtube.co.uk"))
+    buffer.close()
+
+    written = sum(len(call.args[1]) for call in mock_add_interactions.call_args_list)
+    assert written == 2
+    assert buffer.size() == 0
+
+
+@patch("interaction_buffer.add_interactions")
+@patch("interaction_buffer.get_connection")
+def test_write_drops_batch_on_other_errors(mock_get_connection, mock_add_interactions):
+    """Tests that a batch failing with a non-database error is dropped without raising."""
+
+    mock_add_interactions.side_effect = [ValueError("Invalid type value"), None]
+
+    buffer = InteractionBuffer({}, flush_size=1)
+    buffer._start = MagicMock()
+    buffer.add(make_interaction())
+    buffer.add(make_interaction())
+    buffer.flush()
+
+    assert mock_add_interactions.call_count == 2
+    assert buffer.stats() == {'written': 1, 'dropped': 1}
@@ -0,0 +1,43 @@
+"""Unit tests for the lazy.py file."""
+from threading import Event, Thread
+from unittest.mock import MagicMock
+
+from lazy import lazy
+
+
+def test_factory_runs_on_first_call_only():
+    """Tests that nothing is created until asked for, then the same object is reused."""
+
+    factory = MagicMock(return_value=object(), __name__='factory')
+    get = lazy(factory)
+
+    assert not get.is_created()
+    factory.assert_not_called()
+
+    assert get() is get()
+    assert get.is_created()
+    factory.assert_called_once()
+
+
+def test_concurrent_first_calls_create_once():
+    """Tests that threads racing on the first call share a single object."""
+
+    release = Event()
+    calls = []
+
+    @lazy
+    def make():
+        calls.append(1)
+        release.wait(timeout=5)
+        return object()
+
+    results = []
+    threads = [Thread(target=lambda: results.append(make())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
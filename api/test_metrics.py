@@ -0,0 +1,88 @@
+"""Unit tests for the metrics.py file."""
+from unittest.mock import patch
+
+from boto3 import client
+from botocore.config import Config
+from botocore.exceptions import EndpointConnectionError
+from flask import Flask
+from pytest import raises
+
+from metrics import Histogram, Metrics, instrument_s3_client
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Tests that bucket counts are cumulative and end with +Inf, sum and count."""
+
+    histogram = Histogram('latency_seconds', 'Latency.', ('route',), (0.1, 1))
+    histogram.observe(0.05, '/a')
+    histogram.observe(0.5, '/a')
+    histogram.observe(5, '/a')
+
+    assert histogram.render() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3'
+    ]
+
+
+def test_requests_are_labelled_by_route_pattern():
+    """Tests that the middleware records the url rule rather than the requested path."""
+
+    metrics = Metrics()
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.get('/result/<input>')
+    def result(input):
+        return input
+
+    client = app.test_client()
+    client.get('/result/bbc')
+    client.get('/result/itv')
+    client.get('/missing')
+
+    samples = metrics.requests.samples()
+    assert samples[('/result/<input>', 'GET', '200')][2] == 2
+    assert samples[('unmatched', 'GET', '404')][2] == 1
+
+
+def test_timed_records_the_function_name():
+    """Tests that decorated functions are recorded under their component and name."""
+
+    metrics = Metrics()
+
+    @metrics.timed('openai')
+    def generate_summary():
+        return 'summary'
+
+    assert generate_summary() == 'summary'
+    assert ('openai', 'generate_summary') in metrics.dependencies.samples()
+
+
+def test_render_types_totals_as_counters():
+    """Tests that gauges named *_total are exposed as counters."""
+
+    text = Metrics().render({'cache_hits_total': ('Hits.', 3), 'cache_entries': ('Entries.', 2)})
+
+    assert '# TYPE internet_archiver_cache_hits_total counter' in text
+    assert 'internet_archiver_cache_hits_total 3' in text
+    assert '# TYPE internet_archiver_cache_entries gauge' in text
+
+
+def test_instrumented_s3_client_raises_connection_errors():
+    """Tests that an S3 call failing before a response keeps its own error and is still timed."""
+
+    s3_client = instrument_s3_client(client(
+        's3', endpoint_url='http://127.0.0.1:1', region_name='eu-west-2',
+        aws_access_key_id='key', aws_secret_access_key='secret',
+        config=Config(retries={'max_attempts': 0}, connect_timeout=1)))
+
+    with patch('metrics.metrics', Metrics()) as test_metrics:
+        with raises(EndpointConnectionError):
+            s3_client.head_object(Bucket='bucket', Key='key')
+
+    assert ('s3', 'HeadObject') in test_metrics.dependencies.samples()
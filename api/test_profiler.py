@@ -0,0 +1,76 @@
+"""Unit tests for the profiler.py file."""
+from threading import Event, Thread
+from time import sleep
+
+from flask import Flask
+import pytest
+
+from profiler import ProfilerBusy, RequestProfiler
+
+
+def make_app(profiler: RequestProfiler, release: Event) -> Flask:
+    """Returns an app with a slow route and a fast route."""
+
+    app = Flask(__name__)
+    profiler.init_app(app)
+
+    @app.get('/slow/<name>')
+    def slow(name):
+        release.wait(timeout=5)
+        return name
+
+    @app.get('/fast')
+    def fast():
+        return 'fast'
+
+    return app
+
+
+def test_profile_requests_samples_only_the_chosen_route():
+    """Tests that the next requests to a route are sampled, labelled by method and route."""
+
+    profiler = RequestProfiler(interval=0.001)
+    release = Event()
+    app = make_app(profiler, release)
+    results = []
+
+    profiling = Thread(target=lambda: results.append(
+        profiler.profile_requests('/slow/<name>', 1, timeout=5)))
+    profiling.start()
+    sleep(0.05)
+
+    request = Thread(target=app.test_client().get, args=('/slow/bbc',))
+    request.start()
+    app.test_client().get('/fast')
+    sleep(0.05)
+    release.set()
+    request.join()
+    profiling.join()
+
+    folded, samples = results[0]
+    assert samples > 0
+    assert all(line.startswith('GET /slow/<name>;') for line in folded.splitlines())
+    assert ';test_profiler:slow;' in folded
+
+
+def test_profile_for_stops_after_the_given_seconds():
+    """Tests that a timed profile returns once its time is up, even with no requests."""
+
+    folded, samples = RequestProfiler().profile_for(0.05)
+
+    assert folded == ''
+    assert samples == 0
+
+
+def test_only_one_profile_runs_at_a_time():
+    """Tests that a second profile is refused while the first is running."""
+
+    profiler = RequestProfiler()
+    profiling = Thread(target=profiler.profile_for, args=(0.2,))
+    profiling.start()
+    sleep(0.05)
+
+    with pytest.raises(ProfilerBusy):
+        profiler.profile_for(0.01)
+
+    profiling.join()
@@ -0,0 +1,86 @@
+"""Unit tests for the s3_cache.py file."""
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from s3_cache import S3DiskCache, link_or_copy, TEMP_PREFIX
+
+
+def make_s3_client(contents: bytes = b'0123456789') -> MagicMock:
+    """Returns a mock S3 client whose downloads write the given contents."""
+
+    def download_file(bucket, key, filename):
+        with open(filename, 'wb') as file:
+            file.write(contents)
+
+    s3_client = MagicMock()
+    s3_client.download_file.side_effect = download_file
+    return s3_client
+
+
+def test_fetch_downloads_once_then_hits(tmp_path):
+    """Tests that a second fetch of a key is served from disk."""
+
+    cache = S3DiskCache(str(tmp_path), max_bytes=1000)
+    s3_client = make_s3_client()
+
+    first = cache.fetch(s3_client, 'bucket', 'www.bbc.co.uk/BBC/1.png')
+    second = cache.fetch(s3_client, 'bucket', 'www.bbc.co.uk/BBC/1.png')
+
+    assert first == second
+    s3_client.download_file.assert_called_once()
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_read_returns_object_contents(tmp_path):
+    """Tests that read returns the downloaded bytes."""
+
+    cache = S3DiskCache(str(tmp_path))
+
+    assert cache.read(make_s3_client(b'<html>'), 'bucket', 'a.html') == b'<html>'
+
+
+def test_least_recently_used_objects_are_evicted(tmp_path):
+    """Tests that going over max_bytes removes the oldest files first."""
+
+    cache = S3DiskCache(str(tmp_path), max_bytes=25)
+    s3_client = make_s3_client()
+
+    oldest = cache.fetch(s3_client, 'bucket', 'a')
+    os.utime(oldest, (1, 1))
+    newest = cache.fetch(s3_client, 'bucket', 'b')
+    cache.fetch(s3_client, 'bucket', 'c')
+
+    assert not os.path.exists(oldest)
+    assert os.path.exists(newest)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_failed_download_leaves_no_partial_file(tmp_path):
+    """Tests that an interrupted download does not leave anything in the cache."""
+
+    cache = S3DiskCache(str(tmp_path))
+    s3_client = MagicMock()
+    s3_client.download_file.side_effect = ValueError()
+
+    with pytest.raises(ValueError):
+        cache.fetch(s3_client, 'bucket', 'a')
+
+    leftovers = [name for _, _, names in os.walk(tmp_path) for name in names
+                 if name.startswith(TEMP_PREFIX)]
+    assert not leftovers
+
+
+def test_link_or_copy_places_file(tmp_path):
+    """Tests that link_or_copy creates the destination with the same contents."""
+
+    source = tmp_path / 'source'
+    source.write_bytes(b'image')
+    destination = tmp_path / 'static' / 'image.png'
+    destination.parent.mkdir()
+
+    link_or_copy(str(source), str(destination))
+
+    assert destination.read_bytes() == b'image'
@@ -0,0 +1,67 @@
+"""Unit tests for the thumbnails.py file."""
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+from PIL import Image
+
+from s3_cache import S3DiskCache
+from thumbnails import (
+    get_contact_sheet_path,
+    get_thumbnail_path,
+    sprite_position,
+    sprite_size
+)
+
+
+def test_get_thumbnail_path_shrinks_and_caches_the_screenshot(tmp_path):
+    """Tests that a screenshot is downscaled once, then served from the cache."""
+
+    def download_file(bucket, key, path):
+        Image.new('RGBA', (1920, 1080), 'red').save(path, format='PNG')
+
+    s3_client = MagicMock()
+    s3_client.download_file.side_effect = download_file
+    cache = S3DiskCache(str(tmp_path))
+
+    path = get_thumbnail_path(s3_client, 'bucket', 'example/page.png', cache, (480, 360))
+    assert get_thumbnail_path(s3_client, 'bucket', 'example/page.png', cache, (480, 360)) == path
+
+    with Image.open(path) as thumbnail:
+        assert thumbnail.format == 'JPEG'
+        assert thumbnail.size == (480, 270)
+    s3_client.download_file.assert_called_once()
+
+
+def test_get_contact_sheet_path_tiles_each_screenshot_once(tmp_path):
+    """Tests that the sheet holds a tile per screenshot, leaving missing ones blank, and is cached."""
+
+    colours = {'a.png': 'red', 'b.png': 'blue'}
+
+    def download_file(bucket, key, path):
+        if key not in colours:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        Image.new('RGB', (800, 600), colours[key]).save(path, format='PNG')
+
+    s3_client = MagicMock()
+    s3_client.download_file.side_effect = download_file
+    cache = S3DiskCache(str(tmp_path))
+    keys = ['a.png', 'missing.png', 'b.png']
+
+    path = get_contact_sheet_path(s3_client, 'bucket', keys, cache, (40, 30))
+    assert get_contact_sheet_path(s3_client, 'bucket', keys, cache, (40, 30)) == path
+
+    with Image.open(path) as sheet:
+        assert sheet.size == (120, 30)
+        assert sheet.getpixel((20, 15))[0] > 200
+        assert sheet.getpixel((60, 15)) == (211, 211, 211)
+        assert sheet.getpixel((100, 15))[2] > 200
+    assert s3_client.download_file.call_count == 3
+
+
+def test_sprite_position_of_each_tile():
+    """Tests that each tile of a 4 by 2 sheet is addressed by percentage offsets."""
+
+    assert sprite_size(6) == '400% 200%'
+    assert [sprite_position(index, 6) for index in (0, 1, 3, 4, 5)] == \
+        ['0% 0%', '33.3333% 0%', '100% 0%', '0% 100%', '33.3333% 100%']
+    assert (sprite_size(1), sprite_position(0, 1)) == ('100% 100%', '0% 0%')
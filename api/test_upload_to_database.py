@@ -0,0 +1,105 @@
+"""Unit tests for the upload_to_database.py file."""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from psycopg2 import errors, sql
+
+from upload_to_database import add_interactions, add_url, upsert_urls
+
+
+class MissingPartition(errors.CheckViolation):
+    """The error Postgres raises for a row in a month with no partition."""
+
+    diag = SimpleNamespace(
+        message_primary='no partition of relation "user_interaction" found for row')
+
+
+def query_text(query: sql.Composable) -> str:
+    """Returns a composed query as text, quoting identifiers, without a connection."""
+
+    if isinstance(query, sql.Composed):
+        return "".join(query_text(part) for part in query.seq)
+    if isinstance(query, sql.Identifier):
+        return ".".join(f'"{name}"' for name in query.strings)
+
+    return query.string
+
+
+@patch("upload_to_database.execute_values")
+def test_upsert_urls_single_row(mock_execute_values):
+    """Tests that upsert_urls sends one row with any missing fields as None."""
+
+    mock_execute_values.return_value = [('https://www.bbc.co.uk', 1)]
+    cur = MagicMock()
+
+    url_ids = upsert_urls(cur, [{'url': 'https://www.bbc.co.uk', 'title': 'BBC'}])
+
+    assert url_ids == {'https://www.bbc.co.uk': 1}
+    assert mock_execute_values.call_args.args[2] == [('https://www.bbc.co.uk', 'BBC', None, None)]
+    assert mock_execute_values.call_args.kwargs == {'page_size': 1, 'fetch': True}
+
+
+@patch("upload_to_database.execute_values")
+def test_upsert_urls_batch_merges_duplicates(mock_execute_values):
+    """Tests that upsert_urls sends each url once, sorted, keeping values any duplicate gives."""
+
+    mock_execute_values.return_value = [('https://a.com', 1), ('https://b.com', 2)]
+    cur = MagicMock()
+    urls = [{'url': 'https://b.com'},
+            {'url': 'https://a.com', 'title': 'A'},
+            {'url': 'https://b.com', 'summary': 'About B'},
+            {'url': 'https://a.com', 'genre': 'News'}]
+
+    url_ids = upsert_urls(cur, urls)
+
+    assert url_ids == {'https://a.com': 1, 'https://b.com': 2}
+    assert mock_execute_values.call_args.args[2] == [('https://a.com', 'A', None, 'News'),
+                                                     ('https://b.com', None, 'About B', None)]
+    assert mock_execute_values.call_args.kwargs['page_size'] == 2
+
+
+@patch("upload_to_database.execute_values")
+def test_upsert_urls_keeps_existing_title(mock_execute_values):
+    """Tests that a url saved without a title keeps the title already stored."""
+
+    mock_execute_values.return_value = [('https://www.bbc.co.uk', 1)]
+
+    upsert_urls(MagicMock(), [{'url': 'https://www.bbc.co.uk'}])
+
+    query = query_text(mock_execute_values.call_args.args[1])
+    assert 'ON CONFLICT ("url")' in query
+    assert '"title" = COALESCE(EXCLUDED."title", "url"."title")' in query
+    assert mock_execute_values.call_args.args[2] == [('https://www.bbc.co.uk', None, None, None)]
+
+
+@patch("upload_to_database.execute_values")
+def test_add_url_sets_url_id(mock_execute_values):
+    """Tests that add_url commits the upsert and adds the url_id to the response data."""
+
+    mock_execute_values.return_value = [('https://www.bbc.co.uk', 7)]
+    conn = MagicMock()
+    response_data = {'url': 'https://www.bbc.co.uk', 'title': 'BBC', 'summary': None}
+
+    add_url(conn, response_data)
+
+    assert response_data['url_id'] == 7
+    conn.commit.assert_called_once()
+
+
+@patch("upload_to_database.create_upcoming_partitions")
+@patch("upload_to_database.execute_values")
+def test_add_interactions_creates_missing_partitions(mock_execute_values,
+                                                     mock_create_upcoming_partitions):
+    """Tests that a batch landing in a month with no partition is retried once it exists."""
+
+    mock_execute_values.side_effect = [MissingPartition(), None, None, None]
+    conn = MagicMock()
+    interactions = [{'url': 'https://www.bbc.co.uk', 'url_id': 1, 'type': 'visit',
+                     'interact_at': '2024-01-10 12:00:00'}]
+
+    add_interactions(conn, interactions)
+
+    conn.rollback.assert_called_once()
+    mock_create_upcoming_partitions.assert_called_once_with(conn)
+    assert mock_execute_values.call_count == 4
+    conn.commit.assert_called_once()
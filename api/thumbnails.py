@@ -0,0 +1,116 @@
+"""Functions to make and cache small versions of page screenshots."""
+from concurrent.futures import ThreadPoolExecutor
+import math
+
+from boto3 import client
+from botocore.exceptions import ClientError
+from PIL import Image
+
+from s3_cache import S3DiskCache
+
+THUMBNAIL_SIZE = (480, 360)
+THUMBNAIL_QUALITY = 80
+CONTACT_SHEET_COLUMNS = 4
+CONTACT_SHEET_DOWNLOADS = 8
+MISSING_TILE_COLOUR = 'lightgrey'
+
+
+def write_thumbnail(source_path: str, destination_path: str,
+                    size: tuple[int, int] = THUMBNAIL_SIZE) -> None:
+    """Writes a JPEG no larger than size of the image at source_path."""
+
+    with Image.open(source_path) as image:
+        image = image.convert('RGB')
+        image.thumbnail(size)
+        image.save(destination_path, format='JPEG',
+                   quality=THUMBNAIL_QUALITY, optimize=True)
+
+
+def get_thumbnail_path(s3_client: client, bucket: str, png_key: str,
+                       cache: S3DiskCache, size: tuple[int, int] = THUMBNAIL_SIZE) -> str:
+    """Returns a local path to the thumbnail of a screenshot, making it on first request."""
+
+    name = f"thumbnail:{size[0]}x{size[1]}:{bucket}/{png_key}"
+
+    def generate(path: str) -> None:
+        write_thumbnail(cache.fetch(s3_client, bucket, png_key), path, size)
+
+    return cache.fetch_generated(name, generate)
+
+
+def contact_sheet_grid(count: int, columns: int = CONTACT_SHEET_COLUMNS) -> tuple[int, int]:
+    """Returns the columns and rows of a contact sheet holding count thumbnails."""
+
+    columns = max(1, min(count, columns))
+
+    return columns, max(1, math.ceil(count / columns))
+
+
+def sprite_size(count: int, columns: int = CONTACT_SHEET_COLUMNS) -> str:
+    """Returns the CSS background-size that scales one tile of a contact sheet to its element."""
+
+    columns, rows = contact_sheet_grid(count, columns)
+
+    return f"{columns * 100}% {rows * 100}%"
+
+
+def sprite_position(index: int, count: int, columns: int = CONTACT_SHEET_COLUMNS) -> str:
+    """Returns the CSS background-position showing the index-th tile of a contact sheet."""
+
+    columns, rows = contact_sheet_grid(count, columns)
+    column, row = index % columns, index // columns
+
+    def percent(offset: int, length: int) -> str:
+        return f"{offset * 100 / (length - 1):g}%" if length > 1 else '0%'
+
+    return f"{percent(column, columns)} {percent(row, rows)}"
+
+
+def write_contact_sheet(tile_paths: list[str | None], destination_path: str,
+                        size: tuple[int, int] = THUMBNAIL_SIZE,
+                        columns: int = CONTACT_SHEET_COLUMNS) -> None:
+    """Writes one JPEG with each image centred in its own size tile, left to right then down.
+
+    Tiles without an image are left blank.
+    """
+
+    columns, rows = contact_sheet_grid(len(tile_paths), columns)
+    sheet = Image.new('RGB', (columns * size[0], rows * size[1]), MISSING_TILE_COLOUR)
+
+    for index, path in enumerate(tile_paths):
+        if path is None:
+            continue
+        with Image.open(path) as tile:
+            tile = tile.convert('RGB')
+            tile.thumbnail(size)
+            left = (index % columns) * size[0] + (size[0] - tile.width) // 2
+            top = (index // columns) * size[1] + (size[1] - tile.height) // 2
+            sheet.paste(tile, (left, top))
+
+    sheet.save(destination_path, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+
+
+def get_contact_sheet_path(s3_client: client, bucket: str, png_keys: list[str],
+                           cache: S3DiskCache, size: tuple[int, int] = THUMBNAIL_SIZE) -> str:
+    """Returns a local path to a contact sheet of the screenshots' thumbnails, making it once.
+
+    The sheet is cached under its list of screenshots, so a page of history gets
+    a new sheet only when its captures change.
+    """
+
+    name = f"contact-sheet:{size[0]}x{size[1]}:{bucket}/" + '\n'.join(png_keys)
+
+    def get_tile(png_key: str) -> str | None:
+        try:
+            return get_thumbnail_path(s3_client, bucket, png_key, cache, size)
+        except ClientError as error:
+            if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def generate(path: str) -> None:
+        with ThreadPoolExecutor(max_workers=CONTACT_SHEET_DOWNLOADS) as executor:
+            tile_paths = list(executor.map(get_tile, png_keys))
+        write_contact_sheet(tile_paths, path, size)
+
+    return cache.fetch_generated(name, generate)
@@ -2,17 +2,57 @@
 from time import perf_counter
 from os import environ
 from datetime import datetime
+from collections import Counter
+from functools import wraps
 import logging
 
 from dotenv import load_dotenv
-from psycopg2 import sql, extensions
+from psycopg2 import sql, extensions, errors
+from psycopg2.extras import execute_values
 
 from connect import get_connection
 
 VISIT_ID = 1
 SAVE_ID = 2
+INTERACTION_TYPE_IDS = {'visit': VISIT_ID, 'save': SAVE_ID}
+PARTITION_MONTHS_AHEAD = 3
+MISSING_PARTITION = 'no partition of relation'
 
 
+def create_upcoming_partitions(conn: extensions.connection,
+                               months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """Creates any missing monthly partitions of page_scrape and user_interaction, up to
+    months_ahead months from now, returning how many were added."""
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT create_upcoming_partitions(%s);", (months_ahead,))
+        created = cur.fetchone()[0]
+        conn.commit()
+
+    return created
+
+
+def creates_missing_partitions(insert):
+    """Retries an insert once, after creating the upcoming partitions, if one of its rows
+    fell in a month that had no partition yet."""
+
+    @wraps(insert)
+    def wrapper(conn: extensions.connection, *args, **kwargs):
+        try:
+            return insert(conn, *args, **kwargs)
+        except errors.CheckViolation as error:
+            if MISSING_PARTITION not in (error.diag.message_primary or ''):
+                raise
+            conn.rollback()
+            logging.warning("%s, creating partitions.", error.diag.message_primary)
+
+        create_upcoming_partitions(conn)
+        return insert(conn, *args, **kwargs)
+
+    return wrapper
+
+
+@creates_missing_partitions
 def add_interaction(conn: extensions.connection, interaction_data: dict) -> None:
     """Adds interactions to the interactions database."""
     update_time = perf_counter()
@@ -46,60 +86,265 @@ def add_interaction(conn: extensions.connection, interaction_data: dict) -> None
 
     with conn.cursor() as cur:
         cur.execute(interaction_query)
+        increment_interaction_counts(
+            cur, {(interaction_data["url_id"], type_id): 1})
+        increment_hourly_counts(
+            cur, [(interaction_data["url_id"], type_id, interaction_data.get("interact_at"))])
         conn.commit()
 
     logging.info("Interaction Uploaded --- %ss.",
                  round(perf_counter() - update_time, 3))
 
 
-def add_url(conn: extensions.connection, response_data: dict) -> None:
-    """Adds a website's url to the database and extracts the url_id."""
-    # query to search for the corresponding url_id
+def increment_interaction_counts(cur: extensions.cursor,
+                                 counts: dict[tuple[int, int], int]) -> None:
+    """Adds to the per-url interaction counters inside the caller's transaction."""
+
+    query = sql.SQL("""
+                    INSERT INTO {table}
+                        ({fields})
+                    VALUES %s
+                    ON CONFLICT ({url_id}, {type_id})
+                    DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count};""").format(
+        table=sql.Identifier('interaction_count'),
+        fields=sql.SQL(',').join([
+            sql.Identifier('url_id'),
+            sql.Identifier('type_id'),
+            sql.Identifier('interaction_count')
+        ]),
+        url_id=sql.Identifier('url_id'),
+        type_id=sql.Identifier('type_id'),
+        count=sql.Identifier('interaction_count'))
+
+    # sorted so concurrent writers lock the counter rows in the same order
+    execute_values(cur, query, [(url_id, type_id, count)
+                                for (url_id, type_id), count in sorted(counts.items())])
+
+
+def increment_hourly_counts(cur: extensions.cursor, rows: list[tuple]) -> None:
+    """Adds (url_id, type_id, interact_at) interactions to the hourly rollup inside the
+    caller's transaction."""
+
+    query = sql.SQL("""
+                    INSERT INTO {table}
+                        ({fields})
+                    SELECT {url_id}, {type_id}, date_trunc('hour', {interact_at}::timestamp),
+                        COUNT(*)
+                    FROM (VALUES %s) AS interaction ({url_id}, {type_id}, {interact_at})
+                    GROUP BY 1, 2, 3
+                    ORDER BY 1, 2, 3
+                    ON CONFLICT ({url_id}, {type_id}, {hour})
+                    DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count};""").format(
+        table=sql.Identifier('interaction_hourly'),
+        fields=sql.SQL(',').join([
+            sql.Identifier('url_id'),
+            sql.Identifier('type_id'),
+            sql.Identifier('hour'),
+            sql.Identifier('interaction_count')
+        ]),
+        url_id=sql.Identifier('url_id'),
+        type_id=sql.Identifier('type_id'),
+        interact_at=sql.Identifier('interact_at'),
+        hour=sql.Identifier('hour'),
+        count=sql.Identifier('interaction_count'))
+
+    # grouped in SQL as interactions in the same hour share a row, which one
+    # statement cannot update twice; a single page keeps that grouping whole
+    execute_values(cur, query, rows, page_size=max(len(rows), 1))
+
+
+@creates_missing_partitions
+def add_interactions(conn: extensions.connection, interactions: list[dict]) -> None:
+    """Adds a batch of interactions in one multi-row insert and a single commit."""
     upload_time = perf_counter()
 
+    for interaction_data in interactions:
+        if interaction_data.get("type") not in INTERACTION_TYPE_IDS:
+            raise ValueError("Invalid type value")
+
+    urls = list({interaction_data["url"] for interaction_data in interactions
+                 if "url_id" not in interaction_data})
+
     search_query = sql.SQL("""
-                           SELECT {field} 
-                            FROM {table} 
-                            WHERE {url} = %s
+                           SELECT {url}, {url_id}
+                            FROM {table}
+                            WHERE {url} = ANY(%s)
                            """).format(
-        field=sql.Identifier('url_id'),
+        url=sql.Identifier('url'),
+        url_id=sql.Identifier('url_id'),
+        table=sql.Identifier('url'))
+
+    with conn.cursor() as cur:
+        cur.execute(search_query, (urls,))
+        url_ids = dict(cur.fetchall())
+
+        # nearly every url has been seen before, so only new ones are upserted
+        new_urls = [{"url": url} for url in urls if url not in url_ids]
+        if new_urls:
+            url_ids.update(upsert_urls(cur, new_urls))
+
+    interaction_query = sql.SQL("""
+                    INSERT INTO {table}
+                        ({fields})
+                    VALUES %s;""").format(
+        table=sql.Identifier('user_interaction'),
+        fields=sql.SQL(',').join([
+            sql.Identifier('url_id'),
+            sql.Identifier('type_id'),
+            sql.Identifier('interact_at')
+        ]))
+
+    rows = [(interaction_data.get("url_id", url_ids.get(interaction_data["url"])),
+             INTERACTION_TYPE_IDS[interaction_data["type"]],
+             interaction_data.get("interact_at"))
+            for interaction_data in interactions]
+
+    with conn.cursor() as cur:
+        execute_values(cur, interaction_query, rows)
+        increment_interaction_counts(
+            cur, Counter((url_id, type_id) for url_id, type_id, _ in rows))
+        increment_hourly_counts(cur, rows)
+        conn.commit()
+
+    logging.info("%s Interactions Uploaded --- %ss.",
+                 len(rows), round(perf_counter() - upload_time, 3))
+
+
+def upsert_urls(cur: extensions.cursor, urls: list[dict]) -> dict[str, int]:
+    """Inserts any new urls and returns every url's url_id in one statement, inside the
+    caller's transaction.
+
+    Titles, summaries and genres that are given replace the stored ones, and those
+    left out are kept, so saving a page twice at once still leaves a single row.
+    """
+
+    query = sql.SQL("""
+                    INSERT INTO {table}
+                        ({fields})
+                    VALUES %s
+                    ON CONFLICT ({url})
+                    DO UPDATE SET {title} = COALESCE(EXCLUDED.{title}, {table}.{title}),
+                                  {summary} = COALESCE(EXCLUDED.{summary}, {table}.{summary}),
+                                  {genre} = COALESCE(EXCLUDED.{genre}, {table}.{genre})
+                    RETURNING {url}, {url_id};""").format(
         table=sql.Identifier('url'),
-        url=sql.Identifier('url'))
+        fields=sql.SQL(',').join([
+            sql.Identifier('url'),
+            sql.Identifier('title'),
+            sql.Identifier('summary'),
+            sql.Identifier('genre')
+        ]),
+        url=sql.Identifier('url'),
+        url_id=sql.Identifier('url_id'),
+        title=sql.Identifier('title'),
+        summary=sql.Identifier('summary'),
+        genre=sql.Identifier('genre'))
+
+    # one row per url, as a statement cannot update a row twice, keeping any value
+    # a duplicate gives; sorted so concurrent writers lock the rows in the same order
+    rows = {}
+    for url_data in urls:
+        given = (url_data["url"], url_data.get("title"),
+                 url_data.get("summary"), url_data.get("genre"))
+        kept = rows.get(url_data["url"], given)
+        rows[url_data["url"]] = tuple(value if value is not None else old_value
+                                      for value, old_value in zip(given, kept))
+
+    return dict(execute_values(cur, query, [rows[url] for url in sorted(rows)],
+                               page_size=max(len(rows), 1), fetch=True))
+
+
+def add_url(conn: extensions.connection, response_data: dict) -> None:
+    """Adds a website's url to the database, or updates it, and extracts the url_id."""
+    upload_time = perf_counter()
 
     with conn.cursor() as cur:
-        cur.execute(search_query, (response_data["url"],))
-        url_id = cur.fetchone()
-        # checking if site has been archived before
-        if not url_id:
-            # inserting url to url table
-            insert_query = sql.SQL("""
-                    INSERT INTO {table} 
+        url_ids = upsert_urls(cur, [response_data])
+        conn.commit()
+
+    # adding the url_id to the response dictionary
+    response_data["url_id"] = url_ids[response_data["url"]]
+
+    logging.info("URL Uploaded --- %ss.",
+                 round(perf_counter() - upload_time, 3))
+
+
+def update_url_summary(conn: extensions.connection, url_id: int,
+                       summary: str | None, genre: str | None) -> None:
+    """Fills in a url's AI summary and genre if they have not been set yet."""
+    update_time = perf_counter()
+
+    query = sql.SQL("""
+                    UPDATE {table}
+                    SET {summary} = COALESCE({summary}, %s),
+                        {genre} = COALESCE({genre}, %s)
+                    WHERE {url_id} = %s;""").format(
+        table=sql.Identifier('url'),
+        summary=sql.Identifier('summary'),
+        genre=sql.Identifier('genre'),
+        url_id=sql.Identifier('url_id'))
+
+    with conn.cursor() as cur:
+        cur.execute(query, (summary, genre, url_id))
+        conn.commit()
+
+    logging.info("Summary Updated --- %ss.",
+                 round(perf_counter() - update_time, 3))
+
+
+def add_capture_batch(conn: extensions.connection, batch_id: str, urls: list[str]) -> None:
+    """Records a bulk capture request, with each of its urls queued."""
+    batch_time = perf_counter()
+
+    batch_query = sql.SQL("INSERT INTO {table} ({batch_id}) VALUES (%s);").format(
+        table=sql.Identifier('capture_batch'),
+        batch_id=sql.Identifier('batch_id'))
+
+    url_query = sql.SQL("""
+                    INSERT INTO {table}
                         ({fields})
-                    VALUES
-                        ({values});""").format(
-                table=sql.Identifier('url'),
-                fields=sql.SQL(',').join([
-                    sql.Identifier('url'),
-                    sql.Identifier('summary'),
-                    sql.Identifier('genre')
-                ]),
-                values=sql.SQL(',').join([
-                    sql.Literal(response_data["url"]),
-                    sql.Literal(response_data.get("summary")),
-                    sql.Literal(response_data.get("genre"))
-                ])
-            )
-            cur.execute(insert_query)
-            cur.execute(search_query, (response_data["url"],))
-            url_id = cur.fetchone()
-
-        # adding the url_id to the response dictionary
-        response_data["url_id"] = url_id[0]
+                    VALUES %s;""").format(
+        table=sql.Identifier('capture_batch_url'),
+        fields=sql.SQL(',').join([
+            sql.Identifier('batch_id'),
+            sql.Identifier('position'),
+            sql.Identifier('url')
+        ]))
+
+    with conn.cursor() as cur:
+        cur.execute(batch_query, (batch_id,))
+        execute_values(cur, url_query, [(batch_id, position, url)
+                                        for position, url in enumerate(urls)])
+        conn.commit()
+
+    logging.info("Batch of %s urls added --- %ss.", len(urls),
+                 round(perf_counter() - batch_time, 3))
+
+
+def update_batch_url_status(conn: extensions.connection, batch_id: str, position: int,
+                            status: str, error: str = None, url_id: int = None) -> None:
+    """Records the progress of one url in a bulk capture request."""
+
+    query = sql.SQL("""
+                    UPDATE {table}
+                    SET {status} = %s, {error} = %s,
+                        {url_id} = COALESCE(%s, {url_id}),
+                        {updated_at} = now() AT TIME ZONE 'utc'
+                    WHERE {batch_id} = %s AND {position} = %s;""").format(
+        table=sql.Identifier('capture_batch_url'),
+        status=sql.Identifier('status'),
+        error=sql.Identifier('error'),
+        url_id=sql.Identifier('url_id'),
+        updated_at=sql.Identifier('updated_at'),
+        batch_id=sql.Identifier('batch_id'),
+        position=sql.Identifier('position'))
+
+    with conn.cursor() as cur:
+        cur.execute(query, (status, error, url_id, batch_id, position))
         conn.commit()
-        logging.info("URL Uploaded --- %ss.",
-                     round(perf_counter() - upload_time, 3))
 
 
+@creates_missing_partitions
 def add_website(conn: extensions.connection, response_data: dict) -> None:
     """Adds a website's data to the database."""
     upload_time = perf_counter()
@@ -116,7 +361,8 @@ def add_website(conn: extensions.connection, response_data: dict) -> None:
             sql.Identifier('html_s3_ref'),
             sql.Identifier('css_s3_ref'),
             sql.Identifier('screenshot_s3_ref'),
-            sql.Identifier('is_human')
+            sql.Identifier('is_human'),
+            sql.Identifier('content_vector')
         ]),
         values=sql.SQL(',').join([
             sql.Literal(response_data["url_id"]),
@@ -124,7 +370,9 @@ def add_website(conn: extensions.connection, response_data: dict) -> None:
             sql.Literal(response_data["html_s3_ref"]),
             sql.Literal(response_data["css_s3_ref"]),
             sql.Literal(response_data["screenshot_s3_ref"]),
-            sql.Literal(response_data["is_human"])
+            sql.Literal(response_data["is_human"]),
+            sql.SQL("to_tsvector('english', {})").format(
+                sql.Literal(response_data.get("text")))
         ])
     )
 
@@ -147,7 +395,7 @@ if __name__ == "__main__":
         'html_s3_ref': 'FAKE_HTML',
         'css_s3_ref': 'FAKE_CSS',
         'screenshot_s3_ref': 'FAKE_SCREENSHOT',
-        'scrape_at': datetime(2023, 6, 22, 19, 10, 20),
+        'scrape_at': datetime.utcnow(),
         'is_human': True,
         'summary': 'FAKE SUMMARY',
         'genre': 'media'
@@ -159,7 +407,7 @@ if __name__ == "__main__":
     example_interaction_data = {
         'url': "https://www.bbc.co.uk",
         'type': 'save',
-        'interact_at': datetime(2023, 9, 26, 18, 10, 20)
+        'interact_at': datetime.utcnow()
     }
 
     add_url(connection, example_interaction_data)
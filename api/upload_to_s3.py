@@ -9,6 +9,8 @@ from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from urllib.request import urlopen, Request
 
+FETCH_TIMEOUT_SECONDS = 30
+
 
 def get_s3_client(config: _Environ) -> client:
     """Gets S3 client."""
@@ -28,11 +30,15 @@ def extract_title(url: str) -> str:
     """Extracts title used for s3_filename from given url."""
 
     req = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-    page = urlopen(req)
-    soup = BeautifulSoup(page, 'html.parser')
-    title = soup.title.text.strip()
+    page = urlopen(req, timeout=FETCH_TIMEOUT_SECONDS)
+
+    return extract_title_from_soup(BeautifulSoup(page, 'html.parser'))
+
+
+def extract_title_from_soup(soup: BeautifulSoup) -> str:
+    """Extracts title used for s3_filename from an already fetched page."""
 
-    return sanitise_filename(title)
+    return sanitise_filename(soup.title.text.strip())
 
 
 def extract_domain(url: str) -> str:
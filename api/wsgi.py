@@ -0,0 +1,10 @@
+"""WSGI entry point for serving the API with Gunicorn."""
+from time import perf_counter
+import logging
+
+started_at = perf_counter()
+logging.getLogger().setLevel(logging.INFO)
+
+from app import create_app  # pylint: disable=wrong-import-position
+
+app = create_app(started_at)
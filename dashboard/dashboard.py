@@ -10,7 +10,12 @@ import pandas as pd
 from psycopg2 import extensions
 from streamlit_autorefresh import st_autorefresh
 
-from extract import get_connection, get_all_scrape_data, get_all_interaction_data
+from extract import (
+    get_connection,
+    get_all_scrape_data,
+    get_hourly_interaction_data,
+    get_interaction_series,
+    get_top_urls)
 from dashboard_functions import (
     make_archive_searchbar,
     make_date_filter,
@@ -21,6 +26,7 @@ from dashboard_functions import (
     make_popular_visit_bar,
     make_recent_archive_database,
     make_metrics,
+    get_most_popular_url,
     get_popular_screenshot,
     make_searchbar_toggle_radio)
 
@@ -48,7 +54,7 @@ def setup_database(connection: extensions.connection) -> tuple[pd.DataFrame]:
     scrape_df["url_alias"] = scrape_df["url"].apply(make_url_alias)
     scrape_df["url_short"] = scrape_df["url_alias"].apply(make_shorter_alias)
 
-    interaction_df = get_all_interaction_data(connection)
+    interaction_df = get_hourly_interaction_data(connection)
     interaction_df = interaction_df[interaction_df["url"] != "Empty Database!"]
     interaction_df["url_alias"] = interaction_df["url"].apply(make_url_alias)
     interaction_df["url_short"] = interaction_df["url_alias"].apply(
@@ -88,7 +94,7 @@ if __name__ == "__main__":
         selected_date_scrape_df, selected_date_interaction_df, search_radio)
 
     make_metrics(selected_website_scrape_df, selected_website_interaction_df)
-    make_daily_tracker_line(interaction_df)
+    make_daily_tracker_line(get_interaction_series(connection, 'day'))
 
     if selected_website_interaction_df.shape[0] > 0:
         make_hourly_tracker_line(selected_website_interaction_df)
@@ -108,9 +114,9 @@ if __name__ == "__main__":
     with col2:
         if selected_website_interaction_df.shape[0] > 0 and selected_website_scrape_df.shape[0] > 0:
             get_popular_screenshot(
-                selected_website_scrape_df, selected_website_interaction_df)
+                selected_website_scrape_df, get_most_popular_url(selected_website_interaction_df))
 
         else:
-            get_popular_screenshot(scrape_df, interaction_df)
+            get_popular_screenshot(scrape_df, get_top_urls(connection, limit=1)["url"].iloc[0])
 
     connection.close()
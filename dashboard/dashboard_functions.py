@@ -26,10 +26,10 @@ def make_searchbar_toggle_radio() -> None:
 def make_metrics(scrape_data: pd.DataFrame, interaction_data: pd.DataFrame) -> None:
     """Creates metrics for number of archives, visits and saves."""
     archives = scrape_data['url'].nunique()
-    visits = interaction_data[interaction_data["type"]
-                              == 'visit']['url'].count()
-    saves = interaction_data[interaction_data["type"]
-                             == 'save']['url'].count()
+    visits = int(interaction_data[interaction_data["type"]
+                                  == 'visit']['count'].sum())
+    saves = int(interaction_data[interaction_data["type"]
+                                 == 'save']['count'].sum())
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -130,14 +130,14 @@ def make_archive_searchbar(scrape_df: pd.DataFrame, interaction_df: pd.DataFrame
             archive_pluralise = 's'
 
         visit_pluralise = ''
-        visit_count = interaction_df_result_search[interaction_df_result_search["type"]
-                                                   == 'visit'].shape[0]
+        visit_count = int(interaction_df_result_search[interaction_df_result_search["type"]
+                                                       == 'visit']['count'].sum())
         if visit_count != 1:
             visit_pluralise = 's'
 
         save_pluralise = ''
-        save_count = interaction_df_result_search[interaction_df_result_search["type"]
-                                                  == 'save'].shape[0]
+        save_count = int(interaction_df_result_search[interaction_df_result_search["type"]
+                                                      == 'save']['count'].sum())
         if save_count != 1:
             save_pluralise = 's'
 
@@ -167,7 +167,7 @@ def make_hourly_tracker_line(data: pd.DataFrame) -> None:
     saved = alt.Chart(data).mark_line().encode(
         x=alt.X("hours(interact_at):O").title("Time"),
 
-        y=alt.Y("count(url):Q").title("Count"),
+        y=alt.Y("sum(count):Q").title("Count"),
         color=alt.Color("type", scale=alt.Scale(range=['#5A5A5A', '#d15353'])).title(
             "Type"))
 
@@ -181,7 +181,7 @@ def make_daily_tracker_line(data: pd.DataFrame) -> None:
     archived = alt.Chart(data).mark_line().encode(
         x=alt.X("monthdate(interact_at):O").title("Time"),
 
-        y=alt.Y("count(url):Q").title("Count"),
+        y=alt.Y("sum(count):Q").title("Count"),
         color=alt.Color("type", scale=alt.Scale(range=['#5A5A5A', '#d15353'])).title(
             "Type"))
 
@@ -193,7 +193,7 @@ def make_popular_visit_bar(data: pd.DataFrame) -> None:
 
     st.subheader("Popular Archives")
     # Gets the 5 most popular websites
-    data = data.groupby(['url_short', 'type'])['url_short'].count().reset_index(
+    data = data.groupby(['url_short', 'type'])['count'].sum().reset_index(
         name='Count').sort_values(['Count'], ascending=False)
 
     visit_data = data[data["type"] == 'visit'].head(5)["url_short"].tolist()
@@ -219,7 +219,7 @@ def make_popular_genre_visit_bar(data: pd.DataFrame) -> None:
 
     st.subheader("Popular Genres")
     # Gets the 5 most popular genres
-    data = data.groupby(['genre', 'type'])['url_alias'].count().reset_index(
+    data = data.groupby(['genre', 'type'])['count'].sum().reset_index(
         name='Count').sort_values(['Count'], ascending=False)
 
     genre_data = data[data["type"] == 'visit'].head(5)["genre"].tolist()
@@ -249,17 +249,20 @@ def make_recent_archive_database(data: pd.DataFrame) -> None:
     st.dataframe(data)
 
 
-def get_popular_screenshot(scrape_data: pd.DataFrame, interaction_data: pd.DataFrame):
+def get_most_popular_url(interaction_data: pd.DataFrame) -> str:
+    """Returns the url with the most visits and saves."""
+
+    return interaction_data.groupby('url')['count'].sum().idxmax()
+
+
+def get_popular_screenshot(scrape_data: pd.DataFrame, popular_url: str):
     """Gets and displays the most popular sites screenshot."""
     s3_client = get_s3_client()
 
     if not os.path.exists("./screenshots"):
         os.makedirs("./screenshots")
 
-    popular_website = interaction_data.groupby(['url', 'url_alias'])['url_alias'].count(
-    ).reset_index(name='Count').sort_values(['Count'], ascending=False).head(1).iloc[0]
-
-    s3_ref = scrape_data[scrape_data["url_alias"] == popular_website["url_alias"]].tail(
+    s3_ref = scrape_data[scrape_data["url"] == popular_url].tail(
         1).iloc[0]['screenshot_s3_ref']
 
     download_data_file(
@@ -269,10 +272,10 @@ def get_popular_screenshot(scrape_data: pd.DataFrame, interaction_data: pd.DataF
 
     st.subheader("Most Popular Site")
     # Make url fit in container
-    if len(popular_website["url"]) > 35:
-        website = popular_website['url'][:35] + '...'
+    if len(popular_url) > 35:
+        website = popular_url[:35] + '...'
     else:
-        website = popular_website['url']
+        website = popular_url
     st.text(
         f"{website}")
     #  with {popular_website['Count']} visits.
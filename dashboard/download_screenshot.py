@@ -2,6 +2,10 @@
 from os import environ
 from boto3 import client
 
+from s3_cache import get_s3_cache_from_config, link_or_copy
+
+s3_cache = get_s3_cache_from_config(environ)
+
 
 def get_s3_client() -> client:
     """Gets S3 client."""
@@ -16,5 +20,6 @@ def download_data_file(s3_client: client, bucket: str, key: str, folder_name: st
 
     new_filename = key.replace('/', '-')
     print(f"\nDownloading: {key}")
-    s3_client.download_file(bucket, key, f"{folder_name}/{new_filename}")
+    link_or_copy(s3_cache.fetch(s3_client, bucket, key),
+                 f"{folder_name}/{new_filename}")
     return new_filename
@@ -1,11 +1,14 @@
 """Script containing functions to extract all data from the database."""
 from time import perf_counter
+from datetime import datetime
 from os import environ
 import logging
 
 from psycopg2 import connect, sql, DatabaseError, OperationalError, extensions
 import pandas as pd
 
+INTERVALS = ('hour', 'day', 'week', 'month')
+
 
 def get_connection(config: environ) -> extensions.connection:
     """Connects to the postgres database hosted on aws RDS."""
@@ -50,19 +53,19 @@ def get_all_scrape_data(conn: extensions.connection):
     return pd.DataFrame(rows, columns=["url", "genre", "scrape_at", "is_human", "screenshot_s3_ref"])
 
 
-def get_all_interaction_data(conn: extensions.connection):
-    """Extracts all data from the database."""
+def get_hourly_interaction_data(conn: extensions.connection) -> pd.DataFrame:
+    """Extracts the number of visits and saves of each url per hour."""
     extract_time = perf_counter()
     logging.info("Extracting data...")
     query = sql.SQL("""
                     SELECT 
-                        url, genre, interact_at, type
+                        url, genre, hour, type, interaction_count
                     FROM 
                         url
                     JOIN
-                        user_interaction ON url.url_id = user_interaction.url_id
+                        interaction_hourly ON url.url_id = interaction_hourly.url_id
                     JOIN
-                        interaction_type ON interaction_type.type_id = user_interaction.type_id
+                        interaction_type ON interaction_type.type_id = interaction_hourly.type_id
                     ;
                     """)
 
@@ -73,4 +76,71 @@ def get_all_interaction_data(conn: extensions.connection):
     logging.info("Data Extracted --- %ss.",
                  round(perf_counter() - extract_time, 3))
 
-    return pd.DataFrame(rows, columns=["url", "genre", "interact_at", "type"])
+    return pd.DataFrame(rows, columns=["url", "genre", "interact_at", "type", "count"])
+
+
+def get_interaction_series(conn: extensions.connection, interval: str = 'day',
+                           start: datetime = None, end: datetime = None) -> pd.DataFrame:
+    """Extracts the number of visits and saves per hour, day, week or month."""
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}.")
+
+    extract_time = perf_counter()
+    query = sql.SQL("""
+                    SELECT
+                        date_trunc(%(interval)s, hour) AS period, type,
+                        SUM(interaction_count)
+                    FROM
+                        interaction_hourly
+                    JOIN
+                        interaction_type ON interaction_type.type_id = interaction_hourly.type_id
+                    WHERE
+                        hour >= COALESCE(%(start)s, '-infinity'::timestamp)
+                        AND hour < COALESCE(%(end)s, 'infinity'::timestamp)
+                    GROUP BY period, type
+                    ORDER BY period
+                    ;
+                    """)
+
+    with conn.cursor() as cur:
+        cur.execute(query, {'interval': interval, 'start': start, 'end': end})
+        rows = cur.fetchall()
+
+    logging.info("Series Extracted --- %ss.",
+                 round(perf_counter() - extract_time, 3))
+
+    return pd.DataFrame(rows, columns=["interact_at", "type", "count"])
+
+
+def get_top_urls(conn: extensions.connection, interaction_type: str = None, limit: int = 5,
+                 start: datetime = None, end: datetime = None) -> pd.DataFrame:
+    """Extracts the urls with the most interactions, or of one type of interaction, most first."""
+    extract_time = perf_counter()
+    query = sql.SQL("""
+                    SELECT
+                        url, SUM(interaction_count) AS total
+                    FROM
+                        interaction_hourly
+                    JOIN
+                        url ON url.url_id = interaction_hourly.url_id
+                    JOIN
+                        interaction_type ON interaction_type.type_id = interaction_hourly.type_id
+                    WHERE
+                        (%(type)s IS NULL OR type = %(type)s)
+                        AND hour >= COALESCE(%(start)s, '-infinity'::timestamp)
+                        AND hour < COALESCE(%(end)s, 'infinity'::timestamp)
+                    GROUP BY url.url_id, url
+                    ORDER BY total DESC
+                    LIMIT %(limit)s
+                    ;
+                    """)
+
+    with conn.cursor() as cur:
+        cur.execute(query, {'type': interaction_type, 'start': start, 'end': end,
+                            'limit': limit})
+        rows = cur.fetchall()
+
+    logging.info("Top URLs Extracted --- %ss.",
+                 round(perf_counter() - extract_time, 3))
+
+    return pd.DataFrame(rows, columns=["url", "count"])
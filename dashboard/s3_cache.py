@@ -0,0 +1,195 @@
+"""A bounded, read-through local disk cache for S3 objects, which are never modified once written."""
+from os import environ
+from time import perf_counter
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+from boto3 import client
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'internet-archiver-s3-cache')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TO_FRACTION = 0.9
+TEMP_PREFIX = '.partial-'
+LOCK_FILENAME = '.lock'
+
+
+class S3DiskCache:
+    """Keeps recently used S3 objects on local disk, evicting the least recently used.
+
+    Files live at <root>/<hash[:2]>/<hash> so any number of processes can share
+    one root: downloads land in a temporary file that is atomically renamed into
+    place, hits bump the file's mtime, and eviction removes the oldest mtimes.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._approx_bytes = None
+
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, bucket: str, key: str) -> str:
+        """Returns where an object is kept in the cache."""
+
+        return self.path_for_name(f"{bucket}/{key}")
+
+    def path_for_name(self, name: str) -> str:
+        """Returns where the file cached under a name is kept."""
+
+        digest = hashlib.sha256(name.encode('utf-8')).hexdigest()
+
+        return os.path.join(self.root, digest[:2], digest)
+
+    def fetch(self, s3_client: client, bucket: str, key: str) -> str:
+        """Returns a local path holding the object, downloading it on a miss."""
+
+        return self.fetch_generated(
+            f"{bucket}/{key}",
+            lambda temp_path: s3_client.download_file(bucket, key, temp_path))
+
+    def fetch_generated(self, name: str, generate) -> str:
+        """Returns a local path for a named file, calling generate(path) to write it on a miss.
+
+        Used for files derived from immutable objects, such as thumbnails.
+        """
+
+        path = self.path_for_name(name)
+
+        try:
+            os.utime(path)
+            self.hits += 1
+            return path
+        except FileNotFoundError:
+            self.misses += 1
+
+        fetch_time = perf_counter()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX,
+                                         dir=os.path.dirname(path))
+        os.close(fd)
+
+        try:
+            generate(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        logging.info("Cached %s --- %ss.", name,
+                     round(perf_counter() - fetch_time, 3))
+
+        self._record_write(os.path.getsize(path))
+
+        return path
+
+    def read(self, s3_client: client, bucket: str, key: str) -> bytes:
+        """Returns the object's contents, downloading it on a miss."""
+
+        with open(self.fetch(s3_client, bucket, key), 'rb') as file:
+            return file.read()
+
+    def stats(self) -> dict:
+        """Returns this process's hit/miss counters and the cache's estimated size."""
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'bytes': self._approx_bytes or 0,
+            'max_bytes': self.max_bytes
+        }
+
+    def _record_write(self, size: int) -> None:
+        """Tracks the cache size and evicts once it goes over max_bytes."""
+
+        if self._approx_bytes is None:
+            self._approx_bytes = self._scan_size()
+        else:
+            self._approx_bytes += size
+
+        if self._approx_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes least recently used files until the cache is under its target size."""
+
+        with open(os.path.join(self.root, LOCK_FILENAME), 'w', encoding='utf-8') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # another process is already evicting
+                return
+
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            target = self.max_bytes * EVICT_TO_FRACTION
+
+            for path, _, size in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self.evictions += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+            self._approx_bytes = total
+
+    def _entries(self) -> list[tuple[str, float, int]]:
+        """Returns (path, mtime, size) for every complete file in the cache."""
+
+        entries = []
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.startswith(TEMP_PREFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+
+        return entries
+
+    def _scan_size(self) -> int:
+        """Returns the total size of the files currently in the cache."""
+
+        return sum(size for _, _, size in self._entries())
+
+
+def link_or_copy(source: str, destination: str) -> None:
+    """Atomically places a cached file at destination, hard linking it where possible."""
+
+    directory = os.path.dirname(destination) or '.'
+    fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=directory)
+    os.close(fd)
+    os.remove(temp_path)
+
+    try:
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def get_s3_cache_from_config(config: environ) -> S3DiskCache:
+    """Creates a cache using the optional S3_CACHE_DIR and S3_CACHE_MAX_BYTES settings."""
+
+    return S3DiskCache(config.get('S3_CACHE_DIR', DEFAULT_CACHE_DIR),
+                       int(config.get('S3_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
@@ -0,0 +1,3 @@
+source .env
+export PGPASSWORD=$DB_PASSWORD
+psql -h $DB_IP -U $DB_USERNAME -d $DB_NAME -p 5432 -v ON_ERROR_STOP=1 -f $1
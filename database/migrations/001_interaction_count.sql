@@ -0,0 +1,23 @@
+-- Adds a maintained per-url counter of interactions by type, backfilled from user_interaction.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS interaction_count(
+    url_id INT NOT NULL,
+    type_id INT NOT NULL,
+    interaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (url_id, type_id),
+    FOREIGN KEY (url_id) REFERENCES url(url_id),
+    FOREIGN KEY (type_id) REFERENCES interaction_type(type_id)
+);
+
+CREATE INDEX IF NOT EXISTS interaction_count_ranking_idx
+    ON interaction_count (type_id, interaction_count DESC);
+
+INSERT INTO interaction_count (url_id, type_id, interaction_count)
+    SELECT url_id, type_id, COUNT(*)
+    FROM user_interaction
+    GROUP BY url_id, type_id
+ON CONFLICT (url_id, type_id)
+    DO UPDATE SET interaction_count = EXCLUDED.interaction_count;
+
+COMMIT;
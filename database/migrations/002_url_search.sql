@@ -0,0 +1,29 @@
+-- Adds page titles to url and indexes urls, titles, summaries and genres for search.
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE url ADD COLUMN IF NOT EXISTS title TEXT;
+
+-- titles were previously only recorded in the S3 keys: {domain}/{title}/{timestamp}.html
+UPDATE url SET title = latest.title
+FROM (
+    SELECT DISTINCT ON (url_id) url_id, split_part(html_s3_ref, '/', 2) AS title
+    FROM page_scrape
+    ORDER BY url_id, scrape_at DESC
+) AS latest
+WHERE url.url_id = latest.url_id AND url.title IS NULL;
+
+ALTER TABLE url ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', url), 'A') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(genre, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS url_search_vector_idx ON url USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS url_url_trgm_idx ON url USING GIN (url gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS url_title_trgm_idx ON url USING GIN (title gin_trgm_ops);
+
+COMMIT;
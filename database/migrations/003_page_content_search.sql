@@ -0,0 +1,11 @@
+-- Adds a full-text index over the visible text of each capture.
+BEGIN;
+
+ALTER TABLE page_scrape ADD COLUMN IF NOT EXISTS content_vector tsvector;
+
+CREATE INDEX IF NOT EXISTS page_scrape_content_vector_idx
+    ON page_scrape USING GIN (content_vector);
+CREATE INDEX IF NOT EXISTS page_scrape_scrape_at_idx
+    ON page_scrape (scrape_at);
+
+COMMIT;
@@ -0,0 +1,7 @@
+-- Indexes each url's captures newest first, for paging through page history.
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS page_scrape_history_idx
+    ON page_scrape (url_id, scrape_at DESC, page_scrape_id DESC);
+
+COMMIT;
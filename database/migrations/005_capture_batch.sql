@@ -0,0 +1,23 @@
+-- Records bulk capture requests and the progress of each url in them.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS capture_batch(
+    batch_id UUID PRIMARY KEY,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+CREATE TABLE IF NOT EXISTS capture_batch_url(
+    batch_id UUID NOT NULL,
+    position INT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'saved', 'failed')),
+    error TEXT,
+    url_id INT,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (batch_id, position),
+    FOREIGN KEY (batch_id) REFERENCES capture_batch(batch_id) ON DELETE CASCADE,
+    FOREIGN KEY (url_id) REFERENCES url(url_id)
+);
+
+COMMIT;
@@ -0,0 +1,54 @@
+-- Makes url.url unique and indexes exact and prefix lookups of urls and S3 keys.
+-- Lookups of a url's captures by scrape_at use page_scrape_history_idx from 004.
+BEGIN;
+
+-- urls saved twice are merged into the oldest row before the unique index is built
+CREATE TEMP TABLE url_duplicate ON COMMIT DROP AS
+    SELECT url_id, MIN(url_id) OVER (PARTITION BY url) AS keep_id
+    FROM url;
+
+DELETE FROM url_duplicate WHERE url_id = keep_id;
+
+UPDATE url SET title = COALESCE(url.title, merged.title),
+               summary = COALESCE(url.summary, merged.summary),
+               genre = COALESCE(url.genre, merged.genre)
+FROM (
+    SELECT url_duplicate.keep_id, MAX(url.title) AS title,
+           MAX(url.summary) AS summary, MAX(url.genre) AS genre
+    FROM url
+    JOIN url_duplicate ON url.url_id = url_duplicate.url_id
+    GROUP BY url_duplicate.keep_id
+) AS merged
+WHERE url.url_id = merged.keep_id;
+
+UPDATE page_scrape SET url_id = url_duplicate.keep_id
+FROM url_duplicate WHERE page_scrape.url_id = url_duplicate.url_id;
+
+UPDATE user_interaction SET url_id = url_duplicate.keep_id
+FROM url_duplicate WHERE user_interaction.url_id = url_duplicate.url_id;
+
+UPDATE capture_batch_url SET url_id = url_duplicate.keep_id
+FROM url_duplicate WHERE capture_batch_url.url_id = url_duplicate.url_id;
+
+INSERT INTO interaction_count (url_id, type_id, interaction_count)
+    SELECT url_duplicate.keep_id, interaction_count.type_id,
+           SUM(interaction_count.interaction_count)
+    FROM interaction_count
+    JOIN url_duplicate ON interaction_count.url_id = url_duplicate.url_id
+    GROUP BY url_duplicate.keep_id, interaction_count.type_id
+ON CONFLICT (url_id, type_id)
+    DO UPDATE SET interaction_count = interaction_count.interaction_count
+                                      + EXCLUDED.interaction_count;
+
+DELETE FROM interaction_count USING url_duplicate
+WHERE interaction_count.url_id = url_duplicate.url_id;
+
+DELETE FROM url USING url_duplicate
+WHERE url.url_id = url_duplicate.url_id;
+
+-- text_pattern_ops serves equality and LIKE 'prefix%' alike
+CREATE UNIQUE INDEX IF NOT EXISTS url_url_idx ON url (url text_pattern_ops);
+CREATE INDEX IF NOT EXISTS page_scrape_html_s3_ref_idx
+    ON page_scrape (html_s3_ref text_pattern_ops);
+
+COMMIT;
@@ -0,0 +1,102 @@
+-- Range-partitions page_scrape by scrape_at and user_interaction by interact_at, one partition
+-- per calendar month, so queries bounded by time only read the months they ask for.
+-- Each table is rewritten in place; run this while the scraper and website are stopped.
+BEGIN;
+
+-- Adds a partition for every month from first_month to last_month that does not have one.
+-- There is deliberately no DEFAULT partition: it would stop newest-first scans reading
+-- the months in order, so rows for a missing month are refused until it is created.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent regclass, first_month timestamp,
+                                                     last_month timestamp) RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', first_month);
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- callers on other connections would race to create the same partitions
+    PERFORM pg_advisory_xact_lock(parent::oid::bigint);
+
+    WHILE month_start <= last_month LOOP
+        partition_name := format('%s_%s', parent, to_char(month_start, 'YYYY_MM'));
+
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, parent, month_start,
+                           month_start + interval '1 month');
+            created := created + 1;
+        END IF;
+
+        month_start := month_start + interval '1 month';
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Adds the partitions for this month and the next months_ahead months, returning how many were new.
+CREATE OR REPLACE FUNCTION create_upcoming_partitions(months_ahead integer DEFAULT 3)
+RETURNS integer AS $$
+    SELECT SUM(create_monthly_partitions(
+                   parent, now() AT TIME ZONE 'utc',
+                   (now() AT TIME ZONE 'utc') + make_interval(months => months_ahead)))::integer
+    FROM unnest(ARRAY['page_scrape', 'user_interaction']::regclass[]) AS parent;
+$$ LANGUAGE sql;
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'page_scrape'::regclass) = 'r' THEN
+        ALTER TABLE page_scrape RENAME TO page_scrape_unpartitioned;
+        ALTER INDEX page_scrape_pkey RENAME TO page_scrape_unpartitioned_pkey;
+
+        -- the partition key has to be part of the primary key
+        CREATE TABLE page_scrape (
+            LIKE page_scrape_unpartitioned INCLUDING DEFAULTS,
+            PRIMARY KEY (page_scrape_id, scrape_at),
+            CONSTRAINT page_scrape_url_id_fkey FOREIGN KEY (url_id) REFERENCES url(url_id)
+        ) PARTITION BY RANGE (scrape_at);
+        ALTER SEQUENCE page_scrape_page_scrape_id_seq OWNED BY page_scrape.page_scrape_id;
+
+        PERFORM create_monthly_partitions('page_scrape', MIN(scrape_at), MAX(scrape_at))
+        FROM page_scrape_unpartitioned
+        HAVING COUNT(*) > 0;
+
+        INSERT INTO page_scrape SELECT * FROM page_scrape_unpartitioned;
+        DROP TABLE page_scrape_unpartitioned;
+    END IF;
+
+    IF (SELECT relkind FROM pg_class WHERE oid = 'user_interaction'::regclass) = 'r' THEN
+        ALTER TABLE user_interaction RENAME TO user_interaction_unpartitioned;
+        ALTER INDEX user_interaction_pkey RENAME TO user_interaction_unpartitioned_pkey;
+
+        CREATE TABLE user_interaction (
+            LIKE user_interaction_unpartitioned INCLUDING DEFAULTS,
+            PRIMARY KEY (interaction_id, interact_at),
+            CONSTRAINT user_interaction_url_id_fkey FOREIGN KEY (url_id) REFERENCES url(url_id),
+            CONSTRAINT user_interaction_type_id_fkey FOREIGN KEY (type_id)
+                REFERENCES interaction_type(type_id)
+        ) PARTITION BY RANGE (interact_at);
+        ALTER SEQUENCE user_interaction_interaction_id_seq
+            OWNED BY user_interaction.interaction_id;
+
+        PERFORM create_monthly_partitions('user_interaction', MIN(interact_at), MAX(interact_at))
+        FROM user_interaction_unpartitioned
+        HAVING COUNT(*) > 0;
+
+        INSERT INTO user_interaction SELECT * FROM user_interaction_unpartitioned;
+        DROP TABLE user_interaction_unpartitioned;
+    END IF;
+END;
+$$;
+
+SELECT create_upcoming_partitions();
+
+-- indexes on the parent are built on every partition, now and as new ones are added
+CREATE INDEX IF NOT EXISTS page_scrape_content_vector_idx
+    ON page_scrape USING GIN (content_vector);
+CREATE INDEX IF NOT EXISTS page_scrape_scrape_at_idx ON page_scrape (scrape_at);
+CREATE INDEX IF NOT EXISTS page_scrape_history_idx
+    ON page_scrape (url_id, scrape_at DESC, page_scrape_id DESC);
+CREATE INDEX IF NOT EXISTS page_scrape_html_s3_ref_idx
+    ON page_scrape (html_s3_ref text_pattern_ops);
+
+COMMIT;
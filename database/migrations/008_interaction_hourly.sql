@@ -0,0 +1,26 @@
+-- Adds the number of visits and saves of each url per hour, kept up to date on write like
+-- interaction_count and backfilled from user_interaction, so analytics read one row per
+-- url, type and hour instead of every interaction.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS interaction_hourly(
+    url_id INT NOT NULL,
+    type_id INT NOT NULL,
+    hour TIMESTAMP NOT NULL,
+    interaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (url_id, type_id, hour),
+    FOREIGN KEY (url_id) REFERENCES url(url_id),
+    FOREIGN KEY (type_id) REFERENCES interaction_type(type_id)
+);
+
+-- time series and top urls over a range of hours
+CREATE INDEX IF NOT EXISTS interaction_hourly_hour_idx ON interaction_hourly (hour);
+
+INSERT INTO interaction_hourly (url_id, type_id, hour, interaction_count)
+    SELECT url_id, type_id, date_trunc('hour', interact_at), COUNT(*)
+    FROM user_interaction
+    GROUP BY url_id, type_id, date_trunc('hour', interact_at)
+ON CONFLICT (url_id, type_id, hour)
+    DO UPDATE SET interaction_count = EXCLUDED.interaction_count;
+
+COMMIT;
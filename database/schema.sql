@@ -1,17 +1,35 @@
 -- This file contains table definitions for the database.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 DROP TABLE IF EXISTS url CASCADE;
 DROP TABLE IF EXISTS interaction_type CASCADE;
 DROP TABLE IF EXISTS user_interaction CASCADE;
 DROP TABLE IF EXISTS page_scrape CASCADE;
+DROP TABLE IF EXISTS interaction_count CASCADE;
+DROP TABLE IF EXISTS interaction_hourly CASCADE;
+DROP TABLE IF EXISTS capture_batch CASCADE;
+DROP TABLE IF EXISTS capture_batch_url CASCADE;
 
 
 CREATE TABLE url (
     url_id SERIAL PRIMARY KEY,
     url TEXT NOT NULL,
+    title TEXT,
     summary TEXT,
-    genre TEXT
+    genre TEXT,
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', url), 'A') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(genre, '')), 'C')
+    ) STORED
 );
 
+CREATE UNIQUE INDEX url_url_idx ON url (url text_pattern_ops);
+CREATE INDEX url_search_vector_idx ON url USING GIN (search_vector);
+CREATE INDEX url_url_trgm_idx ON url USING GIN (url gin_trgm_ops);
+CREATE INDEX url_title_trgm_idx ON url USING GIN (title gin_trgm_ops);
+
 
 CREATE TABLE interaction_type(
     type_id SERIAL PRIMARY KEY,
@@ -20,26 +38,120 @@ CREATE TABLE interaction_type(
 
 
 CREATE TABLE user_interaction(
-    interaction_id SERIAL PRIMARY KEY,
+    interaction_id SERIAL,
     url_id INT NOT NULL,
     type_id INT NOT NULL,
     interact_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (interaction_id, interact_at),
+    FOREIGN KEY (url_id) REFERENCES url(url_id),
+    FOREIGN KEY (type_id) REFERENCES interaction_type(type_id)
+) PARTITION BY RANGE (interact_at);
+
+CREATE TABLE interaction_count(
+    url_id INT NOT NULL,
+    type_id INT NOT NULL,
+    interaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (url_id, type_id),
     FOREIGN KEY (url_id) REFERENCES url(url_id),
     FOREIGN KEY (type_id) REFERENCES interaction_type(type_id)
 );
 
+CREATE INDEX interaction_count_ranking_idx
+    ON interaction_count (type_id, interaction_count DESC);
+
+CREATE TABLE interaction_hourly(
+    url_id INT NOT NULL,
+    type_id INT NOT NULL,
+    hour TIMESTAMP NOT NULL,
+    interaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (url_id, type_id, hour),
+    FOREIGN KEY (url_id) REFERENCES url(url_id),
+    FOREIGN KEY (type_id) REFERENCES interaction_type(type_id)
+);
+
+CREATE INDEX interaction_hourly_hour_idx ON interaction_hourly (hour);
+
 CREATE TABLE page_scrape
 (
-    page_scrape_id SERIAL PRIMARY KEY,
+    page_scrape_id SERIAL,
     url_id INT NOT NULL,
     scrape_at TIMESTAMP NOT NULL,
     html_s3_ref TEXT NOT NULL,
     css_s3_ref TEXT NOT NULL,
     screenshot_s3_ref TEXT NOT NULL,
     is_human BOOLEAN NOT NULL,
+    content_vector tsvector,
+    PRIMARY KEY (page_scrape_id, scrape_at),
     FOREIGN KEY (url_id) REFERENCES url(url_id)
+) PARTITION BY RANGE (scrape_at);
+
+CREATE INDEX page_scrape_content_vector_idx ON page_scrape USING GIN (content_vector);
+CREATE INDEX page_scrape_scrape_at_idx ON page_scrape (scrape_at);
+CREATE INDEX page_scrape_history_idx
+    ON page_scrape (url_id, scrape_at DESC, page_scrape_id DESC);
+CREATE INDEX page_scrape_html_s3_ref_idx ON page_scrape (html_s3_ref text_pattern_ops);
+
+CREATE TABLE capture_batch(
+    batch_id UUID PRIMARY KEY,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
 );
 
+CREATE TABLE capture_batch_url(
+    batch_id UUID NOT NULL,
+    position INT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'saved', 'failed')),
+    error TEXT,
+    url_id INT,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (batch_id, position),
+    FOREIGN KEY (batch_id) REFERENCES capture_batch(batch_id) ON DELETE CASCADE,
+    FOREIGN KEY (url_id) REFERENCES url(url_id)
+);
+
+
+-- Adds a partition for every month from first_month to last_month that does not have one.
+-- There is deliberately no DEFAULT partition: it would stop newest-first scans reading
+-- the months in order, so rows for a missing month are refused until it is created.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent regclass, first_month timestamp,
+                                                     last_month timestamp) RETURNS integer AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', first_month);
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- callers on other connections would race to create the same partitions
+    PERFORM pg_advisory_xact_lock(parent::oid::bigint);
+
+    WHILE month_start <= last_month LOOP
+        partition_name := format('%s_%s', parent, to_char(month_start, 'YYYY_MM'));
+
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, parent, month_start,
+                           month_start + interval '1 month');
+            created := created + 1;
+        END IF;
+
+        month_start := month_start + interval '1 month';
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Adds the partitions for this month and the next months_ahead months, returning how many were new.
+CREATE OR REPLACE FUNCTION create_upcoming_partitions(months_ahead integer DEFAULT 3)
+RETURNS integer AS $$
+    SELECT SUM(create_monthly_partitions(
+                   parent, now() AT TIME ZONE 'utc',
+                   (now() AT TIME ZONE 'utc') + make_interval(months => months_ahead)))::integer
+    FROM unnest(ARRAY['page_scrape', 'user_interaction']::regclass[]) AS parent;
+$$ LANGUAGE sql;
+
+SELECT create_upcoming_partitions();
+
 
 INSERT INTO interaction_type (type)
 VALUES ('visit'),
@@ -9,9 +9,11 @@ import re
 
 from boto3 import client
 from botocore.exceptions import ClientError
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
+from bs4.element import PreformattedString
 from dotenv import load_dotenv
 from psycopg2 import extensions, sql
+from psycopg2.extras import execute_values
 from html2image import Html2Image
 import requests
 
@@ -22,6 +24,12 @@ IMAGE_FILE_FORMAT = ".png"
 HTML_FILE_FORMAT = ".html"
 CSS_FILE_FORMAT = ".css"
 IS_HUMAN = False
+INVISIBLE_TAGS = {'script', 'style', 'noscript', 'template'}
+MAX_INDEXED_TEXT_CHARS = 500000
+# must match the keys the website caches its listing pages under (see api/cache.py)
+LISTING_CACHE_KEYS = ["internet-archiver:view:submit",
+                      "internet-archiver:view:archived-pages"]
+PARTITION_MONTHS_AHEAD = 3
 
 
 def get_soup(current_url: str) -> BeautifulSoup:
@@ -33,6 +41,18 @@ def get_soup(current_url: str) -> BeautifulSoup:
     return BeautifulSoup(response.content, 'html.parser')
 
 
+def extract_visible_text(current_soup: BeautifulSoup) -> str:
+    """Returns the text a visitor would see on the page, without modifying the soup."""
+
+    # comments, CDATA, doctypes and declarations are all PreformattedStrings
+    text = ' '.join(
+        string for string in current_soup.find_all(string=True)
+        if isinstance(string, NavigableString) and not isinstance(string, PreformattedString)
+        and string.parent.name not in INVISIBLE_TAGS)
+
+    return ' '.join(text.split())[:MAX_INDEXED_TEXT_CHARS]
+
+
 def sanitise_filename(filename: str) -> str:
     """Remove special characters from filename."""
 
@@ -143,20 +163,74 @@ def upload_file_to_s3(s3_client: client, filename: str, bucket: str, key: str) -
         print("Unable to upload file. Missing parameters required for upload!")
 
 
-def add_website(conn: extensions.connection, current_response_data: dict, current_url: str) -> None:
-    """Adds a website's data to the database."""
+def create_upcoming_partitions(conn: extensions.connection,
+                               months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """Creates any missing monthly partitions of the scrape and interaction tables,
+    up to months_ahead months from now, returning how many were added."""
 
     with conn.cursor() as cur:
-        cur.execute(f"""
-                    SELECT {environ["SCRAPE_TABLE_NAME"]}.url_id FROM {environ["SCRAPE_TABLE_NAME"]}
-                    JOIN url ON {environ["URL_TABLE_NAME"]}.url_id = {environ["SCRAPE_TABLE_NAME"]}.url_id
-                    WHERE url LIKE '%{current_url}%'
-                    """)
+        cur.execute("SELECT create_upcoming_partitions(%s);", (months_ahead,))
+        created = cur.fetchone()[0]
+        conn.commit()
+
+    return created
 
-        try:
-            current_response_data["url_id"] = cur.fetchall()[0][0]
-        except IndexError:
-            return
+
+def add_urls(conn: extensions.connection, urls: list[str]) -> dict[str, int]:
+    """Returns the url_id of every url, adding any that are missing, in one transaction."""
+
+    search_query = sql.SQL("""
+                           SELECT url, url_id
+                           FROM {url_table}
+                           WHERE url = ANY(%s)
+                           """).format(url_table=sql.Identifier(environ["URL_TABLE_NAME"]))
+    insert_query = sql.SQL("""
+                           INSERT INTO {url_table} (url)
+                           VALUES %s
+                           ON CONFLICT (url) DO NOTHING
+                           RETURNING url, url_id
+                           """).format(url_table=sql.Identifier(environ["URL_TABLE_NAME"]))
+
+    unique_urls = sorted(set(urls))
+    if not unique_urls:
+        return {}
+
+    with conn.cursor() as cur:
+        cur.execute(search_query, (unique_urls,))
+        url_ids = dict(cur.fetchall())
+
+        # nearly every url has been scraped before, so only new ones are inserted
+        new_urls = [url for url in unique_urls if url not in url_ids]
+        if new_urls:
+            url_ids.update(execute_values(cur, insert_query, [(url,) for url in new_urls],
+                                          page_size=len(new_urls), fetch=True))
+
+        # urls another writer added since the select are not returned by the insert
+        missing_urls = [url for url in new_urls if url not in url_ids]
+        if missing_urls:
+            cur.execute(search_query, (missing_urls,))
+            url_ids.update(cur.fetchall())
+        conn.commit()
+
+    return url_ids
+
+
+def add_website(conn: extensions.connection, current_response_data: dict, current_url: str) -> None:
+    """Adds a website's data to the database, looking up its url_id unless it is already set."""
+
+    if "url_id" not in current_response_data:
+        with conn.cursor() as cur:
+            # an exact match can use the unique index on url, where LIKE '%...%' scanned every row
+            cur.execute(sql.SQL("""
+                        SELECT {url_table}.url_id FROM {url_table}
+                        WHERE url = %s
+                        """).format(url_table=sql.Identifier(environ["URL_TABLE_NAME"])),
+                        (current_url,))
+
+            try:
+                current_response_data["url_id"] = cur.fetchall()[0][0]
+            except IndexError:
+                return
 
     query = sql.SQL("""
                     INSERT INTO {table} 
@@ -170,7 +244,8 @@ def add_website(conn: extensions.connection, current_response_data: dict, curren
             sql.Identifier('html_s3_ref'),
             sql.Identifier('css_s3_ref'),
             sql.Identifier('screenshot_s3_ref'),
-            sql.Identifier('is_human')
+            sql.Identifier('is_human'),
+            sql.Identifier('content_vector')
         ]),
         values=sql.SQL(',').join([
             sql.Literal(current_response_data["url_id"]),
@@ -178,7 +253,9 @@ def add_website(conn: extensions.connection, current_response_data: dict, curren
             sql.Literal(current_response_data["html_s3_ref"]),
             sql.Literal(current_response_data["css_s3_ref"]),
             sql.Literal(current_response_data["screenshot_s3_ref"]),
-            sql.Literal(current_response_data["is_human"])
+            sql.Literal(current_response_data["is_human"]),
+            sql.SQL("to_tsvector('english', {})").format(
+                sql.Literal(current_response_data.get("text")))
         ])
     )
 
@@ -187,6 +264,25 @@ def add_website(conn: extensions.connection, current_response_data: dict, curren
         conn.commit()
 
 
+def invalidate_listing_cache() -> None:
+    """Clears the website's cached listing pages when they are shared through Redis."""
+
+    redis_url = environ.get("CACHE_REDIS_URL")
+    if not redis_url:
+        return
+
+    try:
+        import redis
+    except ImportError:
+        print("Unable to invalidate cache. The redis package is not installed!")
+        return
+
+    try:
+        redis.Redis.from_url(redis_url).delete(*LISTING_CACHE_KEYS)
+    except redis.RedisError:
+        print("Unable to invalidate cache. Please check CACHE_REDIS_URL!")
+
+
 if __name__ == "__main__":
 
     load_dotenv()
@@ -206,6 +302,9 @@ if __name__ == "__main__":
     list_of_urls = ["https://eveninguniverse.com/fiction/the-meteor-generation.html",
                     "https://www.youtube.co.uk", "https://www.youtube.co.uk/"]
 
+    create_upcoming_partitions(connection)
+    url_ids = add_urls(connection, list_of_urls)
+
     download = perf_counter()
     print("Uploading HTML and image data to S3...")
     for url in list_of_urls:
@@ -220,7 +319,8 @@ if __name__ == "__main__":
 
         response_data = {"scrape_at": timestamp, "html_s3_ref": html_file_name,
                         "css_s3_ref": css_file_name, "screenshot_s3_ref": img_file_name,
-                        "is_human": IS_HUMAN}
+                        "is_human": IS_HUMAN, "text": extract_visible_text(soup),
+                        "url_id": url_ids[url]}
 
         if html_file_name and img_file_name and css_file_name:
             add_website(connection, response_data, url)
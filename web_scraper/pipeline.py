@@ -9,9 +9,10 @@ from boto3 import client
 from html2image import Html2Image
 
 from extract import get_database_connection, load_all_data
-from load import (add_website, get_soup, extract_title,
-                  extract_domain, process_html_content,
-                  process_screenshot, process_css_content)
+from load import (add_urls, add_website, create_upcoming_partitions,
+                  get_soup, extract_title, extract_domain, process_html_content,
+                  process_screenshot, process_css_content,
+                  invalidate_listing_cache, extract_visible_text)
 
 IS_HUMAN = False
 
@@ -28,6 +29,9 @@ if __name__ == "__main__":
     list_of_urls = load_all_data(connection)
     print(f"Data loaded --- {perf_counter() - startup}s.")
 
+    # runs every 3 hours, so the next months' partitions always exist before they are needed
+    print(f"Partitions created: {create_upcoming_partitions(connection)}")
+
 
     connecting_time = perf_counter()
     print("Connecting to S3...")
@@ -38,6 +42,8 @@ if __name__ == "__main__":
 
     download = perf_counter()
     print("Uploading HTML and image data to S3...")
+    # every url is resolved to its url_id up front, in one statement
+    url_ids = add_urls(connection, list_of_urls)
     for url in list_of_urls:
 
         soup = get_soup(url)
@@ -52,12 +58,14 @@ if __name__ == "__main__":
 
         response_data = {"scrape_at": timestamp, "html_s3_ref": html_file_name,
                         "css_s3_ref": css_file_name, "screenshot_s3_ref": img_file_name,
-                        "is_human": IS_HUMAN}
+                        "is_human": IS_HUMAN, "text": extract_visible_text(soup),
+                        "url_id": url_ids[url]}
 
         if html_file_name and img_file_name and css_file_name:
             add_website(connection, response_data, url)
 
     connection.close()
+    invalidate_listing_cache()
 
     print(f"Data uploaded --- {perf_counter() - download}s.")
     print(f"Pipeline complete --- {perf_counter() - startup}s.")
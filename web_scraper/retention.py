@@ -0,0 +1,265 @@
+"""Script that thins out old captures, keeping fewer of them the older they get."""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from os import environ
+from time import perf_counter
+import re
+
+from boto3 import client
+from dotenv import load_dotenv
+from psycopg2 import extensions, sql
+
+from extract import get_database_connection
+
+# every capture for a week, then one a day until 90 days old, then one a week
+DEFAULT_RETENTION_POLICY = "7d=all,90d=1d,*=7d"
+DURATION_PATTERN = re.compile(r"^(\d+)([hd])$")
+DURATION_UNITS = {"h": "hours", "d": "days"}
+# buckets are counted from a Monday, so weekly buckets run Monday to Sunday
+BUCKET_EPOCH = datetime(1970, 1, 5)
+# each capture has up to three objects, and delete_objects takes at most 1000 keys
+BATCH_SIZE = 300
+MAX_KEYS_PER_DELETE = 1000
+URL_BATCH_SIZE = 100
+
+
+def parse_duration(duration: str) -> timedelta:
+    """Returns the timedelta of a duration such as '12h' or '7d'."""
+
+    match = DURATION_PATTERN.match(duration.strip())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid duration '{duration}', expected hours or days like 12h or 7d.")
+
+    return timedelta(**{DURATION_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def parse_retention_policy(policy: str) -> list[tuple[timedelta | None, timedelta | None]]:
+    """Returns the (max_age, keep_every) tiers of a policy such as '7d=all,90d=1d,*=7d'.
+
+    Captures younger than a tier's max_age keep one per keep_every, or all of them if
+    keep_every is None. The last tier's max_age is '*' (None), covering everything older.
+    """
+
+    tiers = []
+    for tier in policy.split(","):
+        max_age, _, keep_every = tier.partition("=")
+        max_age, keep_every = max_age.strip(), keep_every.strip()
+        tiers.append((None if max_age == "*" else parse_duration(max_age),
+                      None if keep_every == "all" else parse_duration(keep_every)))
+
+    ages = [max_age for max_age, _ in tiers]
+    if ages[-1] is not None or None in ages[:-1]:
+        raise ValueError("Only the last tier of a retention policy can, and must, be '*'.")
+    if ages[:-1] != sorted(set(ages[:-1])):
+        raise ValueError("Retention policy tiers must be in order of increasing age.")
+
+    return tiers
+
+
+def get_keep_every(policy: list[tuple], age: timedelta) -> timedelta | None:
+    """Returns how often captures of the given age are kept, or None if they all are."""
+
+    for max_age, keep_every in policy:
+        if max_age is None or age < max_age:
+            return keep_every
+
+    return None
+
+
+def select_surplus_captures(captures: list[tuple], policy: list[tuple],
+                            now: datetime) -> list[tuple]:
+    """Returns the captures of one url that the policy does not keep.
+
+    Captures are (page_scrape_id, scrape_at, is_human, ...) tuples, oldest first. The
+    oldest capture in each bucket is kept, so a capture kept once is still kept as it
+    ages into coarser tiers. Human captures are always kept.
+    """
+
+    surplus = []
+    kept_buckets = set()
+
+    for capture in captures:
+        scrape_at, is_human = capture[1], capture[2]
+        keep_every = get_keep_every(policy, now - scrape_at)
+        if keep_every is None:
+            continue
+
+        bucket = (keep_every, (scrape_at - BUCKET_EPOCH) // keep_every)
+        if is_human or bucket not in kept_buckets:
+            kept_buckets.add(bucket)
+        else:
+            surplus.append(capture)
+
+    return surplus
+
+
+def get_url_ids(conn: extensions.connection) -> list[int]:
+    """Returns the id of every archived url."""
+
+    query = sql.SQL("SELECT url_id FROM {url_table} ORDER BY url_id;").format(
+        url_table=sql.Identifier(environ["URL_TABLE_NAME"]))
+
+    with conn.cursor() as cur:
+        cur.execute(query)
+        return [row[0] for row in cur.fetchall()]
+
+
+def get_captures(conn: extensions.connection, url_ids: list[int],
+                 before: datetime) -> dict[int, list[tuple]]:
+    """Returns each url's captures from before the given time, oldest first, in one query."""
+
+    query = sql.SQL("""
+                    SELECT url_id, page_scrape_id, scrape_at, is_human,
+                           html_s3_ref, css_s3_ref, screenshot_s3_ref
+                    FROM {scrape_table}
+                    WHERE url_id = ANY(%s) AND scrape_at < %s
+                    ORDER BY url_id, scrape_at, page_scrape_id;
+                    """).format(scrape_table=sql.Identifier(environ["SCRAPE_TABLE_NAME"]))
+
+    captures = {url_id: [] for url_id in url_ids}
+    with conn.cursor() as cur:
+        cur.execute(query, (url_ids, before))
+        for url_id, *capture in cur.fetchall():
+            captures[url_id].append(tuple(capture))
+
+    return captures
+
+
+def is_capture_key(s3_ref: str | None) -> bool:
+    """Checks whether an S3 ref is a capture's object key, rather than empty or a placeholder
+    such as the 'css_data' the website stores for captures it saves."""
+
+    return bool(s3_ref) and "/" in s3_ref
+
+
+def delete_captures(conn: extensions.connection, captures: list[tuple]) -> int:
+    """Deletes the captures' rows in one statement, returning how many were deleted."""
+
+    # the scrape_at list lets the planner skip the months none of the captures are in
+    query = sql.SQL("""
+                    DELETE FROM {scrape_table}
+                    WHERE page_scrape_id = ANY(%s) AND scrape_at = ANY(%s);
+                    """).format(scrape_table=sql.Identifier(environ["SCRAPE_TABLE_NAME"]))
+
+    with conn.cursor() as cur:
+        cur.execute(query, ([capture[0] for capture in captures],
+                            sorted({capture[1] for capture in captures})))
+        deleted = cur.rowcount
+        conn.commit()
+
+    return deleted
+
+
+def get_object_sizes(s3_client: client, bucket: str, keys: list[str]) -> dict[str, int]:
+    """Returns the size in bytes of each key that exists, listing each folder only once."""
+
+    sizes = {}
+    paginator = s3_client.get_paginator("list_objects_v2")
+
+    for folder in {key.rpartition("/")[0] for key in keys}:
+        for page in paginator.paginate(Bucket=bucket, Prefix=f"{folder}/"):
+            sizes.update((item["Key"], item["Size"]) for item in page.get("Contents", []))
+
+    return {key: sizes[key] for key in keys if key in sizes}
+
+
+def delete_s3_objects(s3_client: client, bucket: str, keys: list[str]) -> list[str]:
+    """Deletes the objects up to 1000 at a time, returning the keys that were deleted."""
+
+    deleted = []
+
+    for start in range(0, len(keys), MAX_KEYS_PER_DELETE):
+        chunk = keys[start:start + MAX_KEYS_PER_DELETE]
+        response = s3_client.delete_objects(
+            Bucket=bucket, Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True})
+
+        failed = set()
+        for error in response.get("Errors", []):
+            print(f"Unable to delete {error['Key']}: {error['Message']}")
+            failed.add(error["Key"])
+        deleted.extend(key for key in chunk if key not in failed)
+
+    return deleted
+
+
+def remove_captures(conn: extensions.connection, s3_client: client, bucket: str,
+                    captures: list[tuple], dry_run: bool = False) -> tuple[int, int, int]:
+    """Deletes the captures' rows and then their objects, returning the number of rows
+    and objects deleted and the bytes reclaimed. A dry run only counts them."""
+
+    keys = sorted({key for capture in captures for key in capture[3:] if is_capture_key(key)})
+    sizes = get_object_sizes(s3_client, bucket, keys)
+
+    if dry_run:
+        return len(captures), len(sizes), sum(sizes.values())
+
+    # rows go first, so a failure part way never leaves a capture pointing at a missing object
+    deleted_rows = delete_captures(conn, captures)
+    deleted_keys = [key for key in delete_s3_objects(s3_client, bucket, keys) if key in sizes]
+
+    return deleted_rows, len(deleted_keys), sum(sizes[key] for key in deleted_keys)
+
+
+def thin_captures(conn: extensions.connection, s3_client: client, bucket: str,
+                  policy: list[tuple], now: datetime, dry_run: bool = False) -> dict[str, int]:
+    """Removes every capture the policy does not keep, BATCH_SIZE at a time,
+    returning the number of captures and objects removed and the bytes reclaimed."""
+
+    report = {"captures": 0, "objects": 0, "bytes": 0}
+
+    # captures in a leading keep-everything tier are never read
+    max_age, keep_every = policy[0]
+    if keep_every is None and max_age is None:
+        return report
+    before = now - max_age if keep_every is None else now
+
+    url_ids = get_url_ids(conn)
+    batch = []
+    for start in range(0, len(url_ids), URL_BATCH_SIZE):
+        captures = get_captures(conn, url_ids[start:start + URL_BATCH_SIZE], before)
+        for url_captures in captures.values():
+            batch.extend(select_surplus_captures(url_captures, policy, now))
+
+        while len(batch) >= BATCH_SIZE:
+            removed = remove_captures(conn, s3_client, bucket, batch[:BATCH_SIZE], dry_run)
+            for name, value in zip(report, removed):
+                report[name] += value
+            batch = batch[BATCH_SIZE:]
+
+    if batch:
+        removed = remove_captures(conn, s3_client, bucket, batch, dry_run)
+        for name, value in zip(report, removed):
+            report[name] += value
+
+    return report
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--policy", default=environ.get("RETENTION_POLICY",
+                                                        DEFAULT_RETENTION_POLICY),
+                        help=f"retention tiers (default {DEFAULT_RETENTION_POLICY})")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report what would be removed without removing it")
+    args = parser.parse_args()
+
+    retention_policy = parse_retention_policy(args.policy)
+
+    startup = perf_counter()
+    connection = get_database_connection()
+    s3 = client("s3",
+                aws_access_key_id=environ["AWS_ACCESS_KEY_ID"],
+                aws_secret_access_key=environ["AWS_SECRET_ACCESS_KEY"])
+
+    print(f"Thinning captures ({args.policy}{', dry run' if args.dry_run else ''})...")
+    result = thin_captures(connection, s3, environ["S3_BUCKET"], retention_policy,
+                           datetime.utcnow(), args.dry_run)
+    connection.close()
+
+    print(f"Captures removed: {result['captures']}")
+    print(f"Objects removed: {result['objects']}")
+    print(f"Space reclaimed: {result['bytes'] / 1024 ** 2:.1f} MiB")
+    print(f"Thinning complete --- {perf_counter() - startup}s.")
@@ -1,10 +1,13 @@
 """Unit tests for the load.py file."""
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from pytest import raises
 from botocore.exceptions import ClientError
 
-from load import sanitise_filename, extract_title, extract_domain, upload_file_to_s3
+from bs4 import BeautifulSoup
+
+from load import (sanitise_filename, extract_title, extract_domain,
+                  upload_file_to_s3, extract_visible_text, add_urls)
 
 def test_sanitise_filename_works():
     """Tests that sanitise_filename successfully removes the correct characters."""
@@ -126,3 +129,50 @@ def test_upload_to_s3_type_error(capsys):
     s3_client_mock.upload_file.assert_called_once()
     assert ("Unable to upload file. Missing parameters required for upload!\n"
             in capsys.readouterr().out)
+
+
+def test_extract_visible_text_skips_scripts_styles_and_comments():
+    """Tests that extract_visible_text only returns text a visitor would see."""
+
+    soup = BeautifulSoup("""<html><head><title>News</title><style>p {}</style></head>
+                         <body><!-- hidden --><script>var x = 1;</script>
+                         <p>Election   results</p></body></html>""", 'html.parser')
+
+    assert extract_visible_text(soup) == "News Election results"
+
+
+def test_extract_visible_text_empty_page():
+    """Tests that extract_visible_text returns an empty string for a page with no text."""
+
+    assert extract_visible_text(BeautifulSoup("", 'html.parser')) == ""
+
+
+@patch.dict("load.environ", {"URL_TABLE_NAME": "url"})
+@patch("load.execute_values")
+def test_add_urls_inserts_only_new_urls(mock_execute_values):
+    """Tests that add_urls looks up known urls and inserts only the new ones, once each."""
+
+    mock_execute_values.return_value = [("https://new.com", 2)]
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchall.return_value = [("https://old.com", 1)]
+
+    url_ids = add_urls(conn, ["https://old.com", "https://new.com", "https://new.com"])
+
+    assert url_ids == {"https://old.com": 1, "https://new.com": 2}
+    assert mock_execute_values.call_args.args[2] == [("https://new.com",)]
+    cur.execute.assert_called_once()
+    conn.commit.assert_called_once()
+
+
+@patch.dict("load.environ", {"URL_TABLE_NAME": "url"})
+@patch("load.execute_values")
+def test_add_urls_known_urls_not_written(mock_execute_values):
+    """Tests that add_urls writes nothing when every url is already stored."""
+
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchall.return_value = [("https://old.com", 1)]
+
+    assert add_urls(conn, ["https://old.com"]) == {"https://old.com": 1}
+    mock_execute_values.assert_not_called()
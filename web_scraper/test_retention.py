@@ -0,0 +1,115 @@
+"""Unit tests for the retention.py file."""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from pytest import raises
+
+from retention import (parse_retention_policy, select_surplus_captures,
+                       delete_s3_objects, remove_captures)
+
+NOW = datetime(2024, 6, 1, 12)
+POLICY = parse_retention_policy("7d=all,90d=1d,*=7d")
+
+
+def make_capture(page_scrape_id: int, scrape_at: datetime, is_human: bool = False) -> tuple:
+    """Returns a capture tuple as select_surplus_captures expects it."""
+
+    key = f"example.com/Example/{scrape_at.isoformat()}"
+    return (page_scrape_id, scrape_at, is_human, f"{key}.html", f"{key}.css", f"{key}.png")
+
+
+def test_parse_retention_policy_works():
+    """Tests that parse_retention_policy reads every tier, including hours and 'all'."""
+
+    assert parse_retention_policy("12h=all, 30d=6h, *=7d") == [
+        (timedelta(hours=12), None),
+        (timedelta(days=30), timedelta(hours=6)),
+        (None, timedelta(days=7))]
+
+
+def test_parse_retention_policy_invalid():
+    """Tests that parse_retention_policy rejects bad durations and badly ordered tiers."""
+
+    with raises(ValueError):
+        parse_retention_policy("7d=all,90d=1w,*=7d")
+    with raises(ValueError):
+        parse_retention_policy("7d=all,90d=1d")
+    with raises(ValueError):
+        parse_retention_policy("90d=all,7d=1d,*=7d")
+
+
+def test_select_surplus_captures_keeps_recent():
+    """Tests that select_surplus_captures keeps every capture in the first tier."""
+
+    captures = [make_capture(index, NOW - timedelta(hours=3 * index)) for index in range(40)]
+
+    assert select_surplus_captures(captures[::-1], POLICY, NOW) == []
+
+
+def test_select_surplus_captures_keeps_oldest_each_day():
+    """Tests that select_surplus_captures keeps the oldest capture of each day in the daily tier."""
+
+    day = datetime(2024, 5, 1)
+    captures = [make_capture(index, day + timedelta(hours=3 * index)) for index in range(16)]
+
+    surplus = select_surplus_captures(captures, POLICY, NOW)
+
+    assert [capture[0] for capture in surplus] == [index for index in range(16)
+                                                    if index not in (0, 8)]
+
+
+def test_select_surplus_captures_keeps_human():
+    """Tests that select_surplus_captures never removes a human capture."""
+
+    week = datetime(2024, 1, 1)
+    captures = [make_capture(1, week), make_capture(2, week + timedelta(days=1), True),
+                make_capture(3, week + timedelta(days=2))]
+
+    assert select_surplus_captures(captures, POLICY, NOW) == [captures[2]]
+
+
+def test_delete_s3_objects_skips_errors():
+    """Tests that delete_s3_objects deletes 1000 keys at a time and leaves out failed keys."""
+
+    s3_client = MagicMock()
+    s3_client.delete_objects.return_value = {"Errors": [{"Key": "key-5", "Message": "Denied"}]}
+    keys = [f"key-{index}" for index in range(1500)]
+
+    deleted = delete_s3_objects(s3_client, "bucket", keys)
+
+    assert s3_client.delete_objects.call_count == 2
+    assert deleted == [key for key in keys if key != "key-5"]
+
+
+def test_remove_captures_dry_run():
+    """Tests that remove_captures reports the space a dry run would reclaim without deleting."""
+
+    capture = make_capture(1, datetime(2024, 1, 1))
+    s3_client = MagicMock()
+    s3_client.get_paginator.return_value.paginate.return_value = [
+        {"Contents": [{"Key": key, "Size": 100} for key in capture[3:]]}]
+    conn = MagicMock()
+
+    assert remove_captures(conn, s3_client, "bucket", [capture], dry_run=True) == (1, 3, 300)
+    s3_client.delete_objects.assert_not_called()
+    conn.cursor.assert_not_called()
+
+
+@patch.dict("retention.environ", {"SCRAPE_TABLE_NAME": "page_scrape"})
+def test_remove_captures_skips_placeholder_refs():
+    """Tests that remove_captures never deletes refs that are not capture keys, like 'css_data'."""
+
+    capture = (1, datetime(2024, 1, 1), False, "example.com/Example/1.html", "css_data",
+               "example.com/Example/1.png")
+    s3_client = MagicMock()
+    s3_client.get_paginator.return_value.paginate.return_value = [{"Contents": []}]
+    s3_client.delete_objects.return_value = {}
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.rowcount = 1
+
+    remove_captures(conn, s3_client, "bucket", [capture])
+
+    deleted = s3_client.delete_objects.call_args.kwargs["Delete"]["Objects"]
+    assert [item["Key"] for item in deleted] == ["example.com/Example/1.html",
+                                                 "example.com/Example/1.png"]
+    s3_client.head_object.assert_not_called()